@@ -4,76 +4,117 @@
 '''
 
 import os
-from PyQt6 import uic
 from PyQt6.QtWidgets import QDialog, QMessageBox, QFileDialog
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
 from database import Database
+from ui_loader import setup_ui
+from poster_loader import PosterLoader
+from poster_store import ingest_poster
 
 
 class AddEditDialog(QDialog):
     # Диалог для добавления и редактирования фильма
+    # Создаётся один раз и переключается между фильмами методом show_movie
     
     def __init__(self, database: Database, movie_id: int = None, parent=None):
         super().__init__(parent)
-        # Загружаем интерфейс из ui файла
-        uic.loadUi('ui/add_edit_dialog.ui', self)
+        # Загружаем интерфейс (скомпилированная форма или ui файл)
+        setup_ui(self, 'add_edit_dialog')
         
         self.db = database
         self.movie_id = movie_id
         self.poster_path = ""
         
+        # Результат последнего сохранения (тип изменения и ID фильма)
+        self.last_change = None
+        
+        # Превью постера загружается в фоне
+        self.poster_loader = PosterLoader(self)
+        self.poster_loader.ready.connect(self.posterPreviewLabel.setPixmap)
+        self.poster_loader.failed.connect(self.on_poster_failed)
+        self.warn_on_poster_failure = False
+        
+        # Значения полей из формы, к ним диалог возвращается перед добавлением фильма
+        self.default_values = (
+            self.yearSpinBox.value(),
+            self.genreComboBox.currentText(),
+            self.ratingSpinBox.value(),
+            self.durationSpinBox.value()
+        )
+        
         # Настраиваем окно в зависимости от режима
-        if self.movie_id is None:
-            self.setWindowTitle("Добавить фильм")
-        else:
-            self.setWindowTitle("Редактировать фильм")
-            self.load_movie_data()
+        self.show_movie(self.movie_id)
         
         # Подключаем сигналы
         self.connect_signals()
     
+    def show_movie(self, movie_id: int = None) -> bool:
+        # Переключение диалога на добавление (movie_id=None) или на редактирование фильма
+        self.movie_id = movie_id
+        self.warn_on_poster_failure = False
+        
+        if self.movie_id is None:
+            self.setWindowTitle("Добавить фильм")
+            self.clear_form()
+            return True
+        
+        self.setWindowTitle("Редактировать фильм")
+        return self.load_movie_data()
+    
+    def clear_form(self):
+        # Сброс полей формы к значениям по умолчанию
+        year, genre, rating, duration = self.default_values
+        self.titleLineEdit.clear()
+        self.yearSpinBox.setValue(year)
+        self.genreComboBox.setCurrentText(genre)
+        self.directorLineEdit.clear()
+        self.ratingSpinBox.setValue(rating)
+        self.durationSpinBox.setValue(duration)
+        self.descriptionTextEdit.clear()
+        self.poster_path = ""
+        self.poster_loader.cancel()
+        self.posterPreviewLabel.setText("Предпросмотр постера")
+        self.posterLineEdit.clear()
+        self.titleLineEdit.setFocus()
+    
     def connect_signals(self):
         # Подключение сигналов к слотам
         self.selectPosterButton.clicked.connect(self.select_poster)
         self.saveButton.clicked.connect(self.save_movie)
         self.cancelButton.clicked.connect(self.reject)
     
-    def load_movie_data(self):
+    def load_movie_data(self) -> bool:
         # Загрузка данных фильма для редактирования
         movie = self.db.get_movie_by_id(self.movie_id)
         
         if not movie:
             QMessageBox.critical(self, "Ошибка", "Фильм не найден в базе данных")
             self.reject()
-            return
+            return False
         
         # Заполняем поля формы
-        self.titleLineEdit.setText(movie[1] if movie[1] else "")
-        self.yearSpinBox.setValue(movie[2] if movie[2] else 2000)
-        self.genreComboBox.setCurrentText(movie[3] if movie[3] else "")
-        self.directorLineEdit.setText(movie[4] if movie[4] else "")
-        self.ratingSpinBox.setValue(movie[5] if movie[5] else 0.0)
-        self.durationSpinBox.setValue(movie[6] if movie[6] else 0)
-        self.descriptionTextEdit.setPlainText(movie[7] if movie[7] else "")
+        self.titleLineEdit.setText(movie.title or "")
+        self.yearSpinBox.setValue(movie.year or 2000)
+        self.genreComboBox.setCurrentText(movie.genre or "")
+        self.directorLineEdit.setText(movie.director or "")
+        self.ratingSpinBox.setValue(movie.rating or 0.0)
+        self.durationSpinBox.setValue(movie.duration or 0)
+        self.descriptionTextEdit.setPlainText(movie.description or "")
         
         # Сохраняем путь к постеру
-        self.poster_path = movie[8] if movie[8] else ""
+        self.poster_path = movie.poster_path or ""
         
         # Показываем постер если есть
         if self.poster_path and os.path.exists(self.poster_path):
-            pixmap = QPixmap(self.poster_path)
-            # Масштабируем постер с сохранением пропорций
-            scaled_pixmap = pixmap.scaled(
-                self.posterPreviewLabel.width(),
-                self.posterPreviewLabel.height(),
-                Qt.AspectRatioMode.KeepAspectRatio
-            )
-            self.posterPreviewLabel.setPixmap(scaled_pixmap)
+            self.warn_on_poster_failure = False
+            self.show_poster_preview(self.poster_path)
             self.posterLineEdit.setText(os.path.basename(self.poster_path))
         else:
+            self.poster_loader.cancel()
             self.posterPreviewLabel.setText("Нет постера")
             self.posterLineEdit.clear()
+        
+        self.titleLineEdit.setFocus()
+        return True
     
     def select_poster(self):
         # Выбор файла постера
@@ -90,20 +131,28 @@ class AddEditDialog(QDialog):
         # Сохраняем путь
         self.poster_path = file_path
         
-        # Отображаем постер
-        pixmap = QPixmap(file_path)
-        if pixmap.isNull():
-            QMessageBox.warning(self, "Предупреждение", "Не удалось загрузить изображение")
-            return
-        
-        # Масштабируем постер
-        scaled_pixmap = pixmap.scaled(
+        # Отображаем уменьшенную копию постера, о неудаче сообщит on_poster_failed
+        self.warn_on_poster_failure = True
+        self.show_poster_preview(file_path)
+        self.posterLineEdit.setText(os.path.basename(file_path))
+    
+    def show_poster_preview(self, path: str):
+        # Постер из кэша памяти показывается сразу, иначе заглушка до окончания загрузки
+        pixmap = self.poster_loader.request(
+            path,
             self.posterPreviewLabel.width(),
-            self.posterPreviewLabel.height(),
-            Qt.AspectRatioMode.KeepAspectRatio
+            self.posterPreviewLabel.height()
         )
-        self.posterPreviewLabel.setPixmap(scaled_pixmap)
-        self.posterLineEdit.setText(os.path.basename(file_path))
+        if pixmap is not None:
+            self.posterPreviewLabel.setPixmap(pixmap)
+        else:
+            self.posterPreviewLabel.setText("Загрузка постера...")
+    
+    def on_poster_failed(self):
+        # Изображение не удалось декодировать
+        self.posterPreviewLabel.setText("Нет постера")
+        if self.warn_on_poster_failure:
+            QMessageBox.warning(self, "Предупреждение", "Не удалось загрузить изображение")
     
     def validate_inputs(self) -> bool:
         # Проверка корректности введенных данных
@@ -173,53 +222,33 @@ class AddEditDialog(QDialog):
         # Сохраняем в базу данных
         if self.movie_id is None:
             # Добавление нового фильма
-            success = self.db.add_movie(
+            self.last_change = self.db.add_movie(
                 title, year, genre, director, 
                 rating, duration, description, self.poster_path
             )
             
-            if success:
+            if self.last_change:
                 QMessageBox.information(self, "Успех", "Фильм успешно добавлен")
                 self.accept()
             else:
                 QMessageBox.critical(self, "Ошибка", "Не удалось добавить фильм")
         else:
             # Обновление существующего фильма
-            success = self.db.update_movie(
+            self.last_change = self.db.update_movie(
                 self.movie_id, title, year, genre, director,
                 rating, duration, description, self.poster_path
             )
             
-            if success:
+            if self.last_change:
                 QMessageBox.information(self, "Успех", "Фильм успешно обновлён")
                 self.accept()
             else:
                 QMessageBox.critical(self, "Ошибка", "Не удалось обновить фильм")
     
     def copy_poster_to_folder(self, source_path: str) -> str:
-        # Копирование постера в папку проекта
-        import shutil
-        
-        # Создаём папку posters если её нет
-        if not os.path.exists("posters"):
-            os.makedirs("posters")
-        
-        # Генерируем имя файла
-        filename = os.path.basename(source_path)
-        dest_path = os.path.join("posters", filename)
-        
-        # Если файл уже существует, добавляем номер
-        base_name, ext = os.path.splitext(filename)
-        counter = 1
-        while os.path.exists(dest_path):
-            new_filename = f"{base_name}_{counter}{ext}"
-            dest_path = os.path.join("posters", new_filename)
-            counter += 1
-        
+        # Уменьшение постера и сохранение в хранилище (одинаковые файлы хранятся один раз)
         try:
-            # Копируем файл
-            shutil.copy2(source_path, dest_path)
-            return dest_path
+            return ingest_poster(source_path, keep_original=self.keepOriginalCheckBox.isChecked())
         except Exception as e:
             QMessageBox.warning(
                 self,
@@ -227,3 +256,8 @@ class AddEditDialog(QDialog):
                 f"Не удалось скопировать постер: {str(e)}\nБудет использован оригинальный путь."
             )
             return source_path
+    
+    def done(self, result):
+        # Поздний результат загрузки постера закрытому окну не нужен
+        self.poster_loader.cancel()
+        super().done(result)
@@ -0,0 +1,501 @@
+'''
+Модуль замеров производительности.
+Создаёт синтетические каталоги фильмов заданного размера (генератор с фиксированным
+зерном, поэтому каталог одинаков на любой машине), замеряет методы Database
+и загрузку таблицы главного окна, сохраняет результаты в JSON и сравнивает
+их с сохранённым эталоном.
+
+Окно создаётся без экрана (QT_QPA_PLATFORM=offscreen), поэтому замеры
+можно запускать на сервере сборки.
+
+Запуск:
+    python benchmark.py [--sizes 1000 100000 1000000] [--repeat 5] [--output results.json]
+                        [--baseline benchmark_baseline.json] [--save-baseline] [--tolerance 0.25]
+
+Каталоги кэшируются в папке --workdir и создаются заново только при смене
+размера, зерна или числа постеров.
+'''
+
+import os
+
+# Окну не нужен экран, платформа задаётся до загрузки Qt
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse
+import io
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional
+from database import Database, MovieFilter, PAGE_SIZE
+from result_cache import MAX_ENTRIES, MAX_ROWS
+from incremental_search import IncrementalSearch
+
+
+# Размеры каталогов по умолчанию
+DEFAULT_SIZES = (1000, 100000, 1000000)
+
+# Зерно генератора каталогов
+DEFAULT_SEED = 20240101
+
+# Число замеров каждого случая (перед ними один прогрев)
+DEFAULT_REPEAT = 5
+
+# Папка для сгенерированных каталогов
+DEFAULT_WORKDIR = "benchmark_data"
+
+# Файл эталонных результатов
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Допустимое замедление относительно эталона (доля)
+DEFAULT_TOLERANCE = 0.25
+
+# Разница, которую не считаем замедлением, даже если она больше допуска (мс)
+NOISE_FLOOR_MS = 0.5
+
+# Число разных постеров в каталоге и доля фильмов с постером
+DEFAULT_POSTERS = 20
+POSTER_SHARE = 0.3
+
+# Число точечных запросов в одном замере (время делится на это число)
+POINT_QUERIES = 100
+
+# Число жанров, между которыми переключается замер навигации
+NAVIGATION_GENRES = 4
+
+# Суффикс случаев, которые замеряются с включённым кэшем выборок
+CACHED_SUFFIX = "[cached]"
+
+# Словари для правдоподобных названий, имён и описаний
+TITLE_ADJECTIVES = [
+    'Тёмный', 'Последний', 'Белый', 'Тихий', 'Красный', 'Забытый', 'Большой',
+    'Холодный', 'Новый', 'Старый', 'Золотой', 'Далёкий', 'Железный', 'Ночной',
+]
+TITLE_NOUNS = [
+    'город', 'рыцарь', 'остров', 'берег', 'горизонт', 'поезд', 'лес', 'дом',
+    'сад', 'маяк', 'путь', 'ветер', 'код', 'свет', 'час', 'огонь', 'сон',
+]
+TITLE_GENITIVES = [
+    'времени', 'ночи', 'памяти', 'моря', 'судьбы', 'севера', 'звёзд',
+    'дождя', 'войны', 'тишины', 'надежды', 'прошлого',
+]
+ENGLISH_TITLES = [
+    'The Last Signal', 'Blue Horizon', 'Silent Harbor', 'Iron Road', 'Night Shift',
+    'Paper Moon', 'Cold Trail', 'Open Water', 'Lost Frequency', 'Glass Garden',
+]
+GENRES = [
+    'Драма', 'Боевик', 'Комедия', 'Триллер', 'Фантастика', 'Ужасы', 'Детектив',
+    'Мелодрама', 'Приключения', 'Криминал', 'Мультфильм', 'Документальный',
+]
+# Веса жанров: драм и комедий в реальных каталогах больше, чем документальных
+GENRE_WEIGHTS = [18, 12, 14, 10, 8, 5, 7, 6, 8, 6, 4, 2]
+FIRST_NAMES = [
+    'Андрей', 'Алексей', 'Мария', 'Ольга', 'Сергей', 'Никита', 'Анна',
+    'Christopher', 'Sofia', 'Martin', 'Greta', 'Denis', 'Quentin', 'Kathryn',
+]
+LAST_NAMES = [
+    'Тарковский', 'Балабанов', 'Михалков', 'Звягинцев', 'Германика', 'Попогребский',
+    'Nolan', 'Coppola', 'Scorsese', 'Gerwig', 'Villeneuve', 'Tarantino', 'Bigelow',
+]
+DESCRIPTION_SENTENCES = [
+    'Герой возвращается в родной город спустя много лет.',
+    'Небольшая команда отправляется туда, откуда никто не возвращался.',
+    'Случайная встреча меняет жизнь двух незнакомцев.',
+    'Следователь распутывает дело, которое все считали закрытым.',
+    'Семья пытается сохранить дом во время долгой зимы.',
+    'Молодой изобретатель сталкивается с последствиями своего открытия.',
+    'История дружбы, которая длится несколько десятилетий.',
+    'Маленький город хранит тайну, о которой не принято говорить.',
+]
+
+
+class Case(NamedTuple):
+    # Случай замера: имя, функция (возвращает число строк) и число операций в одном вызове
+    name: str
+    run: Callable[[], int]
+    ops: int = 1
+
+
+def make_title(rng: random.Random, number: int) -> str:
+    # Название фильма по одному из шаблонов (иногда с номером части)
+    pattern = rng.random()
+    if pattern < 0.4:
+        title = f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)}"
+    elif pattern < 0.7:
+        title = f"{rng.choice(TITLE_NOUNS).capitalize()} {rng.choice(TITLE_GENITIVES)}"
+    elif pattern < 0.85:
+        title = rng.choice(ENGLISH_TITLES)
+    else:
+        title = f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(TITLE_NOUNS)} {rng.choice(TITLE_GENITIVES)}"
+
+    # Продолжения и одноимённые фильмы, как в настоящих каталогах
+    if rng.random() < 0.15:
+        title += f" {rng.randint(2, 5)}"
+    elif rng.random() < 0.3:
+        title += f" ({number % 997})"
+    return title
+
+
+def catalogue_records(size: int, seed: int = DEFAULT_SEED, poster_paths: Optional[List[str]] = None):
+    # Генератор записей каталога (словари в формате импорта)
+    rng = random.Random(seed)
+    poster_paths = poster_paths or []
+    for number in range(size):
+        yield {
+            'title': make_title(rng, number),
+            'year': rng.randint(1920, 2025),
+            'genre': rng.choices(GENRES, GENRE_WEIGHTS)[0],
+            'director': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            'rating': round(min(10.0, max(0.0, rng.gauss(6.5, 1.4))), 1),
+            'duration': rng.randint(70, 200),
+            'description': " ".join(rng.sample(DESCRIPTION_SENTENCES, rng.randint(1, 3))),
+            'poster_path': (rng.choice(poster_paths)
+                            if poster_paths and rng.random() < POSTER_SHARE else ""),
+        }
+
+
+def generate_posters(count: int, store_dir: str, seed: int = DEFAULT_SEED) -> List[str]:
+    # Однотонные постеры в хранилище с адресацией по содержимому
+    from PIL import Image
+    from poster_store import store_bytes
+
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 450), color).save(buffer, 'JPEG', quality=85)
+        paths.append(store_bytes(buffer.getvalue(), '.jpg', store_dir))
+    return paths
+
+
+def build_catalogue(size: int, workdir: str = DEFAULT_WORKDIR, seed: int = DEFAULT_SEED,
+                    posters: int = DEFAULT_POSTERS) -> str:
+    '''
+    Создание каталога из size фильмов в файле базы внутри workdir.
+    Готовый файл с тем же размером, зерном и числом постеров используется повторно.
+    Возвращает путь к файлу базы.
+    '''
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, f"catalogue-{size}-{seed}-{posters}.db")
+    if os.path.exists(db_path):
+        return db_path
+
+    poster_paths = generate_posters(posters, os.path.join(workdir, "posters"), seed)
+
+    # Каталог собирается во временном файле, чтобы прерванная генерация не осталась в кэше
+    temp_path = db_path + ".tmp"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(temp_path + suffix):
+            os.remove(temp_path + suffix)
+
+    db = Database(temp_path)
+    try:
+        started = time.perf_counter()
+        result = db.bulk_add_movies(catalogue_records(size, seed, poster_paths))
+        print(f"Каталог {size}: добавлено {result['inserted']} фильмов "
+              f"за {time.perf_counter() - started:.1f} с")
+        # Перенос журнала в основной файл перед переименованием
+        db.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        db.close()
+
+    os.replace(temp_path, db_path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(temp_path + suffix):
+            os.remove(temp_path + suffix)
+    return db_path
+
+
+def database_cases(db: Database, seed: int = DEFAULT_SEED) -> List[Case]:
+    # Случаи замера методов Database на готовом каталоге
+    rng = random.Random(seed)
+    max_id = db.cursor.execute("SELECT MAX(id) FROM movies").fetchone()[0] or 1
+    point_ids = [rng.randint(1, max_id) for _ in range(POINT_QUERIES)]
+    word = TITLE_NOUNS[0]
+    genre = GENRES[0]
+
+    def point_lookups():
+        return sum(db.get_movie_by_id(movie_id) is not None for movie_id in point_ids)
+
+    def scan():
+        return sum(len(chunk) for chunk in db.iter_movies())
+
+    # Набор запроса по одной букве: первая страница и количество на каждое нажатие
+    typed = f"{TITLE_ADJECTIVES[0]} {TITLE_NOUNS[0]}".lower()
+    incremental = IncrementalSearch(db)
+
+    def type_sql():
+        rows = 0
+        for length in range(1, len(typed) + 1):
+            movie_filter = MovieFilter(typed[:length])
+            rows += len(db.filter_movies_page(movie_filter)[0])
+            db.count_filtered(movie_filter)
+        return rows
+
+    def type_incremental():
+        incremental.reset()
+        return sum(len(incremental.search(MovieFilter(typed[:length])).movies)
+                   for length in range(1, len(typed) + 1))
+
+    def navigate():
+        # Переключение жанров туда и обратно: страница и количество для каждого
+        return sum(len(db.search_movies_page("", name)[0]) + db.count_movies("", name)
+                   for name in GENRES[:NAVIGATION_GENRES])
+
+    # Добавление, изменение и удаление одного фильма: каталог после замера не меняется
+    written = []
+
+    def add():
+        change = db.add_movie("Замер производительности", 2000, genre, "Бенчмарк",
+                              5.0, 90, "Временная запись", "")
+        written.append(change.movie_id)
+        return 1
+
+    def update():
+        db.update_movie(written[-1], "Замер производительности 2", 2001, genre, "Бенчмарк",
+                        6.0, 95, "Временная запись", "")
+        return 1
+
+    def delete():
+        db.delete_movie(written.pop())
+        return 1
+
+    return [
+        Case("search_movies_page", lambda: len(db.search_movies_page()[0])),
+        Case("search_movies_page[text]", lambda: len(db.search_movies_page(word)[0])),
+        Case("search_movies_page[genre]", lambda: len(db.search_movies_page("", genre)[0])),
+        Case("search_movies[text]", lambda: len(db.search_movies(word))),
+        Case("count_movies", lambda: db.count_movies()),
+        Case("count_movies[text]", lambda: db.count_movies(word)),
+        Case("get_movies_page[rating]", lambda: len(db.get_movies_page('rating', False)[0])),
+        Case("get_movies_sorted[year]", lambda: len(db.get_movies_sorted('year'))),
+        Case("search_movies_page[sorted]",
+             lambda: len(db.search_movies_page("", genre, sort_order=[('year', False), ('rating', False)])[0])),
+        Case("get_movies_sorted[rating,title][text]",
+             lambda: len(db.get_movies_sorted([('rating', False), ('title', True)], search_text=word))),
+        Case("get_all_movies", lambda: len(db.get_all_movies())),
+        Case("iter_movies", scan),
+        Case("get_movie_by_id", point_lookups, POINT_QUERIES),
+        Case("get_movies_by_year_range", lambda: len(db.get_movies_by_year_range(1990, 1999))),
+        Case("get_movies_by_year_range_page",
+             lambda: len(db.get_movies_by_year_range_page(1990, 1999)[0])),
+        Case("get_movies_by_rating_range", lambda: len(db.get_movies_by_rating_range(8.0, 10.0))),
+        Case("get_movies_by_rating_range_page",
+             lambda: len(db.get_movies_by_rating_range_page(8.0, 10.0)[0])),
+        Case("filter_movies[combined]",
+             lambda: len(db.filter_movies(MovieFilter(word, genre, 1990, 2010, 7.0, None, limit=PAGE_SIZE)))),
+        Case("count_filtered[combined]",
+             lambda: db.count_filtered(MovieFilter(word, genre, 1990, 2010, 7.0, None))),
+        Case("search_typing", type_sql, len(typed)),
+        Case("search_typing[incremental]", type_incremental, len(typed)),
+        Case("genre_navigation", navigate, NAVIGATION_GENRES),
+        Case("genre_navigation" + CACHED_SUFFIX, navigate, NAVIGATION_GENRES),
+        Case("get_statistics", lambda: db.get_statistics().get('total', 0)),
+        Case("get_all_genres", lambda: len(db.get_all_genres())),
+        Case("add_movie", add),
+        Case("update_movie", update),
+        Case("delete_movie", delete),
+    ]
+
+
+def measure(case: Case, repeat: int = DEFAULT_REPEAT) -> Dict:
+    # Прогрев и repeat замеров одного случая, время в мс на операцию
+    rows = case.run()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = case.run()
+        samples.append((time.perf_counter() - started) * 1000 / case.ops)
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'mean_ms': round(statistics.fmean(samples), 4),
+        'rows': rows,
+    }
+
+
+def run_database(db_path: str, repeat: int = DEFAULT_REPEAT, seed: int = DEFAULT_SEED) -> Dict[str, Dict]:
+    # Замеры методов Database; добавление, изменение и удаление идут парами,
+    # чтобы каждое изменение касалось существующей записи.
+    # Кэш выборок выключен: повторные вызовы должны доходить до SQLite,
+    # он включается только для случаев с суффиксом CACHED_SUFFIX
+    db = Database(db_path, cache_entries=0)
+    results = {}
+    try:
+        cases = database_cases(db, seed)
+        writes = [case for case in cases if case.name in ("add_movie", "update_movie", "delete_movie")]
+        for case in cases:
+            if case in writes:
+                continue
+            cached = case.name.endswith(CACHED_SUFFIX)
+            if cached:
+                db.result_cache.configure(max_entries=MAX_ENTRIES)
+            results[case.name] = measure(case, repeat)
+            if cached:
+                db.result_cache.configure(max_entries=0)
+
+        add, update, delete = writes
+        samples = {case.name: [] for case in writes}
+        for _ in range(repeat + 1):
+            for case in writes:
+                started = time.perf_counter()
+                case.run()
+                samples[case.name].append((time.perf_counter() - started) * 1000)
+        for name, values in samples.items():
+            # Первый проход считается прогревом
+            values = values[1:]
+            results[name] = {
+                'median_ms': round(statistics.median(values), 4),
+                'min_ms': round(min(values), 4),
+                'mean_ms': round(statistics.fmean(values), 4),
+                'rows': 1,
+            }
+    finally:
+        db.close()
+    return results
+
+
+def run_gui(db_path: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, Dict]:
+    # Замер загрузки таблицы главного окна без экрана
+    from PyQt6.QtWidgets import QApplication
+    from main_window import MainWindow
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+
+    started = time.perf_counter()
+    window = MainWindow(db_path)
+    startup_ms = (time.perf_counter() - started) * 1000
+    results = {}
+    try:
+        def load():
+            window.load_movies()
+            app.processEvents()
+            return window.movies_model.rowCount()
+
+        results["MainWindow.__init__"] = {
+            'median_ms': round(startup_ms, 4), 'min_ms': round(startup_ms, 4),
+            'mean_ms': round(startup_ms, 4), 'rows': window.movies_model.rowCount(),
+        }
+        # Как и методы Database, загрузка замеряется без кэша выборок, а отдельно - с ним
+        window.db.result_cache.configure(0, 0)
+        results["MainWindow.load_movies"] = measure(Case("MainWindow.load_movies", load), repeat)
+        window.db.result_cache.configure(MAX_ENTRIES, MAX_ROWS)
+        name = "MainWindow.load_movies" + CACHED_SUFFIX
+        results[name] = measure(Case(name, load), repeat)
+    finally:
+        window.close()
+        app.processEvents()
+    return results
+
+
+def run(sizes=DEFAULT_SIZES, repeat: int = DEFAULT_REPEAT, workdir: str = DEFAULT_WORKDIR,
+        seed: int = DEFAULT_SEED, posters: int = DEFAULT_POSTERS, gui: bool = True) -> Dict:
+    '''
+    Полный прогон: для каждого размера строится (или берётся из кэша) каталог,
+    затем замеряются методы Database и, если gui, главное окно.
+    Возвращает словарь для сохранения в JSON.
+    '''
+    results = {}
+    for size in sizes:
+        db_path = build_catalogue(size, workdir, seed, posters)
+        size_results = run_database(db_path, repeat, seed)
+        if gui:
+            size_results.update(run_gui(db_path, repeat))
+        for name, result in size_results.items():
+            results[f"{name}@{size}"] = result
+            print(f"  {name}@{size}: {result['median_ms']:.3f} мс ({result['rows']} строк)")
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+            'posters': posters,
+            'page_size': PAGE_SIZE,
+            'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Dict]:
+    '''
+    Сравнение медиан с эталоном.
+    Возвращает строки сравнения; regression=True, если время выросло больше
+    чем на tolerance и больше чем на NOISE_FLOOR_MS.
+    '''
+    rows = []
+    base_results = baseline.get('results', {})
+    for key, result in current.get('results', {}).items():
+        base = base_results.get(key)
+        if base is None:
+            continue
+        base_ms, current_ms = base['median_ms'], result['median_ms']
+        ratio = current_ms / base_ms if base_ms else float('inf')
+        rows.append({
+            'case': key,
+            'baseline_ms': base_ms,
+            'current_ms': current_ms,
+            'ratio': round(ratio, 3),
+            'regression': (current_ms > base_ms * (1 + tolerance)
+                           and current_ms - base_ms > NOISE_FLOOR_MS),
+        })
+    return rows
+
+
+def main():
+    # Командная строка замеров
+    parser = argparse.ArgumentParser(description="Замеры производительности Видеотеки")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="размеры каталогов")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="число замеров")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="зерно генератора")
+    parser.add_argument("--posters", type=int, default=DEFAULT_POSTERS,
+                        help="число разных постеров (0 - без постеров)")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="папка для каталогов")
+    parser.add_argument("--no-gui", action="store_true", help="не замерять главное окно")
+    parser.add_argument("--output", default=None, help="файл результатов (JSON)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="файл эталона (JSON)")
+    parser.add_argument("--save-baseline", action="store_true", help="записать результаты как эталон")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="допустимое замедление (доля)")
+    args = parser.parse_args()
+
+    current = run(args.sizes, args.repeat, args.workdir, args.seed, args.posters, not args.no_gui)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"Эталон записан в {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"Эталон {args.baseline} не найден, сравнение пропущено")
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.tolerance)
+    regressions = [row for row in rows if row['regression']]
+    for row in rows:
+        mark = "  ЗАМЕДЛЕНИЕ" if row['regression'] else ""
+        print(f"  {row['case']}: {row['baseline_ms']:.3f} -> {row['current_ms']:.3f} мс "
+              f"(x{row['ratio']}){mark}")
+    print(f"Сравнено случаев: {len(rows)}, замедлений: {len(regressions)}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
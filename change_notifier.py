@@ -0,0 +1,46 @@
+'''
+Модуль оповещения интерфейса об изменениях данных.
+Передаёт события Database в сигнал Qt и периодически сверяет PRAGMA data_version,
+чтобы замечать изменения, сделанные другими процессами с тем же файлом базы.
+'''
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from database import Database
+
+
+# Период проверки изменений из других процессов (мс)
+EXTERNAL_CHECK_INTERVAL_MS = 2000
+
+
+class ChangeNotifier(QObject):
+    # Шина изменений для окон и кэшей: сигнал changed(событие)
+
+    changed = pyqtSignal(object)
+
+    def __init__(self, database: Database, interval_ms: int = EXTERNAL_CHECK_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.db = database
+
+        # Подписка хранится, чтобы её можно было снять
+        self._callback = self.changed.emit
+        self.db.subscribe(self._callback)
+
+        # Проверка версии данных - один лёгкий PRAGMA без обращения к таблицам
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.db.check_external_changes)
+        self.timer.start()
+
+    def pause(self):
+        # Приостановка проверки версии данных (пока другое подключение пишет много строк)
+        self.timer.stop()
+
+    def resume(self):
+        # Возобновление проверки: изменения за время паузы замечаются сразу
+        self.db.check_external_changes()
+        self.timer.start()
+
+    def stop(self):
+        # Остановка наблюдения (перед закрытием подключения)
+        self.timer.stop()
+        self.db.unsubscribe(self._callback)
@@ -3,29 +3,706 @@
 Управляет всеми операциями с данными о фильмах.
 '''
 
+import logging
+import os
 import sqlite3
-from typing import List, Tuple, Optional, Dict
+import string
+import threading
+from types import SimpleNamespace
+from typing import List, Tuple, Optional, Dict, Iterable, Iterator, Callable, NamedTuple, Sequence
+import instrumentation
+from instrumentation import timed
+from result_cache import ResultCache, MAX_ENTRIES, MAX_ROWS
+
+
+logger = logging.getLogger(__name__)
+
+
+# Минимальная длина запроса для поиска по триграммному индексу
+FTS_MIN_QUERY_LENGTH = 3
+
+
+# Размер страницы при постраничной выборке
+PAGE_SIZE = 200
+
+# Наборы настроек подключения (PRAGMA), режим журнала WAL общий для всех
+PRAGMA_PROFILES = {
+    # Обычная работа: фиксация без fsync на каждую транзакцию, кэш 16 МБ
+    'default': {
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Максимальная сохранность данных при сбое питания
+    'safe': {
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 0,
+        'temp_store': 'MEMORY',
+    },
+    # Массовая загрузка: большой кэш, без ожидания записи на диск
+    'bulk': {
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
+    # Экономия памяти
+    'low_memory': {
+        'synchronous': 'NORMAL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'FILE',
+    },
+}
+
+# Время ожидания блокировки другим подключением (с)
+BUSY_TIMEOUT = 5.0
+
+# Столбцы фильма: имя поля записи Movie -> выражение SQL
+MOVIE_COLUMNS = {
+    'id': 'm.id',
+    'title': 'm.title',
+    'year': 'm.year',
+    'genre': 'g.name',
+    'director': 'm.director',
+    'rating': 'm.rating',
+    'duration': 'm.duration',
+    'description': 'm.description',
+    'poster_path': 'm.poster_path',
+}
+
+# Наборы столбцов: список (без описания и постера) и полная запись
+LIST_COLUMNS = ('id', 'title', 'year', 'genre', 'director', 'rating', 'duration')
+FULL_COLUMNS = tuple(MOVIE_COLUMNS)
+
+# Размер кэша подготовленных выражений каждого подключения
+STATEMENT_CACHE_SIZE = 256
+
+
+def movie_select(columns: Sequence[str] = FULL_COLUMNS) -> str:
+    # Начало запроса фильмов с выбранными столбцами и названием жанра
+    return (f"SELECT {', '.join(MOVIE_COLUMNS[column] for column in columns)} "
+            "FROM movies m LEFT JOIN genres g ON m.genre_id = g.id")
+
+
+# Выборка столбцов списка фильмов (без описания и постера)
+MOVIE_LIST_SELECT = movie_select(LIST_COLUMNS)
+
+# Ключи сортировки: выражение SQL и позиция значения в строке списка
+SORT_KEYS = {
+    'title': ('m.title COLLATE NOCASE', 1),
+    'year': ('m.year', 2),
+    'genre': ('g.name', 3),
+    'director': ('m.director', 4),
+    'rating': ('m.rating', 5),
+    'duration': ('m.duration', 6),
+}
+
+# Ключ идентификатора, замыкающий любую сортировку
+ID_KEY = ('m.id', 0)
+
+# Условия "значение NULL" и "значение не NULL" для ключей, порядок которых индекс
+# даёт только по условию диапазона. Имя жанра: при условии на g.name SQLite читает
+# жанры индексом имён, а фильмы каждого жанра - индексом жанра в порядке ID;
+# без условия он просматривает все фильмы и сортирует их. Имя жанра пустое
+# только у фильмов без жанра: жанры не удаляются, ссылки на них не висят.
+# Полный список без страниц (filter_movies) по жанру сортируется без индекса,
+# check_query_plans отмечает такой запрос
+SORT_KEY_NULL_CONDITIONS = {
+    'g.name': ("m.genre_id IS NULL", "g.name >= ''"),
+}
+
+# Порядок страниц поиска: название без учёта регистра, затем ID
+SEARCH_PAGE_KEYS = [(*SORT_KEYS['title'], False), (*ID_KEY, False)]
+
+# Порядок таблицы по умолчанию: список пар (столбец, по возрастанию)
+DEFAULT_SORT_ORDER = (('title', True),)
+
+# Хвосты запросов фильмов по имени: текст запроса собирается один раз,
+# поэтому подключение находит готовое выражение в своём кэше (cached_statements)
+MOVIE_QUERY_TAILS = {
+    'all': " ORDER BY m.title COLLATE NOCASE",
+    'by_id': " WHERE m.id = ?",
+}
+
+# Запрос количества фильмов (условия фильтра не требуют таблицы жанров)
+MOVIE_COUNT_SELECT = "SELECT COUNT(*) FROM movies m"
+
+# Порядок выборок по диапазону лет и рейтинга
+YEAR_RANGE_SORT_ORDER = (('year', False), ('title', True))
+RATING_RANGE_SORT_ORDER = (('rating', False),)
+
+# Готовые тексты запросов: (имя, набор столбцов) -> SQL
+_movie_queries: Dict[Tuple, str] = {}
+
+
+def sort_page_keys(sort_order: Sequence[Tuple[str, bool]]) -> List[Tuple]:
+    '''
+    Ключи сортировки (выражение, позиция, по убыванию) для порядка из пар
+    (столбец, по возрастанию). Неизвестные и повторные столбцы пропускаются,
+    ID замыкает порядок в направлении первого ключа, поэтому порядок устойчив
+    и читается индексом столбца в одну сторону.
+    '''
+    keys = []
+    seen = set()
+    for column, ascending in sort_order:
+        if column in SORT_KEYS and column not in seen:
+            seen.add(column)
+            keys.append((*SORT_KEYS[column], not ascending))
+    if not keys:
+        keys.append((*SORT_KEYS['title'], False))
+    keys.append((*ID_KEY, keys[0][2]))
+    return keys
+
+
+def null_conditions(expr: str) -> Tuple[str, str]:
+    # Условия "NULL" и "не NULL" для выражения ключа сортировки
+    return SORT_KEY_NULL_CONDITIONS.get(expr, (f"{expr} IS NULL", f"{expr} IS NOT NULL"))
+
+
+def order_by_clause(keys: List[Tuple]) -> str:
+    # Текст ORDER BY для ключей сортировки
+    return " ORDER BY " + ", ".join(
+        f"{expr} {'DESC' if descending else 'ASC'}" for expr, _, descending in keys
+    )
+
+
+def movie_query(name, columns: Sequence[str] = FULL_COLUMNS) -> str:
+    # Текст запроса из реестра для набора столбцов
+    key = (name, tuple(columns))
+    query = _movie_queries.get(key)
+    if query is None:
+        unknown = [column for column in columns if column not in MOVIE_COLUMNS]
+        if unknown:
+            raise ValueError(f"Неизвестные столбцы фильма: {', '.join(unknown)}")
+        query = _movie_queries[key] = movie_select(columns) + MOVIE_QUERY_TAILS[name]
+    return query
+
+
+# Сопоставление NOCASE в SQLite приводит к нижнему регистру только латиницу
+_NOCASE_TABLE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Типы изменений фильма
+CHANGE_INSERTED = 'inserted'
+CHANGE_UPDATED = 'updated'
+CHANGE_DELETED = 'deleted'
+
+# Тип изменения жанров
+CHANGE_GENRE_CREATED = 'genre_created'
+
+# Изменения, после которых данные нужно перечитать целиком
+CHANGE_BULK = 'bulk'
+CHANGE_EXTERNAL = 'external'
+
+# Полный пересчёт сводных таблиц статистики
+STATISTICS_REBUILD = [
+    "DELETE FROM stats_totals",
+    "DELETE FROM stats_by_genre",
+    "DELETE FROM stats_by_year",
+    """
+    INSERT INTO stats_totals (id, movie_count, rating_sum, rating_count, duration_sum, best_movie_id)
+    SELECT 1, COUNT(*), IFNULL(SUM(rating), 0), COUNT(rating), IFNULL(SUM(duration), 0),
+           (SELECT id FROM movies ORDER BY rating DESC LIMIT 1)
+    FROM movies
+    """,
+    "INSERT INTO stats_by_genre (genre_id, movie_count) SELECT genre_id, COUNT(*) FROM movies GROUP BY genre_id",
+    "INSERT INTO stats_by_year (year, movie_count) SELECT year, COUNT(*) FROM movies GROUP BY year",
+]
+
+# Сводные таблицы статистики: их строк не больше, чем жанров и лет, полный просмотр допустим
+SUMMARY_TABLES = ('stats_totals', 'stats_by_genre', 'stats_by_year')
+
+# Полный пересчёт счётчиков ссылок на файлы постеров
+POSTER_REFS_REBUILD = [
+    "DELETE FROM poster_refs",
+    """
+    INSERT INTO poster_refs (path, ref_count)
+    SELECT poster_path, COUNT(*) FROM movies
+    WHERE IFNULL(poster_path, '') != ''
+    GROUP BY poster_path
+    """,
+]
+
+# Размер пакета вставки при массовом импорте
+IMPORT_BATCH_SIZE = 5000
+
+# Версионированные шаги схемы (PRAGMA user_version)
+SCHEMA_MIGRATIONS = [
+    # 1: индексы для сортировки, диапазонов года и рейтинга и связи с жанрами
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_movies_title ON movies (title COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_year ON movies (year DESC, title COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies (rating)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_genre ON movies (genre_id)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_director ON movies (director)",
+        "CREATE INDEX IF NOT EXISTS idx_movies_duration ON movies (duration)",
+    ]),
+    # 2: сводные таблицы статистики, поддерживаемые триггерами
+    (2, [
+        """
+        CREATE TABLE IF NOT EXISTS stats_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            movie_count INTEGER NOT NULL,
+            rating_sum REAL NOT NULL,
+            rating_count INTEGER NOT NULL,
+            duration_sum INTEGER NOT NULL,
+            best_movie_id INTEGER
+        )
+        """,
+        # Ключи могут быть NULL, поэтому строки ищутся через IS, а не по первичному ключу
+        "CREATE TABLE IF NOT EXISTS stats_by_genre (genre_id INTEGER, movie_count INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS stats_by_year (year INTEGER, movie_count INTEGER NOT NULL)",
+        # Сортировка статистики по годам и поиск строки года в триггерах
+        "CREATE INDEX IF NOT EXISTS idx_stats_by_year ON stats_by_year (year)",
+        """
+        CREATE TRIGGER IF NOT EXISTS movies_stats_insert AFTER INSERT ON movies BEGIN
+            UPDATE stats_totals SET
+                movie_count = movie_count + 1,
+                rating_sum = rating_sum + IFNULL(new.rating, 0),
+                rating_count = rating_count + (new.rating IS NOT NULL),
+                duration_sum = duration_sum + IFNULL(new.duration, 0),
+                best_movie_id = (SELECT id FROM movies ORDER BY rating DESC LIMIT 1);
+            INSERT INTO stats_by_genre (genre_id, movie_count)
+                SELECT new.genre_id, 0
+                WHERE NOT EXISTS (SELECT 1 FROM stats_by_genre WHERE genre_id IS new.genre_id);
+            UPDATE stats_by_genre SET movie_count = movie_count + 1 WHERE genre_id IS new.genre_id;
+            INSERT INTO stats_by_year (year, movie_count)
+                SELECT new.year, 0
+                WHERE NOT EXISTS (SELECT 1 FROM stats_by_year WHERE year IS new.year);
+            UPDATE stats_by_year SET movie_count = movie_count + 1 WHERE year IS new.year;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS movies_stats_delete AFTER DELETE ON movies BEGIN
+            UPDATE stats_totals SET
+                movie_count = movie_count - 1,
+                rating_sum = rating_sum - IFNULL(old.rating, 0),
+                rating_count = rating_count - (old.rating IS NOT NULL),
+                duration_sum = duration_sum - IFNULL(old.duration, 0),
+                best_movie_id = (SELECT id FROM movies ORDER BY rating DESC LIMIT 1);
+            UPDATE stats_by_genre SET movie_count = movie_count - 1 WHERE genre_id IS old.genre_id;
+            DELETE FROM stats_by_genre WHERE genre_id IS old.genre_id AND movie_count <= 0;
+            UPDATE stats_by_year SET movie_count = movie_count - 1 WHERE year IS old.year;
+            DELETE FROM stats_by_year WHERE year IS old.year AND movie_count <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS movies_stats_update
+        AFTER UPDATE OF year, genre_id, rating, duration ON movies BEGIN
+            UPDATE stats_totals SET
+                rating_sum = rating_sum - IFNULL(old.rating, 0) + IFNULL(new.rating, 0),
+                rating_count = rating_count - (old.rating IS NOT NULL) + (new.rating IS NOT NULL),
+                duration_sum = duration_sum - IFNULL(old.duration, 0) + IFNULL(new.duration, 0),
+                best_movie_id = (SELECT id FROM movies ORDER BY rating DESC LIMIT 1);
+            UPDATE stats_by_genre SET movie_count = movie_count - 1 WHERE genre_id IS old.genre_id;
+            DELETE FROM stats_by_genre WHERE genre_id IS old.genre_id AND movie_count <= 0;
+            INSERT INTO stats_by_genre (genre_id, movie_count)
+                SELECT new.genre_id, 0
+                WHERE NOT EXISTS (SELECT 1 FROM stats_by_genre WHERE genre_id IS new.genre_id);
+            UPDATE stats_by_genre SET movie_count = movie_count + 1 WHERE genre_id IS new.genre_id;
+            UPDATE stats_by_year SET movie_count = movie_count - 1 WHERE year IS old.year;
+            DELETE FROM stats_by_year WHERE year IS old.year AND movie_count <= 0;
+            INSERT INTO stats_by_year (year, movie_count)
+                SELECT new.year, 0
+                WHERE NOT EXISTS (SELECT 1 FROM stats_by_year WHERE year IS new.year);
+            UPDATE stats_by_year SET movie_count = movie_count + 1 WHERE year IS new.year;
+        END
+        """,
+        *STATISTICS_REBUILD,
+    ]),
+    # 3: счётчики ссылок на файлы постеров для дедупликации и сборки мусора
+    (3, [
+        "CREATE TABLE IF NOT EXISTS poster_refs (path TEXT PRIMARY KEY, ref_count INTEGER NOT NULL)",
+        """
+        CREATE TRIGGER IF NOT EXISTS movies_posters_insert AFTER INSERT ON movies
+        WHEN IFNULL(new.poster_path, '') != '' BEGIN
+            INSERT INTO poster_refs (path, ref_count) VALUES (new.poster_path, 1)
+            ON CONFLICT (path) DO UPDATE SET ref_count = ref_count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS movies_posters_delete AFTER DELETE ON movies
+        WHEN IFNULL(old.poster_path, '') != '' BEGIN
+            UPDATE poster_refs SET ref_count = ref_count - 1 WHERE path = old.poster_path;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS movies_posters_update AFTER UPDATE OF poster_path ON movies
+        WHEN old.poster_path IS NOT new.poster_path BEGIN
+            UPDATE poster_refs SET ref_count = ref_count - 1
+            WHERE path = old.poster_path;
+            INSERT INTO poster_refs (path, ref_count)
+            SELECT new.poster_path, 1 WHERE IFNULL(new.poster_path, '') != ''
+            ON CONFLICT (path) DO UPDATE SET ref_count = ref_count + 1;
+        END
+        """,
+        *POSTER_REFS_REBUILD,
+    ]),
+    # 4: названия внутри жанра в порядке индекса (фильтр по жанру с сортировкой по названию)
+    (4, [
+        "CREATE INDEX IF NOT EXISTS idx_movies_genre_title ON movies (genre_id, title COLLATE NOCASE)",
+    ]),
+    # 5: год в порядке страниц сортировки по году (год, затем ID): idx_movies_year
+    # упорядочен по году и названию и оставлял досортировку строк каждого года
+    (5, [
+        "CREATE INDEX IF NOT EXISTS idx_movies_year_id ON movies (year)",
+    ]),
+]
+
+
+def _unicode_lower(value):
+    # Приведение строки к нижнему регистру с поддержкой Unicode
+    return value.lower() if value is not None else None
+
+
+def _normalize_movie_record(record: Dict) -> Tuple:
+    # Проверка и приведение типов записи импорта, при ошибке ValueError
+    # Обязательны те же поля, что и в окне добавления: название, год, жанр и режиссёр
+    def text(name):
+        value = record.get(name)
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value if value else None
+    
+    def number(name, convert):
+        value = text(name)
+        if value is None:
+            return None
+        try:
+            return convert(value.replace(',', '.') if convert is float else value)
+        except ValueError:
+            raise ValueError(f"Некорректное значение поля {name}: {value}")
+    
+    title = text('title')
+    if not title:
+        raise ValueError("Не указано название фильма")
+    
+    year = number('year', int)
+    if year is None:
+        raise ValueError("Не указан год выпуска")
+    if not 1800 <= year <= 2100:
+        raise ValueError(f"Год вне диапазона 1800-2100: {year}")
+    
+    genre = text('genre')
+    if not genre:
+        raise ValueError("Не указан жанр")
+    
+    director = text('director')
+    if not director:
+        raise ValueError("Не указан режиссёр")
+    
+    rating = number('rating', float)
+    if rating is not None and not 0 <= rating <= 10:
+        raise ValueError(f"Рейтинг вне диапазона 0-10: {rating}")
+    
+    duration = number('duration', int)
+    if duration is not None and duration <= 0:
+        raise ValueError(f"Длительность должна быть больше 0: {duration}")
+    
+    return (title, year, genre, director, rating, duration,
+            text('description') or "", text('poster_path') or "")
+
+
+class Movie(NamedTuple):
+    # Запись фильма; при выборке части столбцов остальные поля равны None
+    id: Optional[int] = None
+    title: Optional[str] = None
+    year: Optional[int] = None
+    genre: Optional[str] = None
+    director: Optional[str] = None
+    rating: Optional[float] = None
+    duration: Optional[int] = None
+    description: Optional[str] = None
+    poster_path: Optional[str] = None
+
+
+def movie_records(rows: List[Tuple], columns: Sequence[str] = FULL_COLUMNS) -> List[Movie]:
+    # Преобразование строк выборки в записи Movie
+    if tuple(columns) == FULL_COLUMNS[:len(columns)]:
+        # Столбцы идут в порядке полей записи - строка подставляется как есть
+        return [Movie(*row) for row in rows]
+    return [Movie(**dict(zip(columns, row))) for row in rows]
+
+
+class MovieFilter(NamedTuple):
+    '''
+    Условия выборки фильмов: поиск по названию, жанр, диапазоны года и рейтинга
+    (любая граница может отсутствовать), порядок из пар (столбец, по возрастанию)
+    и предел числа строк. Database собирает по нему один параметризованный запрос.
+    '''
+    search_text: str = ""
+    genre: str = "Все жанры"
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+    rating_from: Optional[float] = None
+    rating_to: Optional[float] = None
+    sort_order: Tuple = DEFAULT_SORT_ORDER
+    limit: Optional[int] = None
+    
+    def normalized(self) -> 'MovieFilter':
+        # Приведённый вид: поиск без пробелов по краям, порядок - кортеж пар
+        return self._replace(
+            search_text=(self.search_text or "").strip(),
+            sort_order=tuple((column, bool(ascending)) for column, ascending in self.sort_order),
+        )
+
+
+class MovieChange(NamedTuple):
+    # Результат записи: тип изменения (CHANGE_*) и ID затронутого фильма
+    kind: str
+    movie_id: int
+
+
+class GenreChange(NamedTuple):
+    # Создан новый жанр
+    kind: str
+    genre_id: int
+    name: str
+
+
+class DataReset(NamedTuple):
+    # Изменено много строк сразу (CHANGE_BULK) или другим процессом (CHANGE_EXTERNAL)
+    kind: str
+
+
+def compare_sort_values(keys: List[Tuple], left: Tuple, right: Tuple) -> int:
+    '''
+    Сравнение значений ключей сортировки двух строк по правилам ORDER BY в SQLite:
+    NULL меньше любого значения, NOCASE не различает регистр латиницы.
+    Возвращает -1, 0 или 1.
+    '''
+    for (expr, _, descending), a, b in zip(keys, left, right):
+        if expr.endswith("COLLATE NOCASE") and a is not None and b is not None:
+            a = a.translate(_NOCASE_TABLE)
+            b = b.translate(_NOCASE_TABLE)
+        if a == b:
+            continue
+        if a is None:
+            result = -1
+        elif b is None:
+            result = 1
+        else:
+            result = -1 if a < b else 1
+        return -result if descending else result
+    return 0
+
+
+def sort_value_key(expr: str) -> Callable:
+    '''
+    Функция ключа Python, упорядочивающая значения столбца так же, как ORDER BY
+    в SQLite: NULL первым, NOCASE без учёта регистра латиницы.
+    '''
+    if expr.endswith("COLLATE NOCASE"):
+        return lambda value: (False, "") if value is None else (True, value.translate(_NOCASE_TABLE))
+    return lambda value: (value is not None, value)
 
 
 class Database:
     # Класс для работы с базой данных фильмов
     
-    def __init__(self, db_name: str = "movies.db"):
+    # Каждый поток получает собственное подключение к файлу базы (режим WAL),
+    # поэтому один объект Database можно использовать из GUI и фоновых потоков
+    
+    def __init__(self, db_name: str = "movies.db", profile: str = "default",
+                 cache_entries: int = MAX_ENTRIES, cache_rows: int = MAX_ROWS,
+                 result_cache: Optional[ResultCache] = None):
         # Инициализация подключения к базе данных
+        # cache_entries и cache_rows - пределы кэша выборок (0 выключает кэш),
+        # result_cache - общий кэш другого объекта Database с тем же файлом
         self.db_name = db_name
-        self.connection = None
-        self.cursor = None
+        self.profile = profile if profile in PRAGMA_PROFILES else "default"
+        # Подключение и курсор каждого потока по его идентификатору.
+        # threading.local не подходит: в потоках Qt Python заново создаёт состояние
+        # потока при каждом вызове слота, и данные threading.local теряются.
+        # Идентификатор завершившегося потока Python может выдать новому потоку:
+        # тот продолжит работать с подключением прежнего (check_same_thread=False),
+        # что безопасно, потому что прежний поток уже не выполняется.
+        # Поток, который больше не будет обращаться к базе, освобождает подключение release_thread
+        self._thread_states: Dict[int, SimpleNamespace] = {}
+        # Все открытые подключения, чтобы закрыть или прервать их из любого потока
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._closed = False
+        self.fts_enabled = False
+        # Кэш жанров в обе стороны (None - ещё не загружен)
+        self._genre_ids: Optional[Dict[str, int]] = None
+        self._genre_names: Optional[Dict[int, str]] = None
+        # Подписчики на события изменения данных
+        self._subscribers: List[Callable] = []
+        # Последнее известное значение PRAGMA data_version
+        self._data_version: Optional[int] = None
+        # Кэш результатов выборок по фильтру, сбрасывается при любом изменении данных
+        # Общий кэш принадлежит создавшему его объекту, счётчики показывает он
+        # (выключенный кэш в окне диагностики не показывается)
+        self._owns_result_cache = result_cache is None
+        self.result_cache = ResultCache(cache_entries, cache_rows) if result_cache is None else result_cache
+        self._counters_name: Optional[str] = None
+        if self._owns_result_cache and self.result_cache.enabled:
+            self._counters_name = instrumentation.add_counters(
+                f"Кэш выборок ({os.path.basename(db_name)})", self.result_cache.stats
+            )
+        # Трассировка SQL включается и выключается вместе со сбором замеров
+        instrumentation.add_listener(self._set_sql_trace)
         self.connect()
         self.create_table()
+        self._data_version = self.data_version()
+    
+    def subscribe(self, callback: Callable):
+        '''
+        Подписка на изменения данных.
+        callback(событие) вызывается после фиксации транзакции в потоке, который её выполнил.
+        События: MovieChange, GenreChange, DataReset.
+        '''
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback: Callable):
+        # Отмена подписки на изменения
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+    
+    def _publish(self, event):
+        # Оповещение подписчиков, ошибка одного обработчика не мешает остальным
+        # Кэш выборок сбрасывается до оповещения: подписчики перечитывают уже новые данные
+        self.result_cache.invalidate()
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("Ошибка обработчика изменений: %s", e)
+    
+    def data_version(self) -> Optional[int]:
+        # Счётчик PRAGMA data_version: меняется, когда базу изменило другое подключение
+        try:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+        except (sqlite3.Error, AttributeError) as e:
+            logger.error("Ошибка чтения версии данных: %s", e)
+            return None
+    
+    def check_external_changes(self) -> bool:
+        # Проверка изменений из других подключений, при изменении подписчики получают DataReset
+        version = self.data_version()
+        if version is None or version == self._data_version:
+            return False
+        self._data_version = version
+        self.invalidate_genre_cache()
+        self._publish(DataReset(CHANGE_EXTERNAL))
+        return True
+    
+    def _validate_result_cache(self):
+        '''
+        Сверка PRAGMA data_version подключения текущего потока перед чтением из кэша.
+        Счётчик меняется после записи любым другим подключением (другой поток или процесс),
+        тогда кэш сбрасывается. Первая проверка в потоке тоже сбрасывает кэш:
+        изменения до открытия подключения этому потоку не видны.
+        '''
+        version = self.data_version()
+        if version is None or version != getattr(self._local, 'cache_version', None):
+            self._local.cache_version = version
+            self.result_cache.invalidate()
+    
+    def data_generation(self) -> int:
+        # Номер поколения данных: меняется после любой записи через Database
+        # и после записи другим подключением (по PRAGMA data_version)
+        self._validate_result_cache()
+        return self.result_cache.generation
+    
+    def _cache_lookup(self, key) -> Tuple[Optional[object], int]:
+        # Результат из кэша (None - промах) и поколение кэша для сохранения нового результата
+        if not self.result_cache.enabled:
+            return None, self.result_cache.generation
+        self._validate_result_cache()
+        return self.result_cache.get(key), self.result_cache.generation
+    
+    @property
+    def _local(self) -> SimpleNamespace:
+        # Состояние текущего потока: подключение, курсор и версия данных для кэша выборок
+        return self._thread_states.setdefault(threading.get_ident(), SimpleNamespace())
+    
+    def release_thread(self):
+        # Закрытие подключения текущего потока (вызывается потоком перед завершением),
+        # остальные потоки продолжают работать со своими подключениями
+        state = self._thread_states.pop(threading.get_ident(), None)
+        connection = getattr(state, 'connection', None)
+        if connection is None:
+            return
+        with self._connections_lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+    
+    @property
+    def connection(self) -> Optional[sqlite3.Connection]:
+        # Подключение текущего потока (открывается при первом обращении из потока)
+        # После close, как и у закрытого sqlite3.Connection, - sqlite3.ProgrammingError,
+        # который методы класса обрабатывают вместе с остальными ошибками SQLite
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self.connect()
+            connection = getattr(self._local, 'connection', None)
+        return connection
+    
+    @property
+    def cursor(self) -> Optional[sqlite3.Cursor]:
+        # Курсор подключения текущего потока
+        if self.connection is None:
+            return None
+        return self._local.cursor
     
     def connect(self):
-        # Создание подключения к SQLite
+        # Создание подключения к SQLite для текущего потока
         try:
-            self.connection = sqlite3.connect(self.db_name)
-            self.cursor = self.connection.cursor()
-            print(f"Подключение к базе данных {self.db_name} установлено")
+            # Подключение используется только своим потоком, закрыть его можно из любого
+            connection = sqlite3.connect(self.db_name, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                                         cached_statements=STATEMENT_CACHE_SIZE)
+            # Регистронезависимое сравнение для кириллицы (встроенный lower() понимает только ASCII)
+            connection.create_function("unicode_lower", 1, _unicode_lower, deterministic=True)
+            # Журнал WAL: чтение не блокируется записью, фиксация не требует полного fsync
+            mode = connection.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning("Режим WAL недоступен, используется журнал %s", mode)
+            self._apply_profile(connection, self.profile)
+            # Тексты запросов передаются в сбор замеров, только пока он включён
+            if instrumentation.is_enabled():
+                connection.set_trace_callback(instrumentation.trace_sql)
+            self._local.connection = connection
+            self._local.cursor = connection.cursor()
+            with self._connections_lock:
+                self._connections.append(connection)
+            logger.debug("Подключение к базе данных %s установлено", self.db_name)
         except sqlite3.Error as e:
-            print(f"Ошибка подключения к БД: {e}")
+            logger.error("Ошибка подключения к БД: %s", e)
+    
+    def _apply_profile(self, connection: sqlite3.Connection, profile: str):
+        # Применение набора PRAGMA к подключению
+        for name, value in PRAGMA_PROFILES[profile].items():
+            connection.execute(f"PRAGMA {name} = {value}")
+    
+    def set_profile(self, profile: str):
+        # Смена набора настроек: сразу для текущего потока, для остальных - при подключении
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Неизвестный профиль подключения: {profile}")
+        self.profile = profile
+        if not self._closed and self.connection is not None:
+            self._apply_profile(self.connection, profile)
+    
+    def _set_sql_trace(self, enabled: bool):
+        # Установка или снятие обработчика трассировки SQL на всех подключениях
+        callback = instrumentation.trace_sql if enabled else None
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.set_trace_callback(callback)
+    
+    def interrupt(self):
+        # Прерывание запросов, выполняющихся во всех подключениях (из любого потока)
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.interrupt()
     
     def create_table(self):
         # Создание таблицы genres если её нет
@@ -55,19 +732,104 @@ class Database:
             self.cursor.execute(create_genres_query)
             self.cursor.execute(create_movies_query)
             self.connection.commit()
-            print("Таблицы movies и genres созданы или уже существуют")
+            logger.debug("Таблицы movies и genres созданы или уже существуют")
             
             # Проверяем, есть ли старая структура (genre как TEXT)
             self.cursor.execute("PRAGMA table_info(movies)")
             columns = [row[1] for row in self.cursor.fetchall()]
             if 'genre' in columns:
-                print("Обнаружена старая структура БД, выполняем миграцию...")
+                logger.info("Обнаружена старая структура БД, выполняем миграцию...")
                 self._migrate_to_genres()
             else:
                 # Заполняем базовые жанры если таблица пустая
                 self._init_default_genres()
+            
+            # Создаём полнотекстовый индекс для поиска
+            self._create_search_index()
+            
+            # Применяем недостающие шаги схемы
+            self._upgrade_schema()
         except sqlite3.Error as e:
-            print(f"Ошибка создания таблиц: {e}")
+            logger.error("Ошибка создания таблиц: %s", e)
+        # Миграции и смена индекса поиска могли изменить выборки
+        self.result_cache.invalidate()
+    
+    def _upgrade_schema(self):
+        # Применение версионированных шагов схемы по PRAGMA user_version
+        self.cursor.execute("PRAGMA user_version")
+        current_version = self.cursor.fetchone()[0]
+        
+        for version, statements in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            try:
+                for statement in statements:
+                    self.cursor.execute(statement)
+                # PRAGMA не принимает параметры, версия берётся из списка шагов
+                self.cursor.execute(f"PRAGMA user_version = {int(version)}")
+                self.connection.commit()
+                logger.info("Схема базы данных обновлена до версии %s", version)
+            except sqlite3.Error as e:
+                logger.error("Ошибка обновления схемы до версии %s: %s", version, e)
+                self.connection.rollback()
+                return
+    
+    def _create_search_index(self):
+        # Создание FTS5-индекса по названию, режиссёру и описанию
+        try:
+            self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movies_fts'"
+            )
+            index_exists = self.cursor.fetchone() is not None
+            
+            # Внешний контент: в индексе хранятся только триграммы, сами строки остаются в movies
+            self.cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+                    title, director, description,
+                    content='movies', content_rowid='id',
+                    tokenize='trigram'
+                )
+            """)
+            
+            # Триггеры поддерживают индекс в актуальном состоянии
+            self.cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies BEGIN
+                    INSERT INTO movies_fts (rowid, title, director, description)
+                    VALUES (new.id, new.title, new.director, new.description);
+                END
+            """)
+            self.cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies BEGIN
+                    INSERT INTO movies_fts (movies_fts, rowid, title, director, description)
+                    VALUES ('delete', old.id, old.title, old.director, old.description);
+                END
+            """)
+            # Запись индекса переписывается только при изменении индексируемого текста
+            self.cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS movies_fts_update
+                AFTER UPDATE OF title, director, description ON movies BEGIN
+                    INSERT INTO movies_fts (movies_fts, rowid, title, director, description)
+                    VALUES ('delete', old.id, old.title, old.director, old.description);
+                    INSERT INTO movies_fts (rowid, title, director, description)
+                    VALUES (new.id, new.title, new.director, new.description);
+                END
+            """)
+            
+            # Для уже существующих баз индекс строится один раз
+            if not index_exists:
+                self.rebuild_search_index()
+            
+            self.connection.commit()
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            # SQLite без FTS5 или trigram: поиск работает без индекса
+            logger.warning("Полнотекстовый индекс недоступен: %s", e)
+            self.connection.rollback()
+    
+    def rebuild_search_index(self):
+        # Полная перестройка полнотекстового индекса по таблице movies
+        self.cursor.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+        logger.info("Полнотекстовый индекс фильмов построен")
     
     def _migrate_to_genres(self):
         # Миграция старой структуры с genre TEXT на genre_id INTEGER
@@ -109,9 +871,9 @@ class Database:
             self.cursor.execute("ALTER TABLE movies_new RENAME TO movies")
             
             self.connection.commit()
-            print("Миграция базы данных завершена успешно")
+            logger.info("Миграция базы данных завершена успешно")
         except sqlite3.Error as e:
-            print(f"Ошибка миграции: {e}")
+            logger.error("Ошибка миграции: %s", e)
             self.connection.rollback()
     
     def _init_default_genres(self):
@@ -121,57 +883,88 @@ class Database:
             'Ужасы', 'Детектив', 'Мелодрама', 'Приключения', 'Криминал'
         ]
         try:
-            for genre in default_genres:
-                self.cursor.execute("INSERT OR IGNORE INTO genres (name) VALUES (?)", (genre,))
+            # Жанры добавляются только в пустую таблицу: иначе фиксация без изменений
+            # меняет PRAGMA data_version, и другие подключения видят ложное внешнее изменение
+            self.cursor.execute("SELECT 1 FROM genres LIMIT 1")
+            if self.cursor.fetchone() is not None:
+                return
+            self.cursor.executemany("INSERT INTO genres (name) VALUES (?)",
+                                    [(genre,) for genre in default_genres])
             self.connection.commit()
         except sqlite3.Error as e:
-            print(f"Ошибка инициализации жанров: {e}")
+            logger.error("Ошибка инициализации жанров: %s", e)
     
+    def _genre_cache(self) -> Dict[str, int]:
+        # Словарь жанров "название -> ID", загружается из базы один раз
+        if self._genre_ids is None:
+            self.cursor.execute("SELECT id, name FROM genres")
+            rows = self.cursor.fetchall()
+            self._genre_ids = {name: genre_id for genre_id, name in rows}
+            self._genre_names = dict(rows)
+        return self._genre_ids
+    
+    def invalidate_genre_cache(self):
+        # Сброс кэша жанров (после изменений в обход get_or_create_genre)
+        self._genre_ids = None
+        self._genre_names = None
+    
+    @timed()
     def get_or_create_genre(self, genre_name: str) -> int:
         # Получение ID жанра или создание нового если не существует
         try:
-            # Ищем существующий жанр
-            self.cursor.execute("SELECT id FROM genres WHERE name = ?", (genre_name,))
-            result = self.cursor.fetchone()
+            # Ищем существующий жанр в кэше
+            genre_id = self._genre_cache().get(genre_name)
+            if genre_id is not None:
+                return genre_id
             
-            if result:
-                return result[0]
-            else:
-                # Создаем новый жанр
+            # Создаем новый жанр
+            try:
                 self.cursor.execute("INSERT INTO genres (name) VALUES (?)", (genre_name,))
-                self.connection.commit()
-                return self.cursor.lastrowid
-        except sqlite3.Error as e:
-            print(f"Ошибка работы с жанром: {e}")
+            except sqlite3.IntegrityError:
+                # Жанр уже создан другим процессом: кэш устарел
+                self.connection.rollback()
+                self.invalidate_genre_cache()
+                return self._genre_cache()[genre_name]
+            genre_id = self.cursor.lastrowid
+            self.connection.commit()
+            self._genre_ids[genre_name] = genre_id
+            self._genre_names[genre_id] = genre_name
+            self._publish(GenreChange(CHANGE_GENRE_CREATED, genre_id, genre_name))
+            return genre_id
+        except (sqlite3.Error, KeyError) as e:
+            logger.error("Ошибка работы с жанром: %s", e)
             return None
     
+    @timed()
     def get_all_genres(self) -> List[Tuple]:
-        # Получение всех жанров
+        # Получение всех жанров (из кэша, в порядке ORDER BY name)
         try:
-            self.cursor.execute("SELECT id, name FROM genres ORDER BY name")
-            return self.cursor.fetchall()
+            self._genre_cache()
+            return sorted(self._genre_names.items(), key=lambda item: item[1])
         except sqlite3.Error as e:
-            print(f"Ошибка получения жанров: {e}")
+            logger.error("Ошибка получения жанров: %s", e)
             return []
     
     def get_genre_name_by_id(self, genre_id: int) -> str:
         # Получение названия жанра по ID
         try:
-            self.cursor.execute("SELECT name FROM genres WHERE id = ?", (genre_id,))
-            result = self.cursor.fetchone()
-            return result[0] if result else ""
+            self._genre_cache()
+            return self._genre_names.get(genre_id, "")
         except sqlite3.Error as e:
-            print(f"Ошибка получения названия жанра: {e}")
+            logger.error("Ошибка получения названия жанра: %s", e)
             return ""
     
+    @timed()
     def add_movie(self, title: str, year: int, genre: str, director: str, 
-                  rating: float, duration: int, description: str, poster_path: str) -> bool:
+                  rating: float, duration: int, description: str,
+                  poster_path: str) -> Optional[MovieChange]:
         # Добавление нового фильма в базу
+        # Возвращает изменение с ID новой строки или None при ошибке
         try:
             # Получаем или создаем жанр
             genre_id = self.get_or_create_genre(genre)
             if genre_id is None:
-                return False
+                return None
             
             insert_query = """
             INSERT INTO movies (title, year, genre_id, director, rating, duration, description, poster_path)
@@ -179,52 +972,171 @@ class Database:
             """
             self.cursor.execute(insert_query, 
                               (title, year, genre_id, director, rating, duration, description, poster_path))
+            movie_id = self.cursor.lastrowid
             self.connection.commit()
-            print(f"Фильм '{title}' добавлен в базу данных")
-            return True
+            logger.debug("Фильм '%s' добавлен в базу данных", title)
+            change = MovieChange(CHANGE_INSERTED, movie_id)
+            self._publish(change)
+            return change
         except sqlite3.Error as e:
-            print(f"Ошибка добавления фильма: {e}")
-            return False
+            logger.error("Ошибка добавления фильма: %s", e)
+            return None
     
-    def get_all_movies(self) -> List[Tuple]:
-        # Получение всех фильмов из базы с названиями жанров
-        select_query = """
-        SELECT m.id, m.title, m.year, g.name, m.director, m.rating, m.duration, m.description, m.poster_path
-        FROM movies m
-        LEFT JOIN genres g ON m.genre_id = g.id
-        ORDER BY m.title
+    def _resolve_genres(self, genre_names: Iterable[str], genre_ids: Dict[str, int]):
+        # Получение ID для набора жанров одним проходом, недостающие создаются
+        missing = sorted({name for name in genre_names if name and name not in genre_ids})
+        if not missing:
+            return
+        self.cursor.executemany(
+            "INSERT OR IGNORE INTO genres (name) VALUES (?)",
+            [(name,) for name in missing]
+        )
+        placeholders = ", ".join("?" for _ in missing)
+        self.cursor.execute(f"SELECT name, id FROM genres WHERE name IN ({placeholders})", missing)
+        genre_ids.update(self.cursor.fetchall())
+    
+    @timed()
+    def bulk_add_movies(self, records: Iterable, batch_size: int = IMPORT_BATCH_SIZE,
+                        progress: Optional[Callable[[int, int], bool]] = None) -> Dict:
+        '''
+        Массовое добавление фильмов из итерируемого источника записей (словарей).
+        Записи вставляются пакетами через executemany, каждый пакет в своей транзакции.
+        Некорректные записи пропускаются и попадают в список отклонённых.
+        progress(обработано, добавлено) вызывается после каждого пакета,
+        возврат False прерывает импорт.
+        '''
+        result = {'processed': 0, 'inserted': 0, 'rejected': [], 'cancelled': False}
+        
+        insert_query = """
+        INSERT INTO movies (title, year, genre_id, director, rating, duration, description, poster_path)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """
+        
         try:
-            self.cursor.execute(select_query)
-            return self.cursor.fetchall()
+            # Словарь жанров загружается один раз на весь импорт
+            genre_ids = {name: genre_id for genre_id, name in self.get_all_genres()}
         except sqlite3.Error as e:
-            print(f"Ошибка получения списка фильмов: {e}")
+            logger.error("Ошибка загрузки жанров: %s", e)
+            return result
+        
+        def flush(batch):
+            # Вставка пакета: при ошибке пакет разбирается построчно
+            try:
+                self._resolve_genres((row[2] for _, row in batch), genre_ids)
+                rows = [(r[0], r[1], genre_ids.get(r[2]), *r[3:]) for _, r in batch]
+                self.cursor.executemany(insert_query, rows)
+                self.connection.commit()
+                return len(rows)
+            except sqlite3.Error:
+                self.connection.rollback()
+                # Созданные в откатившейся транзакции жанры больше не существуют
+                self.invalidate_genre_cache()
+                genre_ids.clear()
+                genre_ids.update((name, genre_id) for genre_id, name in self.get_all_genres())
+            
+            inserted = 0
+            for row_number, row in batch:
+                try:
+                    self._resolve_genres([row[2]], genre_ids)
+                    self.cursor.execute(insert_query, (row[0], row[1], genre_ids.get(row[2]), *row[3:]))
+                    inserted += 1
+                except sqlite3.Error as e:
+                    result['rejected'].append((row_number, str(e)))
+            self.connection.commit()
+            return inserted
+        
+        # На время импорта подключение переходит на профиль массовой загрузки
+        self._apply_profile(self.connection, 'bulk')
+        
+        # Событие публикуется и при ошибке чтения источника: часть пакетов уже зафиксирована
+        try:
+            batch = []
+            for row_number, record in enumerate(records, start=1):
+                result['processed'] += 1
+                try:
+                    if isinstance(record, Exception):
+                        raise ValueError(str(record))
+                    if not isinstance(record, dict):
+                        raise ValueError("Некорректная запись")
+                    batch.append((row_number, _normalize_movie_record(record)))
+                except ValueError as e:
+                    result['rejected'].append((row_number, str(e)))
+                
+                if len(batch) >= batch_size:
+                    result['inserted'] += flush(batch)
+                    batch = []
+                    if progress is not None and progress(result['processed'], result['inserted']) is False:
+                        result['cancelled'] = True
+                        break
+            
+            if batch and not result['cancelled']:
+                result['inserted'] += flush(batch)
+            if progress is not None and not result['cancelled']:
+                progress(result['processed'], result['inserted'])
+        finally:
+            self._apply_profile(self.connection, self.profile)
+            # Жанры могли добавиться пакетными вставками в обход кэша
+            self.invalidate_genre_cache()
+            # Одно событие на весь импорт, а не на каждый пакет
+            if result['inserted']:
+                self._publish(DataReset(CHANGE_BULK))
+        
+        logger.info("Импорт завершён: добавлено %s, отклонено %s", result['inserted'], len(result['rejected']))
+        return result
+    
+    def _select_movies(self, name, params: Sequence = (),
+                       columns: Sequence[str] = FULL_COLUMNS) -> List[Movie]:
+        # Выполнение запроса из реестра и преобразование строк в записи Movie
+        self.cursor.execute(movie_query(name, columns), params)
+        return movie_records(self.cursor.fetchall(), columns)
+    
+    @timed()
+    def get_all_movies(self, columns: Sequence[str] = FULL_COLUMNS) -> List[Movie]:
+        # Получение всех фильмов из базы с названиями жанров
+        try:
+            return self._select_movies('all', (), columns)
+        except sqlite3.Error as e:
+            logger.error("Ошибка получения списка фильмов: %s", e)
             return []
     
-    def get_movie_by_id(self, movie_id: int) -> Optional[Tuple]:
+    def iter_movies(self, chunk_size: int = 1000) -> Iterator[List[Tuple]]:
+        '''
+        Потоковая выборка всех фильмов пакетами по chunk_size строк.
+        Использует отдельный курсор, поэтому в памяти держится только текущий пакет.
+        Строки отдаются кортежами в порядке FULL_COLUMNS, без преобразования в Movie.
+        '''
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(movie_query('all'))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+    
+    @timed()
+    def get_movie_by_id(self, movie_id: int, columns: Sequence[str] = FULL_COLUMNS) -> Optional[Movie]:
         # Получение фильма по ID с названием жанра
-        select_query = """
-        SELECT m.id, m.title, m.year, g.name, m.director, m.rating, m.duration, m.description, m.poster_path
-        FROM movies m
-        LEFT JOIN genres g ON m.genre_id = g.id
-        WHERE m.id = ?
-        """
         try:
-            self.cursor.execute(select_query, (movie_id,))
-            return self.cursor.fetchone()
+            movies = self._select_movies('by_id', (movie_id,), columns)
+            return movies[0] if movies else None
         except sqlite3.Error as e:
-            print(f"Ошибка получения фильма: {e}")
+            logger.error("Ошибка получения фильма: %s", e)
             return None
     
+    @timed()
     def update_movie(self, movie_id: int, title: str, year: int, genre: str, 
                     director: str, rating: float, duration: int, 
-                    description: str, poster_path: str) -> bool:
+                    description: str, poster_path: str) -> Optional[MovieChange]:
         # Обновление данных существующего фильма
+        # Возвращает изменение или None при ошибке
         try:
             # Получаем или создаем жанр
             genre_id = self.get_or_create_genre(genre)
             if genre_id is None:
-                return False
+                return None
             
             update_query = """
             UPDATE movies 
@@ -236,90 +1148,333 @@ class Database:
                               (title, year, genre_id, director, rating, duration, 
                                description, poster_path, movie_id))
             self.connection.commit()
-            print(f"Фильм с ID {movie_id} обновлён")
-            return True
+            logger.debug("Фильм с ID %s обновлён", movie_id)
+            change = MovieChange(CHANGE_UPDATED, movie_id)
+            self._publish(change)
+            return change
         except sqlite3.Error as e:
-            print(f"Ошибка обновления фильма: {e}")
-            return False
+            logger.error("Ошибка обновления фильма: %s", e)
+            return None
     
-    def delete_movie(self, movie_id: int) -> bool:
+    @timed()
+    def delete_movie(self, movie_id: int) -> Optional[MovieChange]:
         # Удаление фильма из базы
+        # Возвращает изменение или None при ошибке
         delete_query = "DELETE FROM movies WHERE id = ?"
         try:
             self.cursor.execute(delete_query, (movie_id,))
             self.connection.commit()
-            print(f"Фильм с ID {movie_id} удалён")
-            return True
+            logger.debug("Фильм с ID %s удалён", movie_id)
+            change = MovieChange(CHANGE_DELETED, movie_id)
+            self._publish(change)
+            return change
         except sqlite3.Error as e:
-            print(f"Ошибка удаления фильма: {e}")
-            return False
+            logger.error("Ошибка удаления фильма: %s", e)
+            return None
     
-    def search_movies(self, search_text: str = "", genre: str = "Все жанры") -> List[Tuple]:
-        # Поиск и фильтрация фильмов
-        query = """
-        SELECT m.id, m.title, m.year, g.name, m.director, m.rating, m.duration, m.description, m.poster_path
-        FROM movies m
-        LEFT JOIN genres g ON m.genre_id = g.id
-        WHERE 1=1
-        """
+    def _search_conditions(self, search_text: str, genre: str) -> Tuple[List[str], List]:
+        # Условия WHERE для поиска по названию и фильтра по жанру
+        conditions = []
         params = []
         
-        # Фильтр по жанру
+        # Фильтр по названию
+        if search_text:
+            if self.fts_enabled and len(search_text) >= FTS_MIN_QUERY_LENGTH:
+                # Поиск подстроки по триграммному индексу столбца title
+                conditions.append("m.id IN (SELECT rowid FROM movies_fts WHERE movies_fts MATCH ?)")
+                phrase = search_text.replace('"', '""')
+                params.append(f'title : "{phrase}"')
+            else:
+                # Короткие запросы не покрываются триграммами
+                conditions.append("instr(unicode_lower(m.title), ?) > 0")
+                params.append(search_text.lower())
+        
+        # Фильтр по жанру: ID жанра находится по уникальному индексу имени,
+        # фильмы читаются по индексу genre_id без соединения с таблицей жанров
         if genre != "Все жанры":
-            query += " AND g.name = ?"
+            conditions.append("m.genre_id = (SELECT id FROM genres WHERE name = ?)")
             params.append(genre)
         
-        query += " ORDER BY m.title"
+        return conditions, params
+    
+    def _filter_conditions(self, movie_filter: MovieFilter) -> Tuple[List[str], List]:
+        '''
+        Условия WHERE фильтра. Границы диапазонов сравниваются со столбцом напрямую,
+        чтобы SQLite мог читать индекс по году или рейтингу.
+        '''
+        conditions, params = self._search_conditions(movie_filter.search_text, movie_filter.genre)
+        ranges = (
+            ('m.year', movie_filter.year_from, movie_filter.year_to),
+            ('m.rating', movie_filter.rating_from, movie_filter.rating_to),
+        )
+        for expr, low, high in ranges:
+            if low is not None and high is not None:
+                conditions.append(f"{expr} BETWEEN ? AND ?")
+                params.extend([low, high])
+            elif low is not None:
+                conditions.append(f"{expr} >= ?")
+                params.append(low)
+            elif high is not None:
+                conditions.append(f"{expr} <= ?")
+                params.append(high)
+        return conditions, params
+    
+    def compile_filter(self, movie_filter: MovieFilter, columns: Sequence[str] = LIST_COLUMNS,
+                       count_only: bool = False) -> Tuple[str, List]:
+        '''
+        Сборка одного параметризованного запроса по фильтру: условия, порядок
+        (ID замыкает его) и предел. При count_only - запрос количества строк.
+        Текст запроса зависит только от набора условий, поэтому повторяется
+        и берётся подключением из кэша подготовленных выражений.
+        Возвращает текст запроса и параметры.
+        '''
+        movie_filter = movie_filter.normalized()
+        conditions, params = self._filter_conditions(movie_filter)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if count_only:
+            return MOVIE_COUNT_SELECT + where, params
         
+        keys = sort_page_keys(movie_filter.sort_order)
+        has_limit = movie_filter.limit is not None
+        name = ('filter', tuple(conditions), tuple((expr, descending) for expr, _, descending in keys), has_limit)
+        if name not in MOVIE_QUERY_TAILS:
+            MOVIE_QUERY_TAILS[name] = where + order_by_clause(keys) + (" LIMIT ?" if has_limit else "")
+        if has_limit:
+            params.append(movie_filter.limit)
+        return movie_query(name, columns), params
+    
+    @timed()
+    def filter_movies(self, movie_filter: MovieFilter,
+                      columns: Sequence[str] = LIST_COLUMNS) -> List[Movie]:
+        # Фильмы, подходящие под фильтр, в его порядке и в пределах его limit
+        # Результат берётся из кэша выборок, вызывающий получает собственную копию списка
+        movie_filter = movie_filter.normalized()
+        key = ('filter', movie_filter, tuple(columns))
+        movies, generation = self._cache_lookup(key)
+        if movies is not None:
+            return list(movies)
         try:
+            query, params = self.compile_filter(movie_filter, columns)
             self.cursor.execute(query, params)
-            results = self.cursor.fetchall()
-            
-            # Фильтрация по названию
-            if search_text:
-                search_lower = search_text.lower()
-                results = [
-                    movie for movie in results 
-                    if search_lower in movie[1].lower()  # movie[1] это title
-                ]
-            
-            return results
+            movies = movie_records(self.cursor.fetchall(), columns)
         except sqlite3.Error as e:
-            print(f"Ошибка поиска фильмов: {e}")
+            logger.error("Ошибка выборки фильмов по фильтру: %s", e)
             return []
+        self.result_cache.put(key, movies, len(movies), generation)
+        return list(movies)
     
-    def get_movies_sorted(self, column: str, ascending: bool = True) -> List[Tuple]:
+    @timed()
+    def filter_movies_page(self, movie_filter: MovieFilter, after: Optional[Tuple] = None,
+                           limit: int = PAGE_SIZE) -> Tuple[List[Movie], Optional[Tuple]]:
+        # Страница фильмов по фильтру (limit фильтра не используется, размер задаёт limit страницы)
+        movie_filter = movie_filter.normalized()._replace(limit=None)
+        key = ('page', movie_filter, after, limit)
+        page, generation = self._cache_lookup(key)
+        if page is not None:
+            return list(page[0]), page[1]
+        conditions, params = self._filter_conditions(movie_filter)
+        try:
+            rows, next_cursor = self._query_page(conditions, params, sort_page_keys(movie_filter.sort_order),
+                                                 after, limit)
+        except sqlite3.Error as e:
+            logger.error("Ошибка постраничной выборки фильмов: %s", e)
+            return [], None
+        self.result_cache.put(key, (rows, next_cursor), len(rows), generation)
+        return list(rows), next_cursor
+    
+    @timed()
+    def count_filtered(self, movie_filter: MovieFilter) -> int:
+        # Количество фильмов, подходящих под фильтр (для строки состояния)
+        # Порядок и предел на количество не влияют и в ключ кэша не входят
+        movie_filter = movie_filter.normalized()._replace(sort_order=(), limit=None)
+        key = ('count', movie_filter)
+        count, generation = self._cache_lookup(key)
+        if count is not None:
+            return count
+        try:
+            query, params = self.compile_filter(movie_filter, count_only=True)
+            self.cursor.execute(query, params)
+            count = self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error("Ошибка подсчёта фильмов: %s", e)
+            return 0
+        self.result_cache.put(key, count, 1, generation)
+        return count
+    
+    @timed()
+    def search_movies(self, search_text: str = "", genre: str = "Все жанры") -> List[Movie]:
+        # Поиск и фильтрация фильмов
+        # Возвращаются только столбцы списка (без описания и постера)
+        return self.filter_movies(MovieFilter(search_text, genre))
+    
+    @timed()
+    def get_movie_row(self, movie_id: int,
+                      movie_filter: MovieFilter = MovieFilter()) -> Optional[Movie]:
+        # Строка списка для одного фильма, если он подходит под фильтр
+        conditions, params = self._filter_conditions(movie_filter.normalized())
+        query = MOVIE_LIST_SELECT + " WHERE " + " AND ".join(["m.id = ?", *conditions])
+        
+        try:
+            self.cursor.execute(query, [movie_id, *params])
+            movies = movie_records(self.cursor.fetchall(), LIST_COLUMNS)
+            return movies[0] if movies else None
+        except sqlite3.Error as e:
+            logger.error("Ошибка получения строки фильма: %s", e)
+            return None
+    
+    @timed()
+    def count_movies(self, search_text: str = "", genre: str = "Все жанры") -> int:
+        # Количество фильмов, подходящих под поиск и фильтр
+        return self.count_filtered(MovieFilter(search_text, genre))
+    
+    def _keyset_condition(self, keys: List[Tuple], after: Tuple) -> Tuple[Optional[str], List]:
         '''
-        Получение фильмов с сортировкой по указанному столбцу.
-        Защита от SQL инъекций через проверку имени столбца.
+        Условие "строка строго после курсора" в лексикографическом порядке ключей.
+        NULL в SQLite идёт первым при ASC и последним при DESC.
+        Возвращает None, если после курсора строк быть не может.
         '''
-        valid_columns = ['title', 'year', 'genre', 'director', 'rating', 'duration']
-        if column not in valid_columns:
-            column = 'title'
+        expr, _, descending = keys[0]
+        value = after[0]
         
-        # Используем псевдоним для genre (g.name)
-        if column == 'genre':
-            column = 'g.name'
+        tail, tail_params = (None, [])
+        if len(keys) > 1:
+            tail, tail_params = self._keyset_condition(keys[1:], after[1:])
+        
+        parts = []
+        params = []
+        if value is None:
+            # После NULL при DESC ничего нет, при ASC идут все непустые значения
+            if not descending:
+                parts.append(f"{expr} IS NOT NULL")
+            if tail:
+                parts.append(f"({expr} IS NULL AND {tail})")
+                params.extend(tail_params)
         else:
-            column = f'm.{column}'
+            if descending:
+                parts.append(f"({expr} < ? OR {expr} IS NULL)")
+            else:
+                parts.append(f"{expr} > ?")
+            params.append(value)
+            if tail:
+                parts.append(f"({expr} = ? AND {tail})")
+                params.append(value)
+                params.extend(tail_params)
         
-        order = 'ASC' if ascending else 'DESC'
-        query = f"""
-        SELECT m.id, m.title, m.year, g.name, m.director, m.rating, m.duration, m.description, m.poster_path
-        FROM movies m
-        LEFT JOIN genres g ON m.genre_id = g.id
-        ORDER BY {column} {order}
-        """
+        if not parts:
+            return None, []
+        return "(" + " OR ".join(parts) + ")", params
+    
+    def _page_segments(self, keys: List[Tuple], after: Optional[Tuple]) -> List[Tuple[List[str], List, List[Tuple]]]:
+        '''
+        Разбиение выборки после курсора на участки (условия, параметры, ключи ORDER BY),
+        каждый из которых читается упорядоченным диапазоном индекса по первому ключу.
+        Участок со значениями NULL первого ключа выбирается отдельно.
+        '''
+        expr, _, descending = keys[0]
+        is_null, not_null = null_conditions(expr)
+        # В участке NULL ключа из SORT_KEY_NULL_CONDITIONS первый ключ постоянен,
+        # а условие читает индекс в порядке остальных ключей
+        null_keys = keys[1:] if expr in SORT_KEY_NULL_CONDITIONS else keys
+        if after is None:
+            if expr not in SORT_KEY_NULL_CONDITIONS:
+                return [([], [], keys)]
+            # Первая страница по ключу из SORT_KEY_NULL_CONDITIONS: NULL идут первыми при ASC
+            if descending:
+                return [([not_null], [], keys), ([is_null], [], null_keys)]
+            return [([is_null], [], null_keys), ([not_null], [], keys)]
         
-        try:
-            self.cursor.execute(query)
-            return self.cursor.fetchall()
-        except sqlite3.Error as e:
-            print(f"Ошибка сортировки фильмов: {e}")
-            return []
+        value = after[0]
+        tail, tail_params = (None, [])
+        if len(keys) > 1:
+            tail, tail_params = self._keyset_condition(keys[1:], after[1:])
+        
+        segments = []
+        if value is None:
+            # Курсор внутри участка NULL: дочитываем его, при ASC затем все значения
+            if tail:
+                segments.append(([is_null, tail], list(tail_params), null_keys))
+            if not descending:
+                segments.append(([not_null], [], keys))
+            return segments
+        
+        # Курсор на значении: диапазон индекса от него в сторону сортировки
+        bound = f"{expr} <= ?" if descending else f"{expr} >= ?"
+        strict = f"{expr} < ?" if descending else f"{expr} > ?"
+        if tail:
+            condition = f"({strict} OR ({expr} = ? AND {tail}))"
+            condition_params = [value, value, *tail_params]
+        else:
+            condition = strict
+            condition_params = [value]
+        segments.append(([bound, condition], [value, *condition_params], keys))
+        
+        # При DESC значения NULL идут после всех остальных
+        if descending:
+            segments.append(([is_null], [], null_keys))
+        return segments
+    
+    def _query_page(self, conditions: List[str], params: List, keys: List[Tuple],
+                    after: Optional[Tuple], limit: int) -> Tuple[List[Movie], Optional[Tuple]]:
+        '''
+        Постраничная выборка по ключу (keyset pagination).
+        keys - список (выражение, позиция в строке, по убыванию), последним идёт ID.
+        after - значения ключей последней строки предыдущей страницы.
+        Возвращает строки страницы и курсор следующей страницы (None, если строк больше нет).
+        Ошибки SQLite передаются вызывающему.
+        '''
+        rows = []
+        for segment_conditions, segment_params, order_keys in self._page_segments(keys, after):
+            all_conditions = list(conditions) + segment_conditions
+            query = MOVIE_LIST_SELECT
+            if all_conditions:
+                query += " WHERE " + " AND ".join(all_conditions)
+            query += order_by_clause(order_keys) + " LIMIT ?"
+            
+            # Лишняя строка показывает, есть ли следующая страница
+            self.cursor.execute(query, [*params, *segment_params, limit + 1 - len(rows)])
+            rows.extend(movie_records(self.cursor.fetchall(), LIST_COLUMNS))
+            if len(rows) > limit:
+                break
+        
+        if len(rows) <= limit:
+            return rows, None
+        
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = tuple(last_row[position] for _, position, _ in keys)
+        return rows, next_cursor
+    
+    @timed()
+    def get_movies_page(self, column: str = 'title', ascending: bool = True,
+                        after: Optional[Tuple] = None,
+                        limit: int = PAGE_SIZE) -> Tuple[List[Movie], Optional[Tuple]]:
+        # Страница всех фильмов с сортировкой по столбцу (аналог get_all_movies и get_movies_sorted)
+        return self.filter_movies_page(MovieFilter(sort_order=((column, ascending),)), after, limit)
+    
+    @timed()
+    def search_movies_page(self, search_text: str = "", genre: str = "Все жанры",
+                           after: Optional[Tuple] = None, limit: int = PAGE_SIZE,
+                           sort_order: Sequence[Tuple[str, bool]] = DEFAULT_SORT_ORDER
+                           ) -> Tuple[List[Movie], Optional[Tuple]]:
+        # Страница результатов поиска в порядке sort_order (по умолчанию по названию)
+        return self.filter_movies_page(MovieFilter(search_text, genre, sort_order=sort_order), after, limit)
     
+    @timed()
+    def get_movies_sorted(self, column, ascending: bool = True,
+                          columns: Sequence[str] = FULL_COLUMNS,
+                          search_text: str = "", genre: str = "Все жанры") -> List[Movie]:
+        '''
+        Получение фильмов с сортировкой в SQLite по одному столбцу или по нескольким:
+        column - имя столбца или список пар (столбец, по возрастанию), тогда ascending
+        не используется. Поиск и фильтр жанра применяются как в search_movies.
+        Имена столбцов проверяются по SORT_KEYS, ID замыкает порядок.
+        '''
+        sort_order = [(column, ascending)] if isinstance(column, str) else column
+        return self.filter_movies(MovieFilter(search_text, genre, sort_order=tuple(sort_order)), columns)
+    
+    @timed()
     def get_statistics(self) -> Dict:
-        # Получение статистики по коллекции фильмов
+        # Получение статистики по коллекции фильмов из сводных таблиц
         stats = {
             'total': 0,
             'by_genre': {},
@@ -331,84 +1486,293 @@ class Database:
         }
         
         try:
-            # Общее количество фильмов
-            self.cursor.execute("SELECT COUNT(*) FROM movies")
-            stats['total'] = self.cursor.fetchone()[0]
-            
-            # Количество по жанрам
+            # Сводные таблицы указываются без псевдонимов: check_query_plans
+            # узнаёт их полный просмотр по имени таблицы в плане
+            # Общие показатели и лучший фильм
             self.cursor.execute("""
-                SELECT g.name, COUNT(*) 
-                FROM movies m
-                LEFT JOIN genres g ON m.genre_id = g.id
-                GROUP BY g.name
+                SELECT stats_totals.movie_count, stats_totals.rating_sum, stats_totals.rating_count,
+                       stats_totals.duration_sum, b.title, b.rating
+                FROM stats_totals
+                LEFT JOIN movies b ON b.id = stats_totals.best_movie_id
             """)
-            for genre, count in self.cursor.fetchall():
-                stats['by_genre'][genre if genre else 'Без жанра'] = count
+            totals = self.cursor.fetchone()
+            if not totals:
+                return stats
             
-            # Средний рейтинг
-            self.cursor.execute("SELECT AVG(rating) FROM movies")
-            avg_rating = self.cursor.fetchone()[0]
-            stats['avg_rating'] = round(avg_rating, 2) if avg_rating else 0.0
-            
-            # Общая длительность
-            self.cursor.execute("SELECT SUM(duration) FROM movies")
-            total_duration = self.cursor.fetchone()[0]
-            stats['total_duration'] = total_duration if total_duration else 0
+            total, rating_sum, rating_count, total_duration, best_title, best_rating = totals
+            stats['total'] = total
+            if rating_count:
+                # Округление суммы убирает накопленную погрешность инкрементных обновлений
+                stats['avg_rating'] = round(round(rating_sum, 6) / rating_count, 2)
+            stats['total_duration'] = total_duration
             
             # Средняя длительность
             if stats['total'] > 0:
                 stats['avg_duration'] = round(stats['total_duration'] / stats['total'])
+                stats['best_movie'] = {'title': best_title, 'rating': best_rating}
             
-            # Лучший фильм по рейтингу
-            self.cursor.execute("SELECT title, rating FROM movies ORDER BY rating DESC LIMIT 1")
-            best = self.cursor.fetchone()
-            if best:
-                stats['best_movie'] = {'title': best[0], 'rating': best[1]}
+            # Количество по жанрам
+            self.cursor.execute("""
+                SELECT g.name, stats_by_genre.movie_count
+                FROM stats_by_genre
+                LEFT JOIN genres g ON stats_by_genre.genre_id = g.id
+            """)
+            for genre, count in self.cursor.fetchall():
+                genre = genre if genre else 'Без жанра'
+                stats['by_genre'][genre] = stats['by_genre'].get(genre, 0) + count
             
             # Количество по годам
-            self.cursor.execute("SELECT year, COUNT(*) FROM movies GROUP BY year ORDER BY year DESC")
+            self.cursor.execute("SELECT year, movie_count FROM stats_by_year ORDER BY year DESC")
             for year, count in self.cursor.fetchall():
                 stats['by_year'][year] = count
             
             return stats
         except sqlite3.Error as e:
-            print(f"Ошибка получения статистики: {e}")
+            logger.error("Ошибка получения статистики: %s", e)
             return stats
     
-    def get_movies_by_year_range(self, start_year: int, end_year: int) -> List[Tuple]:
-        # Получение фильмов за определенный период
-        query = """
-        SELECT m.id, m.title, m.year, g.name, m.director, m.rating, m.duration, m.description, m.poster_path
-        FROM movies m
-        LEFT JOIN genres g ON m.genre_id = g.id
-        WHERE m.year BETWEEN ? AND ? 
-        ORDER BY m.year DESC, m.title
-        """
+    def _compute_statistics(self) -> Dict:
+        # Расчёт статистики полным проходом по таблице movies (для сверки)
+        stats = {'totals': None, 'by_genre': {}, 'by_year': {}}
+        self.cursor.execute("""
+            SELECT COUNT(*), IFNULL(SUM(rating), 0), COUNT(rating), IFNULL(SUM(duration), 0)
+            FROM movies
+        """)
+        stats['totals'] = self.cursor.fetchone()
+        self.cursor.execute("SELECT genre_id, COUNT(*) FROM movies GROUP BY genre_id")
+        stats['by_genre'] = dict(self.cursor.fetchall())
+        self.cursor.execute("SELECT year, COUNT(*) FROM movies GROUP BY year")
+        stats['by_year'] = dict(self.cursor.fetchall())
+        return stats
+    
+    @timed()
+    def verify_statistics(self, repair: bool = True) -> bool:
+        '''
+        Сверка сводных таблиц статистики с данными фильмов.
+        При расхождении и repair=True сводные таблицы пересчитываются.
+        Возвращает True, если расхождений не было.
+        '''
         try:
-            self.cursor.execute(query, (start_year, end_year))
-            return self.cursor.fetchall()
+            expected = self._compute_statistics()
+            
+            self.cursor.execute("""
+                SELECT movie_count, rating_sum, rating_count, duration_sum FROM stats_totals
+            """)
+            totals = self.cursor.fetchone()
+            self.cursor.execute("SELECT genre_id, movie_count FROM stats_by_genre")
+            by_genre = dict(self.cursor.fetchall())
+            self.cursor.execute("SELECT year, movie_count FROM stats_by_year")
+            by_year = dict(self.cursor.fetchall())
+            
+            # Сумма рейтингов REAL сравнивается с допуском на погрешность округления
+            consistent = (
+                totals is not None
+                and totals[0] == expected['totals'][0]
+                and abs(totals[1] - expected['totals'][1]) < 1e-6
+                and totals[2:] == expected['totals'][2:]
+                and by_genre == expected['by_genre']
+                and by_year == expected['by_year']
+            )
         except sqlite3.Error as e:
-            print(f"Ошибка фильтрации по годам: {e}")
-            return []
+            logger.error("Ошибка сверки статистики: %s", e)
+            consistent = False
+        
+        if not consistent:
+            logger.warning("Обнаружено расхождение сводной статистики")
+            if repair:
+                self.rebuild_statistics()
+        return consistent
     
-    def get_movies_by_rating_range(self, min_rating: float, max_rating: float) -> List[Tuple]:
-        # Получение фильмов с рейтингом в указанном диапазоне
-        query = """
-        SELECT m.id, m.title, m.year, g.name, m.director, m.rating, m.duration, m.description, m.poster_path
-        FROM movies m
-        LEFT JOIN genres g ON m.genre_id = g.id
-        WHERE m.rating BETWEEN ? AND ? 
-        ORDER BY m.rating DESC
-        """
+    @timed()
+    def rebuild_statistics(self) -> bool:
+        # Полный пересчёт сводных таблиц статистики
         try:
-            self.cursor.execute(query, (min_rating, max_rating))
-            return self.cursor.fetchall()
+            for statement in STATISTICS_REBUILD:
+                self.cursor.execute(statement)
+            self.connection.commit()
+            logger.info("Сводная статистика пересчитана")
+            return True
         except sqlite3.Error as e:
-            print(f"Ошибка фильтрации по рейтингу: {e}")
-            return []
+            logger.error("Ошибка пересчёта статистики: %s", e)
+            self.connection.rollback()
+            return False
+    
+    @timed()
+    def get_movies_by_year_range(self, start_year: int, end_year: int,
+                                 columns: Sequence[str] = FULL_COLUMNS) -> List[Movie]:
+        # Получение фильмов за определенный период: сначала новые, внутри года по названию
+        return self.filter_movies(MovieFilter(year_from=start_year, year_to=end_year,
+                                              sort_order=YEAR_RANGE_SORT_ORDER), columns)
+    
+    @timed()
+    def get_movies_by_rating_range(self, min_rating: float, max_rating: float,
+                                   columns: Sequence[str] = FULL_COLUMNS) -> List[Movie]:
+        # Получение фильмов с рейтингом в указанном диапазоне, от высокого к низкому
+        return self.filter_movies(MovieFilter(rating_from=min_rating, rating_to=max_rating,
+                                              sort_order=RATING_RANGE_SORT_ORDER), columns)
+    
+    def get_poster_references(self) -> Dict[str, int]:
+        # Файлы постеров, на которые ссылается хотя бы один фильм, и число ссылок
+        try:
+            self.cursor.execute("SELECT path, ref_count FROM poster_refs WHERE ref_count > 0")
+            return dict(self.cursor.fetchall())
+        except sqlite3.Error as e:
+            logger.error("Ошибка получения ссылок на постеры: %s", e)
+            return {}
+    
+    def prune_poster_references(self) -> int:
+        # Удаление записей о постерах, на которые больше никто не ссылается
+        try:
+            self.cursor.execute("DELETE FROM poster_refs WHERE ref_count <= 0")
+            self.connection.commit()
+            return self.cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error("Ошибка очистки ссылок на постеры: %s", e)
+            self.connection.rollback()
+            return 0
+
+    @timed()
+    def replace_poster_path(self, old_path: str, new_path: str) -> int:
+        # Замена пути постера у всех фильмов (счётчики ссылок обновляют триггеры)
+        try:
+            self.cursor.execute("UPDATE movies SET poster_path = ? WHERE poster_path = ?",
+                                (new_path, old_path))
+            changed = self.cursor.rowcount
+            self.connection.commit()
+            if changed:
+                self._publish(DataReset(CHANGE_BULK))
+            return changed
+        except sqlite3.Error as e:
+            logger.error("Ошибка замены пути постера: %s", e)
+            self.connection.rollback()
+            return 0
+
+    @timed()
+    def get_movies_by_year_range_page(self, start_year: int, end_year: int,
+                                      after: Optional[Tuple] = None,
+                                      limit: int = PAGE_SIZE) -> Tuple[List[Movie], Optional[Tuple]]:
+        # Страница фильмов за период: сначала новые, внутри года по названию
+        movie_filter = MovieFilter(year_from=start_year, year_to=end_year, sort_order=YEAR_RANGE_SORT_ORDER)
+        return self.filter_movies_page(movie_filter, after, limit)
+    
+    @timed()
+    def get_movies_by_rating_range_page(self, min_rating: float, max_rating: float,
+                                        after: Optional[Tuple] = None,
+                                        limit: int = PAGE_SIZE) -> Tuple[List[Movie], Optional[Tuple]]:
+        # Страница фильмов с рейтингом в диапазоне, от высокого к низкому
+        movie_filter = MovieFilter(rating_from=min_rating, rating_to=max_rating, sort_order=RATING_RANGE_SORT_ORDER)
+        return self.filter_movies_page(movie_filter, after, limit)
+    
+    def check_query_plans(self, allowed_scans: Tuple[str, ...] = SUMMARY_TABLES) -> List[Tuple[str, List[str], bool]]:
+        '''
+        Диагностика планов запросов.
+        Вызывает читающие методы класса, перехватывает выполненный SQL
+        и для каждого запроса выводит EXPLAIN QUERY PLAN, отмечая полные просмотры таблиц
+        и сортировки, для которых не нашлось индекса.
+        Полный просмотр таблиц из allowed_scans (по умолчанию сводных) не отмечается.
+        '''
+        executed = []
+        
+        def remember(statement):
+            # Служебные запросы FTS5 к своим теневым таблицам ('main'.'movies_fts_config')
+            # выполняет сам SQLite, их планы не проверяются
+            if "'movies_fts_" in statement:
+                return
+            if statement.lstrip().upper().startswith(("SELECT", "WITH")) and statement not in executed:
+                executed.append(statement)
+        
+        genres = self.get_all_genres()
+        genre_name = genres[0][1] if genres else "Все жанры"
+        
+        # Перехватываем запросы читающих методов с примерными параметрами,
+        # кэш выборок на это время выключается, чтобы запросы действительно выполнялись
+        cache_limits = (self.result_cache.max_entries, self.result_cache.max_rows)
+        self.result_cache.configure(0, 0)
+        self.connection.set_trace_callback(remember)
+        try:
+            self.get_all_genres()
+            self.get_genre_name_by_id(1)
+            self.get_all_movies()
+            self.get_movie_by_id(1)
+            self.search_movies()
+            self.search_movies("", genre_name)
+            self.search_movies("мат")
+            self.search_movies("ма")
+            for column in ['title', 'year', 'genre', 'director', 'rating', 'duration']:
+                self.get_movies_sorted(column)
+            self.get_statistics()
+            self.get_movies_by_year_range(1900, 2100)
+            self.get_movies_by_rating_range(0.0, 10.0)
+            self.count_movies()
+            self.count_movies("мат", genre_name)
+            for column in SORT_KEYS:
+                for ascending in (True, False):
+                    rows, next_cursor = self.get_movies_page(column, ascending, limit=1)
+                    if next_cursor is not None:
+                        self.get_movies_page(column, ascending, next_cursor, limit=1)
+            self.search_movies_page("", genre_name)
+            self.search_movies_page("", genre_name, sort_order=[('year', False), ('rating', False)])
+            self.get_movies_sorted([('rating', False), ('title', True)], search_text="мат")
+            combined = MovieFilter("мат", genre_name, 1990, 2000, 8.0, None, (('rating', False),), 50)
+            self.filter_movies(combined)
+            self.count_filtered(combined)
+            self.filter_movies_page(MovieFilter(year_from=1990, rating_from=8.0))
+            self.get_movies_by_year_range_page(1900, 2100)
+            self.get_movies_by_rating_range_page(0.0, 10.0)
+        finally:
+            # Трассировка сбора замеров восстанавливается, если он включён
+            self.connection.set_trace_callback(
+                instrumentation.trace_sql if instrumentation.is_enabled() else None
+            )
+            self.result_cache.configure(*cache_limits)
+        
+        report = []
+        for statement in executed:
+            try:
+                self.cursor.execute("EXPLAIN QUERY PLAN " + statement)
+                plan = [row[3] for row in self.cursor.fetchall()]
+            except sqlite3.Error as e:
+                logger.error("Ошибка получения плана запроса: %s", e)
+                continue
+            
+            text = " ".join(statement.split())
+            words = text.upper().split()
+            full_scan = False
+            for detail in plan:
+                if detail.startswith("SCAN"):
+                    if ("VIRTUAL TABLE" in detail or "CONSTANT ROW" in detail
+                            or detail.split()[1] in allowed_scans):
+                        continue
+                    # Полный просмотр: SCAN без индекса, а также обход всего индекса
+                    # без ограничения LIMIT, отбрасывающий строки по условию WHERE
+                    if "USING" not in detail or ("WHERE" in words and "LIMIT" not in words):
+                        full_scan = True
+                elif detail == "USE TEMP B-TREE FOR ORDER BY" and not any("VIRTUAL TABLE" in item for item in plan):
+                    # Сортировка всех прочитанных строк: порядок не берётся из индекса
+                    # (совпадения триграммного индекса сортируются всегда, это не в счёт)
+                    full_scan = True
+            report.append((text, plan, full_scan))
+            
+            if full_scan:
+                logger.warning("Полный просмотр или сортировка в запросе: %s", text)
+                for detail in plan:
+                    logger.warning("    %s", detail)
+        
+        return report
     
     def close(self):
-        # Закрытие соединения с базой данных
-        if self.connection:
-            self.connection.close()
-            print("Соединение с базой данных закрыто")
+        # Закрытие соединений с базой данных всех потоков
+        self._closed = True
+        instrumentation.remove_listener(self._set_sql_trace)
+        if self._counters_name is not None:
+            instrumentation.remove_counters(self._counters_name)
+            self._counters_name = None
+        if self._owns_result_cache:
+            self.result_cache.invalidate()
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._thread_states = {}
+        if connections:
+            logger.debug("Соединение с базой данных закрыто")
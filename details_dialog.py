@@ -4,38 +4,60 @@
 '''
 
 import os
-from PyQt6 import uic
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtGui import QKeySequence, QShortcut
 from PyQt6.QtWidgets import QDialog, QMessageBox
-from PyQt6.QtGui import QPixmap
-from PyQt6.QtCore import Qt
 from database import Database
+from ui_loader import setup_ui
+from poster_loader import PosterLoader
 
 
 class DetailsDialog(QDialog):
     # Диалог для просмотра детальной информации о фильме
+    # Создаётся один раз и переключается на другой фильм методом show_movie
     
-    def __init__(self, database: Database, movie_id: int, parent=None):
+    # Запрос перехода к соседнему фильму списка (-1 - предыдущий, 1 - следующий)
+    navigate = pyqtSignal(int)
+    
+    def __init__(self, database: Database, movie_id: int = None, parent=None):
         super().__init__(parent)
-        # Загружаем интерфейс из ui файла
-        uic.loadUi('ui/details_dialog.ui', self)
+        # Загружаем интерфейс (скомпилированная форма или ui файл)
+        setup_ui(self, 'details_dialog')
         
         self.db = database
         self.movie_id = movie_id
         
-        # Загружаем и отображаем данные фильма
-        self.load_movie_data()
+        # Постер загружается в фоне
+        self.poster_loader = PosterLoader(self)
+        self.poster_loader.ready.connect(self.posterLabel.setPixmap)
+        self.poster_loader.failed.connect(
+            lambda: self.posterLabel.setText("Ошибка загрузки постера")
+        )
         
         # Подключаем кнопку закрытия
         self.closeButton.clicked.connect(self.accept)
+        
+        # Листание фильмов без закрытия окна
+        QShortcut(QKeySequence("Alt+Left"), self, lambda: self.navigate.emit(-1))
+        QShortcut(QKeySequence("Alt+Right"), self, lambda: self.navigate.emit(1))
+        
+        # Загружаем и отображаем данные фильма
+        if self.movie_id is not None:
+            self.load_movie_data()
     
-    def load_movie_data(self):
+    def show_movie(self, movie_id: int) -> bool:
+        # Переключение диалога на другой фильм без пересоздания виджетов
+        self.movie_id = movie_id
+        return self.load_movie_data()
+    
+    def load_movie_data(self) -> bool:
         # Загрузка и отображение информации о фильме
         movie = self.db.get_movie_by_id(self.movie_id)
         
         if not movie:
             QMessageBox.critical(self, "Ошибка", "Фильм не найден в базе данных")
             self.reject()
-            return
+            return False
         
         # Распаковываем данные
         movie_id, title, year, genre, director, rating, duration, description, poster_path = movie
@@ -70,17 +92,25 @@ class DetailsDialog(QDialog):
         
         # Загружаем постер если он есть
         if poster_path and os.path.exists(poster_path):
-            pixmap = QPixmap(poster_path)
+            # Постер из кэша памяти показывается сразу, иначе заглушка до окончания загрузки
+            pixmap = self.poster_loader.request(
+                poster_path,
+                self.posterLabel.width(),
+                self.posterLabel.height()
+            )
             
-            if not pixmap.isNull():
-                # Масштабируем постер с сохранением пропорций
-                scaled_pixmap = pixmap.scaled(
-                    self.posterLabel.width(),
-                    self.posterLabel.height(),
-                    Qt.AspectRatioMode.KeepAspectRatio
-                )
-                self.posterLabel.setPixmap(scaled_pixmap)
+            if pixmap is not None:
+                self.posterLabel.setPixmap(pixmap)
             else:
-                self.posterLabel.setText("Ошибка загрузки постера")
+                self.posterLabel.setText("Загрузка постера...")
         else:
+            # Запрос постера предыдущего фильма больше не актуален
+            self.poster_loader.cancel()
             self.posterLabel.setText("Постер отсутствует")
+        
+        return True
+    
+    def done(self, result):
+        # Поздний результат загрузки постера закрытому окну не нужен
+        self.poster_loader.cancel()
+        super().done(result)
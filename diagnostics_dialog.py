@@ -0,0 +1,140 @@
+'''
+Модуль окна диагностики.
+Показывает замеры модуля instrumentation: задержки методов базы и окна,
+число возвращённых строк, выполненные SQL-запросы и счётчики кэшей. Позволяет включить
+и выключить сбор, очистить замеры и сохранить их в файл JSON.
+'''
+
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton,
+                             QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView,
+                             QFileDialog, QMessageBox)
+from PyQt6.QtCore import Qt, QTimer
+import instrumentation
+
+
+# Период обновления таблиц, пока окно открыто (мс)
+REFRESH_INTERVAL_MS = 1000
+
+# Столбцы таблицы методов: заголовок и ключ замера
+METHOD_COLUMNS = [
+    ("Метод", None), ("Вызовы", 'count'), ("Строки", 'rows'), ("Всего, мс", 'total_ms'),
+    ("Среднее, мс", 'mean_ms'), ("p50, мс", 'p50_ms'), ("p95, мс", 'p95_ms'), ("Макс, мс", 'max_ms'),
+]
+
+# Столбцы таблицы запросов
+SQL_COLUMNS = ["Метод", "Выполнений", "Запрос"]
+
+# Столбцы таблицы счётчиков
+COUNTER_COLUMNS = ["Источник", "Показатель", "Значение"]
+
+
+class DiagnosticsDialog(QDialog):
+    # Окно с замерами производительности (создаётся кодом, без ui файла)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Диагностика")
+        self.resize(900, 500)
+
+        layout = QVBoxLayout(self)
+        self.enabledCheckBox = QCheckBox("Собирать замеры", self)
+        layout.addWidget(self.enabledCheckBox)
+
+        self.tabs = QTabWidget(self)
+        self.methodsTable = self._create_table([title for title, _ in METHOD_COLUMNS])
+        self.sqlTable = self._create_table(SQL_COLUMNS)
+        self.sqlTable.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.tabs.addTab(self.methodsTable, "Методы")
+        self.countersTable = self._create_table(COUNTER_COLUMNS)
+        self.tabs.addTab(self.sqlTable, "SQL")
+        self.tabs.addTab(self.countersTable, "Счётчики")
+        layout.addWidget(self.tabs)
+
+        buttons = QHBoxLayout()
+        self.resetButton = QPushButton("Очистить", self)
+        self.saveButton = QPushButton("Сохранить в файл...", self)
+        self.closeButton = QPushButton("Закрыть", self)
+        buttons.addWidget(self.resetButton)
+        buttons.addWidget(self.saveButton)
+        buttons.addStretch()
+        buttons.addWidget(self.closeButton)
+        layout.addLayout(buttons)
+
+        self.enabledCheckBox.toggled.connect(instrumentation.set_enabled)
+        self.resetButton.clicked.connect(self.reset)
+        self.saveButton.clicked.connect(self.save)
+        self.closeButton.clicked.connect(self.close)
+
+        # Таблицы обновляются, только пока окно видно
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL_MS)
+        self.timer.timeout.connect(self.refresh)
+
+    def _create_table(self, headers) -> QTableWidget:
+        # Таблица только для чтения с сортировкой по столбцам
+        table = QTableWidget(0, len(headers), self)
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.setSortingEnabled(True)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    def _fill(self, table: QTableWidget, rows):
+        # Заполнение таблицы строками значений (числа сортируются как числа)
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem()
+                item.setData(Qt.ItemDataRole.DisplayRole, value)
+                table.setItem(row, column, item)
+        table.setSortingEnabled(True)
+
+    def refresh(self):
+        # Перечитывание замеров
+        data = instrumentation.snapshot()
+        methods = sorted(data['methods'].items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        self._fill(self.methodsTable, [
+            [name] + [values[key] for _, key in METHOD_COLUMNS[1:]]
+            for name, values in methods
+        ])
+        self._fill(self.sqlTable, [
+            [statement['method'], statement['count'], statement['sql']]
+            for statement in data['sql']
+        ])
+        self._fill(self.countersTable, [
+            [source, name, value]
+            for source, values in data['counters'].items()
+            for name, value in values.items()
+        ])
+        self.methodsTable.resizeColumnsToContents()
+        self.countersTable.resizeColumnsToContents()
+
+    def reset(self):
+        # Очистка замеров
+        instrumentation.reset()
+        self.refresh()
+
+    def save(self):
+        # Сохранение замеров в файл JSON
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Сохранить замеры", "diagnostics.json", "JSON (*.json)"
+        )
+        if not file_path:
+            return
+        try:
+            instrumentation.dump(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить замеры: {e}")
+
+    def showEvent(self, event):
+        # При открытии показываем текущее состояние и запускаем обновление
+        self.enabledCheckBox.setChecked(instrumentation.is_enabled())
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        # Скрытое окно не обновляется
+        self.timer.stop()
+        super().hideEvent(event)
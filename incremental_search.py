@@ -0,0 +1,153 @@
+'''
+Модуль инкрементального поиска фильмов.
+Пока пользователь дописывает запрос ("ма" -> "мат" -> "матр"), новые совпадения
+ищутся среди строк предыдущего результата в памяти, а не во всей таблице:
+название, содержащее новый текст, содержит и прежний.
+
+Совпадение проверяется так же, как в SQL (подстрока в названии без учёта регистра),
+порядок строк сохраняется, поэтому результат совпадает с полным запросом.
+К SQL поиск возвращается при смене жанра, диапазонов или порядка, при сокращении
+или замене текста и после любого изменения данных.
+'''
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import instrumentation
+from instrumentation import timed
+from database import Database, Movie, MovieFilter, FTS_MIN_QUERY_LENGTH, PAGE_SIZE, sort_page_keys
+
+
+# Предел числа строк результата, которые хранятся для уточнения запроса
+MAX_CANDIDATES = 5000
+
+# Имя счётчиков в окне диагностики
+COUNTERS_NAME = "Инкрементальный поиск"
+
+
+class SearchResult(NamedTuple):
+    # Первая страница результата, курсор следующей страницы и общее количество
+    movies: List[Movie]
+    next_cursor: Optional[Tuple]
+    total: int
+
+
+class _Candidates(NamedTuple):
+    # Полный результат предыдущего запроса с названиями в нижнем регистре
+    movie_filter: MovieFilter
+    needle: str
+    rows: List[Movie]
+    titles: List[str]
+    generation: int
+
+
+class IncrementalSearch:
+    # Поиск с уточнением предыдущего результата, используется исполнителем фонового поиска
+
+    def __init__(self, database: Database, max_candidates: int = MAX_CANDIDATES):
+        self.db = database
+        self.max_candidates = max_candidates
+        self._candidates: Optional[_Candidates] = None
+        # Запрос прерван из потока GUI: прочитанные строки могут быть неполными
+        self._interrupted = False
+        self.refined = 0
+        self.queried = 0
+        self._counters_name = instrumentation.add_counters(COUNTERS_NAME, self.stats)
+
+    def _can_refine(self, movie_filter: MovieFilter, needle: str) -> bool:
+        # Новый запрос уточняет сохранённый (или совпадает с ним): те же условия,
+        # текст содержит прежний, данные с тех пор не менялись
+        candidates = self._candidates
+        if candidates is None or not candidates.needle:
+            return False
+        if candidates.needle not in needle:
+            return False
+        if movie_filter._replace(search_text="") != candidates.movie_filter._replace(search_text=""):
+            return False
+        return candidates.generation == self.db.data_generation()
+
+    def _indexed(self, needle: str) -> bool:
+        # Дочитывание результата использует триграммный индекс (или индекса нет вовсе,
+        # и тогда полным просмотром выполнялся бы каждый следующий запрос)
+        return not self.db.fts_enabled or len(needle) >= FTS_MIN_QUERY_LENGTH
+
+    def _page(self, movie_filter: MovieFilter, rows: List[Movie], limit: int) -> SearchResult:
+        # Первая страница из полного результата с курсором, как у filter_movies_page
+        if len(rows) <= limit:
+            return SearchResult(list(rows), None, len(rows))
+        last_row = rows[limit - 1]
+        keys = sort_page_keys(movie_filter.sort_order)
+        next_cursor = tuple(last_row[position] for _, position, _ in keys)
+        return SearchResult(rows[:limit], next_cursor, len(rows))
+
+    @timed()
+    def search(self, movie_filter: MovieFilter, limit: int = PAGE_SIZE) -> SearchResult:
+        '''
+        Первая страница результата поиска и общее количество.
+        Уточнение ищется среди сохранённых строк, иначе выполняются те же запросы,
+        что и без уточнения (страница и количество); результат до max_candidates
+        строк дочитывается и сохраняется.
+        '''
+        movie_filter = movie_filter.normalized()._replace(limit=None)
+        needle = movie_filter.search_text.lower()
+
+        if self._can_refine(movie_filter, needle):
+            # Строки уже идут в порядке фильтра, отбор порядок не меняет
+            candidates = self._candidates
+            matches = [index for index, title in enumerate(candidates.titles) if needle in title]
+            rows = [candidates.rows[index] for index in matches]
+            self._candidates = candidates._replace(
+                movie_filter=movie_filter, needle=needle, rows=rows,
+                titles=[candidates.titles[index] for index in matches],
+            )
+            self.refined += 1
+            return self._page(movie_filter, rows, limit)
+
+        self.queried += 1
+        self._candidates = None
+        self._interrupted = False
+        generation = self.db.data_generation()
+        movies, next_cursor = self.db.filter_movies_page(movie_filter, limit=limit)
+        if next_cursor is None:
+            # Весь результат уместился в первую страницу
+            total = len(movies)
+            rows = movies
+        else:
+            total = self.db.count_filtered(movie_filter)
+            if not needle or total > self.max_candidates or not self._indexed(needle):
+                # Без текста уточнять нечего, большой результат не хранится,
+                # а короткий текст без индекса пришлось бы дочитывать полным просмотром
+                return SearchResult(movies, next_cursor, total)
+            # Небольшой результат дочитывается с курсора, чтобы уточнять по нему следующие запросы
+            rest, _ = self.db.filter_movies_page(movie_filter, next_cursor, self.max_candidates)
+            rows = movies + rest
+
+        # Неполный (прерванный) или устаревший результат не сохраняется
+        if (needle and not self._interrupted and len(rows) == total
+                and generation == self.db.data_generation()):
+            self._candidates = _Candidates(
+                movie_filter, needle, rows, [(movie.title or "").lower() for movie in rows], generation
+            )
+        return SearchResult(movies, next_cursor, total)
+
+    def interrupt(self):
+        # Прерывание выполняющегося запроса (вызывается из потока GUI),
+        # его неполный результат не сохраняется
+        self._interrupted = True
+        self.db.interrupt()
+
+    def reset(self):
+        # Сброс сохранённого результата: следующий поиск выполнит запрос к базе
+        self._candidates = None
+
+    def close(self):
+        # Отключение счётчиков перед закрытием базы
+        self._candidates = None
+        instrumentation.remove_counters(self._counters_name)
+
+    def stats(self) -> Dict:
+        # Счётчики для окна диагностики
+        candidates = self._candidates
+        return {
+            'refined': self.refined,
+            'queried': self.queried,
+            'candidates': len(candidates.rows) if candidates is not None else 0,
+        }
@@ -0,0 +1,280 @@
+'''
+Модуль сбора замеров производительности во время работы приложения.
+Для методов Database и действий главного окна записываются гистограммы задержек
+и число возвращённых строк, а через set_trace_callback sqlite3 - тексты выполненных
+SQL-запросов с привязкой к методу, который их выполнил. Объекты с собственными
+счётчиками (например, кэш выборок Database) подключаются через add_counters.
+
+Пока сбор выключен, обёртка timed только проверяет флаг и вызывает исходную функцию,
+а measure возвращает пустой контекст. Сбор включается в окне диагностики
+или переменной окружения MOVIES_DIAGNOSTICS=1 при запуске.
+'''
+
+import bisect
+import contextlib
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Переменная окружения для включения сбора при запуске
+ENV_VARIABLE = "MOVIES_DIAGNOSTICS"
+
+# Верхние границы корзин гистограммы (мс), последняя корзина - всё, что дольше
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Предел числа разных запросов в счётчике SQL (остальные считаются вместе)
+MAX_SQL_STATEMENTS = 500
+
+# Ключ для запросов сверх предела и запросов вне замеряемых методов
+OTHER_SQL = "<прочие>"
+NO_METHOD = "<вне методов>"
+
+
+class LatencyHistogram:
+    # Гистограмма задержек одного метода с числом вызовов и возвращённых строк
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, elapsed_ms: float, rows: Optional[int] = None):
+        # Учёт одного вызова
+        if self.count == 0 or elapsed_ms < self.min_ms:
+            self.min_ms = elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if rows is not None:
+            self.rows += rows
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, elapsed_ms)] += 1
+
+    def percentile(self, fraction: float) -> float:
+        # Оценка процентиля сверху: граница корзины, в которую он попадает
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank and bucket:
+                if index < len(HISTOGRAM_BOUNDS_MS):
+                    return min(HISTOGRAM_BOUNDS_MS[index], self.max_ms)
+                break
+        return self.max_ms
+
+    def snapshot(self) -> Dict:
+        # Состояние гистограммы для окна диагностики и файла
+        return {
+            'count': self.count,
+            'rows': self.rows,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'min_ms': round(self.min_ms, 3),
+            'p50_ms': round(self.percentile(0.5), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets': dict(zip([str(bound) for bound in HISTOGRAM_BOUNDS_MS] + ['inf'], self.buckets)),
+        }
+
+
+# Состояние сбора (общее для всех потоков)
+_enabled = False
+_lock = threading.Lock()
+_histograms: Dict[str, LatencyHistogram] = {}
+_sql_counts: Counter = Counter()
+_started_at = time.time()
+# Обработчики включения и выключения (подключения включают трассировку SQL)
+_listeners: List[Callable[[bool], None]] = []
+# Метод, выполняющийся в текущем потоке, для привязки SQL
+_local = threading.local()
+# Источники счётчиков: имя -> функция, возвращающая словарь показателей
+_counter_sources: Dict[str, Callable[[], Dict]] = {}
+
+
+def is_enabled() -> bool:
+    # Включён ли сбор
+    return _enabled
+
+
+def set_enabled(enabled: bool):
+    # Включение или выключение сбора с оповещением обработчиков
+    global _enabled
+    _enabled = bool(enabled)
+    for listener in list(_listeners):
+        try:
+            listener(_enabled)
+        except Exception as e:
+            logger.error("Ошибка обработчика сбора замеров: %s", e)
+
+
+def add_listener(listener: Callable[[bool], None]):
+    # Подписка на включение и выключение сбора
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[bool], None]):
+    # Отмена подписки
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def add_counters(name: str, source: Callable[[], Dict]) -> str:
+    # Подключение источника счётчиков, которые ведёт сам объект (читаются при снимке).
+    # Занятое имя получает номер, чтобы источники не заменяли друг друга;
+    # возвращается итоговое имя для remove_counters
+    unique_name = name
+    number = 2
+    while unique_name in _counter_sources:
+        unique_name = f"{name} #{number}"
+        number += 1
+    _counter_sources[unique_name] = source
+    return unique_name
+
+
+def remove_counters(name: str):
+    # Отключение источника счётчиков
+    _counter_sources.pop(name, None)
+
+
+def _read_counters() -> Dict[str, Dict]:
+    # Текущие значения всех источников счётчиков
+    counters = {}
+    for name, source in list(_counter_sources.items()):
+        try:
+            counters[name] = source()
+        except Exception as e:
+            logger.error("Ошибка чтения счётчиков %s: %s", name, e)
+    return counters
+
+
+def reset():
+    # Очистка накопленных замеров
+    global _started_at
+    with _lock:
+        _histograms.clear()
+        _sql_counts.clear()
+        _started_at = time.time()
+
+
+def count_rows(result) -> Optional[int]:
+    # Число строк в результате: список, страница (список, курсор) или одна запись
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, tuple):
+        if len(result) == 2 and isinstance(result[0], list):
+            return len(result[0])
+        return 1
+    return None
+
+
+def record(name: str, elapsed_ms: float, rows: Optional[int] = None):
+    # Запись одного замера
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = LatencyHistogram()
+        histogram.add(elapsed_ms, rows)
+
+
+def trace_sql(statement: str):
+    # Обработчик set_trace_callback: запрос учитывается за текущим методом потока
+    method = getattr(_local, 'method', None) or NO_METHOD
+    key = (method, " ".join(statement.split()))
+    with _lock:
+        if key not in _sql_counts and len(_sql_counts) >= MAX_SQL_STATEMENTS:
+            key = (method, OTHER_SQL)
+        _sql_counts[key] += 1
+
+
+def timed(name: Optional[str] = None):
+    '''
+    Декоратор замера метода. Записывает время вызова и число возвращённых строк,
+    а SQL, выполненный внутри, относит к этому методу.
+    Без включённого сбора добавляет только проверку флага.
+    '''
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            outer = getattr(_local, 'method', None)
+            _local.method = label
+            started = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                record(label, (time.perf_counter() - started) * 1000, count_rows(result))
+                _local.method = outer
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def _measured(name: str):
+    # Замер произвольного участка кода
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, (time.perf_counter() - started) * 1000)
+
+
+# Пустой контекст для выключенного сбора (переиспользуется)
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+def measure(name: str):
+    # Контекст замера участка кода, например открытия диалога
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _measured(name)
+
+
+def snapshot() -> Dict:
+    # Копия накопленных замеров: методы и запросы SQL по убыванию числа выполнений
+    with _lock:
+        methods = {name: histogram.snapshot() for name, histogram in _histograms.items()}
+        statements = [
+            {'method': method, 'sql': sql, 'count': count}
+            for (method, sql), count in _sql_counts.most_common()
+        ]
+    return {
+        'enabled': _enabled,
+        'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(_started_at)),
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'methods': methods,
+        'sql': statements,
+        'counters': _read_counters(),
+    }
+
+
+def dump(path: str) -> str:
+    # Сохранение замеров в файл JSON
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
+    return path
+
+
+def enable_from_environment():
+    # Включение сбора, если задана переменная MOVIES_DIAGNOSTICS
+    if os.environ.get(ENV_VARIABLE, "").strip() not in ("", "0"):
+        set_enabled(True)
@@ -21,11 +21,19 @@
 - Резервное копирование базы данных
 '''
 
+import logging
 import sys
 import os
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from PyQt6.QtCore import Qt
 from main_window import MainWindow
+import instrumentation
+
+
+logger = logging.getLogger(__name__)
+
+# Переменная окружения с уровнем журнала (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL_VARIABLE = "MOVIES_LOG_LEVEL"
 
 
 def check_requirements():
@@ -41,12 +49,12 @@ def check_requirements():
     for folder in required_folders:
         if not os.path.exists(folder):
             os.makedirs(folder)
-            print(f"Создана папка: {folder}")
+            logger.info("Создана папка: %s", folder)
     
     # Проверяем наличие UI файлов
     for file_path in required_files:
         if not os.path.exists(file_path):
-            print(f"ОШИБКА: Не найден файл {file_path}")
+            logger.error("Не найден файл %s", file_path)
             return False
     
     return True
@@ -74,8 +82,22 @@ def setup_application_style(app):
     app.setPalette(palette)
 
 
+def setup_logging():
+    # Настройка журнала: уровень задаётся переменной MOVIES_LOG_LEVEL (по умолчанию INFO)
+    level = os.environ.get(LOG_LEVEL_VARIABLE, "INFO").upper()
+    logging.basicConfig(
+        level=getattr(logging, level, logging.INFO),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+
 def main():
     # Главная функция запуска приложения
+    setup_logging()
+    
+    # Сбор замеров при запуске включается переменной MOVIES_DIAGNOSTICS
+    instrumentation.enable_from_environment()
+    
     if not check_requirements():
         sys.exit(1)
     
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('ui', 'ui'), ('posters', 'posters'), ('movies.db', '.')],
-    hiddenimports=[],
+    hiddenimports=['ui_compiled.main_window', 'ui_compiled.add_edit_dialog', 'ui_compiled.details_dialog'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -3,24 +3,43 @@
 Отвечает за отображение списка фильмов, поиск, фильтрацию и управление записями.
 '''
 
-from PyQt6 import uic
-from PyQt6.QtWidgets import QMainWindow, QTableWidgetItem, QMessageBox, QFileDialog
-from PyQt6.QtCore import Qt
-from database import Database
+import os
+from PyQt6.QtWidgets import QMainWindow, QMessageBox, QFileDialog, QProgressDialog, QApplication
+from PyQt6.QtCore import Qt, QThread
+from database import (Database, MovieChange, MovieFilter, GenreChange, CHANGE_DELETED,
+                      DEFAULT_SORT_ORDER, SORT_KEYS, sort_page_keys)
+from change_notifier import ChangeNotifier
+from ui_loader import setup_ui
 from add_edit_dialog import AddEditDialog
 from details_dialog import DetailsDialog
+from movies_model import MoviesTableModel
+from search_scheduler import SearchScheduler
+from movie_import import ImportWorker
+from movie_export import ExportWorker, EXPORT_FORMATS, detect_format
+from diagnostics_dialog import DiagnosticsDialog
+import poster_loader
+import instrumentation
+from instrumentation import timed
 
 
 class MainWindow(QMainWindow):
     # Главное окно приложения Видеотека
     
-    def __init__(self):
+    def __init__(self, db_name: str = "movies.db"):
         super().__init__()
-        # Загружаем интерфейс из ui файла
-        uic.loadUi('ui/main_window.ui', self)
+        # Загружаем интерфейс (скомпилированная форма или ui файл)
+        setup_ui(self, 'main_window')
         
         # Инициализируем базу данных
-        self.db = Database()
+        self.db = Database(db_name)
+        
+        # Фоновый поиск с собственным подключением к базе
+        self.search_scheduler = SearchScheduler(self.db.db_name, parent=self,
+                                                result_cache=self.db.result_cache)
+        self.search_scheduler.results_ready.connect(self.show_movies_page)
+        
+        # Порядок строк: пары (столбец, по возрастанию), первая пара - главный ключ
+        self.sort_order = tuple(DEFAULT_SORT_ORDER)
         
         # Настраиваем таблицу
         self.setup_table()
@@ -31,22 +50,31 @@ class MainWindow(QMainWindow):
         # Заполняем фильтр жанров
         self.setup_genre_filter()
         
+        # Фильтр, результаты которого сейчас показаны в таблице
+        self.current_filter = MovieFilter()
+        
+        # Изменения данных (свои и других процессов) приходят через шину
+        self.change_notifier = ChangeNotifier(self.db, parent=self)
+        self.change_notifier.changed.connect(self.on_data_changed)
+        
+        # Диалоги создаются при первом открытии и затем переиспользуются
+        self._add_edit_dialog = None
+        self._details_dialog = None
+        self._diagnostics_dialog = None
+        
         # Загружаем все фильмы при запуске
         self.load_movies()
     
     def setup_table(self):
         # Настройка таблицы фильмов
-        headers = ['ID', 'Название', 'Год', 'Жанр', 'Режиссёр', 'Рейтинг', 'Длительность', 'Описание', 'Постер']
-        self.moviesTable.setColumnCount(len(headers))
-        self.moviesTable.setHorizontalHeaderLabels(headers)
+        self.movies_model = MoviesTableModel(self)
+        self.moviesTable.setModel(self.movies_model)
         
-        # Скрываем столбцы ID, Описание и Постер
-        self.moviesTable.hideColumn(0)  # ID
-        self.moviesTable.hideColumn(7)  # Описание
-        self.moviesTable.hideColumn(8)  # Путь к постеру
+        # Скрываем столбец ID
+        self.moviesTable.hideColumn(MoviesTableModel.ID_COLUMN)
         
         # Растягиваем столбец Название
-        self.moviesTable.setColumnWidth(1, 250)
+        self.moviesTable.setColumnWidth(MoviesTableModel.TITLE_COLUMN, 250)
         
         # Делаем таблицу нередактируемой
         self.moviesTable.setEditTriggers(self.moviesTable.EditTrigger.NoEditTriggers)
@@ -54,6 +82,13 @@ class MainWindow(QMainWindow):
         # Выделение целой строки
         self.moviesTable.setSelectionBehavior(self.moviesTable.SelectionBehavior.SelectRows)
         self.moviesTable.setSelectionMode(self.moviesTable.SelectionMode.SingleSelection)
+        
+        # Сортировка по щелчку на заголовке выполняется базой, а не сравнением строк ячеек
+        header = self.moviesTable.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(MoviesTableModel.TITLE_COLUMN, Qt.SortOrder.AscendingOrder)
+        header.sectionClicked.connect(self.sort_by_column)
     
     def setup_genre_filter(self):
         # Заполнение выпадающего списка жанров из таблицы genres
@@ -65,6 +100,19 @@ class MainWindow(QMainWindow):
         for genre_id, genre_name in genres:
             self.genreComboBox.addItem(genre_name)
     
+    def update_genre_filter(self):
+        # Добавление новых жанров в список без сброса выбранного фильтра
+        genres = [genre_name for _, genre_name in self.db.get_all_genres()]
+        shown = [self.genreComboBox.itemText(i) for i in range(1, self.genreComboBox.count())]
+        if genres == shown:
+            return
+        
+        current_genre = self.genreComboBox.currentText()
+        self.genreComboBox.blockSignals(True)
+        self.setup_genre_filter()
+        self.genreComboBox.setCurrentText(current_genre)
+        self.genreComboBox.blockSignals(False)
+    
     def connect_signals(self):
         # Подключение всех сигналов к слотам
         self.addButton.clicked.connect(self.add_movie)
@@ -73,13 +121,20 @@ class MainWindow(QMainWindow):
         self.viewButton.clicked.connect(self.view_details)
         self.refreshButton.clicked.connect(self.refresh_data)
         self.exportButton.clicked.connect(self.export_to_csv)
+        self.importButton.clicked.connect(self.import_movies)
         self.statsButton.clicked.connect(self.show_statistics)
+        self.diagnosticsButton.clicked.connect(self.show_diagnostics)
         
         # Поиск при вводе текста
         self.searchLineEdit.textChanged.connect(self.search_movies)
         
         # Фильтр жанров
-        self.genreComboBox.currentTextChanged.connect(self.search_movies)
+        self.genreComboBox.currentTextChanged.connect(self.filter_by_genre)
+        
+        # Диапазоны года и рейтинга (значение "любой" снимает границу)
+        for spin_box in (self.yearFromSpinBox, self.yearToSpinBox,
+                         self.ratingFromSpinBox, self.ratingToSpinBox):
+            spin_box.valueChanged.connect(self.search_movies)
         
         # Двойной клик по строке для просмотра деталей
         self.moviesTable.doubleClicked.connect(self.view_details)
@@ -87,44 +142,154 @@ class MainWindow(QMainWindow):
     def load_movies(self, movies=None):
         # Загрузка фильмов в таблицу
         if movies is None:
-            movies = self.db.get_all_movies()
-        
-        # Очищаем таблицу
-        self.moviesTable.setRowCount(0)
+            # Без готового списка загружаем первую страницу каталога
+            self.load_movies_page()
+            return
         
-        # Заполняем таблицу данными
-        for row_num, movie in enumerate(movies):
-            self.moviesTable.insertRow(row_num)
-            
-            # Заполняем каждую ячейку
-            for col_num, data in enumerate(movie):
-                item = QTableWidgetItem(str(data) if data is not None else '')
-                item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                self.moviesTable.setItem(row_num, col_num, item)
+        # Передаём строки модели, ячейки создаются только при отрисовке
+        self.movies_model.set_movies(movies)
         
         # Обновляем счетчик фильмов в статус-баре
         self.statusBar().showMessage(f"Всего фильмов: {len(movies)}")
     
-    def search_movies(self):
-        # Поиск и фильтрация фильмов
-        search_text = self.searchLineEdit.text().strip()
-        genre = self.genreComboBox.currentText()
+    @timed()
+    def load_movies_page(self, movie_filter: MovieFilter = MovieFilter()):
+        # Загрузка первой страницы, остальные подгружаются при прокрутке
+        movie_filter = movie_filter._replace(sort_order=self.sort_order).normalized()
+        movies, next_cursor = self.db.filter_movies_page(movie_filter)
+        total = self.db.count_filtered(movie_filter)
+        self.show_movies_page(movies, next_cursor, total, movie_filter)
+    
+    @timed()
+    def show_movies_page(self, movies, next_cursor, total: int, movie_filter: MovieFilter):
+        # Отображение первой страницы с ленивой подгрузкой остальных в том же порядке
+        def fetch_page(after):
+            return self.db.filter_movies_page(movie_filter, after)
+        
+        self.movies_model.set_movies(movies, next_cursor, fetch_page,
+                                     sort_page_keys(movie_filter.sort_order))
+        self.current_filter = movie_filter
         
-        # Выполняем поиск в базе
-        movies = self.db.search_movies(search_text, genre)
+        # Порядок сменили, пока выполнялся запрос
+        if movie_filter.sort_order != self.sort_order:
+            self.apply_sort_order()
+        
+        # Обновляем счетчик фильмов в статус-баре
+        self.statusBar().showMessage(f"Всего фильмов: {total}")
+    
+    def on_data_changed(self, event):
+        # Реакция на событие шины изменений
+        if isinstance(event, MovieChange):
+            self.apply_movie_change(event)
+        elif isinstance(event, GenreChange):
+            self.update_genre_filter()
+        else:
+            # Массовые и внешние изменения: запрос выполняется заново
+            # по полям фильтра (они могут быть новее показанного результата)
+            self.update_genre_filter()
+            self.search_scheduler.search_now(self.filter_from_controls())
+    
+    def apply_movie_change(self, change: MovieChange):
+        '''
+        Точечное обновление таблицы после добавления, изменения или удаления фильма.
+        Меняется только затронутая строка, поиск, фильтр и прокрутка сохраняются.
+        '''
+        if change.kind == CHANGE_DELETED:
+            self.movies_model.remove_movie(change.movie_id)
+        else:
+            # Строка запрашивается с текущим фильтром: не подходящая под него убирается
+            movie = self.db.get_movie_row(change.movie_id, self.current_filter)
+            if movie is None:
+                self.movies_model.remove_movie(change.movie_id)
+            else:
+                self.movies_model.put_movie(movie)
         
-        # Загружаем результаты в таблицу
-        self.load_movies(movies)
+        total = self.db.count_filtered(self.current_filter)
+        self.statusBar().showMessage(f"Всего фильмов: {total}")
+    
+    def filter_from_controls(self) -> MovieFilter:
+        # Фильтр по полям поиска, жанра и диапазонов (минимум поля означает "любой")
+        def bound(spin_box):
+            value = spin_box.value()
+            return None if value == spin_box.minimum() else value
+        
+        return MovieFilter(
+            search_text=self.searchLineEdit.text().strip(),
+            genre=self.genreComboBox.currentText(),
+            year_from=bound(self.yearFromSpinBox),
+            year_to=bound(self.yearToSpinBox),
+            rating_from=bound(self.ratingFromSpinBox),
+            rating_to=bound(self.ratingToSpinBox),
+            sort_order=self.sort_order,
+        )
+    
+    def search_movies(self):
+        # Поиск фильмов: запрос откладывается до паузы в наборе текста или смене значений
+        self.search_scheduler.schedule(self.filter_from_controls())
+    
+    def filter_by_genre(self):
+        # Смена жанра применяется сразу, без задержки
+        self.search_scheduler.search_now(self.filter_from_controls())
+    
+    def sort_by_column(self, section: int):
+        '''
+        Сортировка по щелчку на заголовке столбца.
+        Повторный щелчок по главному столбцу меняет направление, щелчок с Shift
+        добавляет столбец дополнительным ключом (или меняет его направление).
+        '''
+        column = MoviesTableModel.FIELDS[section]
+        if column in SORT_KEYS:
+            order = list(self.sort_order)
+            position = next((i for i, (name, _) in enumerate(order) if name == column), None)
+            if QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier:
+                if position is None:
+                    order.append((column, True))
+                else:
+                    order[position] = (column, not order[position][1])
+            elif position == 0:
+                order[0] = (column, not order[0][1])
+            else:
+                order = [(column, True)]
+            self.sort_order = tuple(order)
+            self.apply_sort_order()
+        
+        # Индикатор показывает главный ключ (заголовок мог сам перевернуть стрелку)
+        main_column, ascending = self.sort_order[0]
+        self.moviesTable.horizontalHeader().setSortIndicator(
+            MoviesTableModel.FIELDS.index(main_column),
+            Qt.SortOrder.AscendingOrder if ascending else Qt.SortOrder.DescendingOrder
+        )
+    
+    def apply_sort_order(self):
+        # Загруженный целиком результат сортируется в памяти, иначе запрос выполняется заново
+        if self.movies_model.is_fully_loaded():
+            self.movies_model.sort_loaded(sort_page_keys(self.sort_order))
+        else:
+            self.search_scheduler.search_now(self.filter_from_controls())
+    
+    def add_edit_dialog(self) -> AddEditDialog:
+        # Общий диалог добавления и редактирования
+        if self._add_edit_dialog is None:
+            self._add_edit_dialog = AddEditDialog(self.db, parent=self)
+        return self._add_edit_dialog
+    
+    def details_dialog(self) -> DetailsDialog:
+        # Общий диалог просмотра, листается сочетаниями Alt+Left / Alt+Right
+        if self._details_dialog is None:
+            self._details_dialog = DetailsDialog(self.db, parent=self)
+            self._details_dialog.navigate.connect(self.show_adjacent_details)
+        return self._details_dialog
     
     def add_movie(self):
         # Открытие диалога добавления фильма
-        dialog = AddEditDialog(self.db, parent=self)
-        if dialog.exec():
-            self.refresh_data()
+        with instrumentation.measure("MainWindow.open_add_dialog"):
+            dialog = self.add_edit_dialog()
+            dialog.show_movie(None)
+        dialog.exec()
     
     def edit_movie(self):
         # Открытие диалога редактирования фильма
-        selected_row = self.moviesTable.currentRow()
+        selected_row = self.moviesTable.currentIndex().row()
         
         if selected_row < 0:
             QMessageBox.warning(self, "Предупреждение", 
@@ -132,16 +297,18 @@ class MainWindow(QMainWindow):
             return
         
         # Получаем ID фильма из скрытого столбца
-        movie_id = int(self.moviesTable.item(selected_row, 0).text())
-        
-        # Открываем диалог редактирования
-        dialog = AddEditDialog(self.db, movie_id, parent=self)
-        if dialog.exec():
-            self.refresh_data()
+        movie_id = self.movies_model.get_movie_id(selected_row)
+        
+        # Открываем диалог редактирования (таблицу обновит шина изменений)
+        with instrumentation.measure("MainWindow.open_edit_dialog"):
+            dialog = self.add_edit_dialog()
+            shown = dialog.show_movie(movie_id)
+        if shown:
+            dialog.exec()
     
     def delete_movie(self):
         # Удаление фильма с подтверждением
-        selected_row = self.moviesTable.currentRow()
+        selected_row = self.moviesTable.currentIndex().row()
         
         if selected_row < 0:
             QMessageBox.warning(self, "Предупреждение", 
@@ -149,8 +316,8 @@ class MainWindow(QMainWindow):
             return
         
         # Получаем название фильма для подтверждения
-        movie_title = self.moviesTable.item(selected_row, 1).text()
-        movie_id = int(self.moviesTable.item(selected_row, 0).text())
+        movie_title = self.movies_model.get_movie_title(selected_row)
+        movie_id = self.movies_model.get_movie_id(selected_row)
         
         # Запрашиваем подтверждение
         reply = QMessageBox.question(
@@ -163,13 +330,12 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.StandardButton.Yes:
             if self.db.delete_movie(movie_id):
                 QMessageBox.information(self, "Успех", "Фильм успешно удалён")
-                self.refresh_data()
             else:
                 QMessageBox.critical(self, "Ошибка", "Не удалось удалить фильм")
     
     def view_details(self):
         # Просмотр детальной информации о фильме
-        selected_row = self.moviesTable.currentRow()
+        selected_row = self.moviesTable.currentIndex().row()
         
         if selected_row < 0:
             QMessageBox.warning(self, "Предупреждение", 
@@ -177,68 +343,168 @@ class MainWindow(QMainWindow):
             return
         
         # Получаем ID фильма
-        movie_id = int(self.moviesTable.item(selected_row, 0).text())
+        movie_id = self.movies_model.get_movie_id(selected_row)
         
         # Открываем окно деталей
-        dialog = DetailsDialog(self.db, movie_id, parent=self)
-        dialog.exec()
+        with instrumentation.measure("MainWindow.open_details_dialog"):
+            dialog = self.details_dialog()
+            shown = dialog.show_movie(movie_id)
+        if shown:
+            dialog.exec()
+    
+    def show_adjacent_details(self, step: int):
+        # Переход окна деталей к соседней строке таблицы
+        row = self.moviesTable.currentIndex().row() + step
+        
+        # Следующая страница подгружается, если список кончился
+        if row >= self.movies_model.rowCount() and self.movies_model.canFetchMore():
+            self.movies_model.fetchMore()
+        if row < 0 or row >= self.movies_model.rowCount():
+            return
+        
+        self.moviesTable.selectRow(row)
+        self.details_dialog().show_movie(self.movies_model.get_movie_id(row))
     
     def refresh_data(self):
         # Обновление данных в таблице
         self.searchLineEdit.clear()
         self.genreComboBox.setCurrentIndex(0)
+        for spin_box in (self.yearFromSpinBox, self.yearToSpinBox,
+                         self.ratingFromSpinBox, self.ratingToSpinBox):
+            spin_box.setValue(spin_box.minimum())
         
         # Обновляем фильтр жанров
         self.setup_genre_filter()
         
+        # Отменяем поиск, запущенный очисткой фильтров
+        self.search_scheduler.cancel()
+        
         # Перезагружаем все фильмы
         self.load_movies()
     
     def export_to_csv(self):
-        # Экспорт списка фильмов в CSV файл
-        file_path, _ = QFileDialog.getSaveFileName(
+        # Потоковый экспорт списка фильмов в фоновом потоке
+        filters = [description for description, _ in EXPORT_FORMATS.values()]
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self,
-            "Экспорт в CSV",
+            "Экспорт фильмов",
             "movies_export.csv",
-            "CSV файлы (*.csv)"
+            ";;".join(filters)
+        )
+        
+        if not file_path:
+            return
+        
+        # Формат по выбранному фильтру, если расширение не указано явно
+        export_format = detect_format(file_path)
+        for format_name, (description, extension) in EXPORT_FORMATS.items():
+            if description == selected_filter and not file_path.lower().endswith(extension):
+                file_path += extension
+                export_format = format_name
+        
+        total = self.db.count_movies()
+        progress_dialog = QProgressDialog("Экспорт фильмов...", "Отмена", 0, max(total, 1), self)
+        progress_dialog.setWindowTitle("Экспорт")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        
+        # Исполнитель со своим подключением к базе в отдельном потоке
+        thread = QThread(self)
+        worker = ExportWorker(self.db.db_name, file_path, export_format)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.progress.connect(progress_dialog.setValue)
+        # Поток исполнителя занят экспортом и не обрабатывает очередь событий,
+        # поэтому флаг отмены ставится напрямую из потока GUI
+        progress_dialog.canceled.connect(worker.cancel, Qt.ConnectionType.DirectConnection)
+        
+        def on_finished(success, message):
+            progress_dialog.close()
+            thread.quit()
+            thread.wait()
+            worker.deleteLater()
+            thread.deleteLater()
+            if success:
+                QMessageBox.information(self, "Успех", message)
+            else:
+                QMessageBox.warning(self, "Экспорт", message)
+        
+        worker.finished.connect(on_finished)
+        
+        # Ссылка на исполнителя нужна, пока поток работает
+        self.export_worker = worker
+        thread.start()
+    
+    def import_movies(self):
+        # Импорт фильмов из CSV или JSON Lines
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Импорт фильмов",
+            "",
+            "CSV и JSON Lines (*.csv *.jsonl *.json);;Все файлы (*)"
         )
         
         if not file_path:
             return
         
-        try:
-            # Получаем все фильмы
-            movies = self.db.get_all_movies()
-            
-            # Записываем в файл
-            with open(file_path, 'w', encoding='utf-8') as f:
-                # Заголовок
-                f.write("ID;Название;Год;Жанр;Режиссёр;Рейтинг;Длительность;Описание;Постер\n")
-                
-                # Данные
-                for movie in movies:
-                    row = []
-                    for field in movie:
-                        if field is None:
-                            row.append('')
-                        else:
-                            # Экранируем точку с запятой
-                            row.append(str(field).replace(';', ','))
-                    
-                    f.write(';'.join(row) + '\n')
-            
-            QMessageBox.information(
-                self,
-                "Успех",
-                f"Список фильмов успешно экспортирован в:\n{file_path}"
-            )
-            
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Ошибка",
-                f"Не удалось экспортировать данные:\n{str(e)}"
-            )
+        # Количество записей заранее неизвестно, показываем индикатор занятости
+        progress_dialog = QProgressDialog("Импорт фильмов...", "Отмена", 0, 0, self)
+        progress_dialog.setWindowTitle("Импорт")
+        progress_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+        
+        # Исполнитель со своим подключением к базе в отдельном потоке:
+        # чтение файла, обработка постеров и вставка не занимают поток GUI
+        thread = QThread(self)
+        worker = ImportWorker(self.db.db_name, file_path)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        
+        def on_progress(processed, inserted):
+            progress_dialog.setLabelText(f"Обработано записей: {processed}\nДобавлено: {inserted}")
+        
+        worker.progress.connect(on_progress)
+        # Поток исполнителя занят импортом и не обрабатывает очередь событий,
+        # поэтому флаг отмены ставится напрямую из потока GUI
+        progress_dialog.canceled.connect(worker.cancel, Qt.ConnectionType.DirectConnection)
+        
+        # Пакеты фиксируются другим подключением: таблица перечитывается один раз после импорта
+        self.change_notifier.pause()
+        
+        def finish():
+            progress_dialog.close()
+            thread.quit()
+            thread.wait()
+            worker.deleteLater()
+            thread.deleteLater()
+            # Изменения другого подключения приходят событием DataReset
+            self.change_notifier.resume()
+        
+        def on_finished(result):
+            finish()
+            # Формируем отчёт
+            message = (f"Обработано записей: {result['processed']}\n"
+                       f"Добавлено фильмов: {result['inserted']}\n"
+                       f"Отклонено записей: {len(result['rejected'])}")
+            if result['cancelled']:
+                message += "\n\nИмпорт прерван пользователем"
+            if result['rejected']:
+                message += "\n\nПервые ошибки:\n"
+                message += "\n".join(
+                    f"• запись {row_number}: {reason}" for row_number, reason in result['rejected'][:10]
+                )
+            QMessageBox.information(self, "Импорт", message)
+        
+        def on_failed(message):
+            finish()
+            QMessageBox.critical(self, "Ошибка", message)
+        
+        worker.finished.connect(on_finished)
+        worker.failed.connect(on_failed)
+        
+        # Ссылка на исполнителя нужна, пока поток работает
+        self.import_worker = worker
+        thread.start()
     
     def show_statistics(self):
         # Отображение статистики коллекции
@@ -271,8 +537,10 @@ class MainWindow(QMainWindow):
         # По годам
         if stats['by_year']:
             message += f"<b>По годам выпуска:</b><br>"
-            for year, count in sorted(stats['by_year'].items(), reverse=True):
-                message += f"• {year}: {count}<br>"
+            # Фильмы без года (из старых импортов) идут последними
+            for year, count in sorted(stats['by_year'].items(), key=lambda item: (item[0] is not None, item[0] or 0),
+                                      reverse=True):
+                message += f"• {year or 'Не указан'}: {count}<br>"
         
         # Показываем диалог
         msg_box = QMessageBox(self)
@@ -281,7 +549,18 @@ class MainWindow(QMainWindow):
         msg_box.setText(message)
         msg_box.exec()
     
+    def show_diagnostics(self):
+        # Окно замеров производительности (немодальное, чтобы работать с таблицей)
+        if self._diagnostics_dialog is None:
+            self._diagnostics_dialog = DiagnosticsDialog(self)
+        self._diagnostics_dialog.show()
+        self._diagnostics_dialog.raise_()
+    
     def closeEvent(self, event):
         # Обработка закрытия окна
+        self.search_scheduler.shutdown()
+        self.change_notifier.stop()
+        # Поздние результаты декодирования постеров отбрасываются, а не передаются удалённым окнам
+        poster_loader.shutdown()
         self.db.close()
         event.accept()
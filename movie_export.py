@@ -0,0 +1,173 @@
+'''
+Модуль потокового экспорта фильмов.
+Читает базу пакетами и сразу записывает их в файл, поэтому расход памяти
+не зависит от размера коллекции. Экспорт выполняется в отдельном потоке.
+'''
+
+import csv
+import gzip
+import json
+import os
+from typing import Callable, Optional
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from database import Database
+
+# Parquet доступен только при установленном pyarrow
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# Заголовок экспортируемой таблицы
+EXPORT_HEADERS = ['ID', 'Название', 'Год', 'Жанр', 'Режиссёр', 'Рейтинг', 'Длительность', 'Описание', 'Постер']
+
+# Имена полей для форматов с именованными полями (совпадают с полями импорта)
+EXPORT_FIELDS = ['id', 'title', 'year', 'genre', 'director', 'rating', 'duration', 'description', 'poster_path']
+
+# Количество строк, читаемых из базы за один раз
+EXPORT_CHUNK_SIZE = 2000
+
+# Поддерживаемые форматы: имя -> (описание для диалога, расширение)
+EXPORT_FORMATS = {
+    'csv': ("CSV файлы (*.csv)", '.csv'),
+    'csv.gz': ("CSV, сжатый gzip (*.csv.gz)", '.csv.gz'),
+    'jsonl': ("JSON Lines (*.jsonl)", '.jsonl'),
+}
+if pyarrow is not None:
+    EXPORT_FORMATS['parquet'] = ("Parquet (*.parquet)", '.parquet')
+
+
+class ExportCancelled(Exception):
+    # Экспорт прерван пользователем
+    pass
+
+
+def detect_format(file_path: str) -> str:
+    # Определение формата по расширению файла
+    lower_path = file_path.lower()
+    for export_format, (_, extension) in sorted(
+            EXPORT_FORMATS.items(), key=lambda item: -len(item[1][1])):
+        if lower_path.endswith(extension):
+            return export_format
+    return 'csv'
+
+
+def _write_csv(f, chunks, on_chunk):
+    # Запись CSV через модуль csv с корректным экранированием
+    writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_MINIMAL)
+    writer.writerow(EXPORT_HEADERS)
+    for rows in chunks:
+        writer.writerows(rows)
+        on_chunk(len(rows))
+
+
+def _write_jsonl(f, chunks, on_chunk):
+    # Запись JSON Lines: одна запись на строку
+    for rows in chunks:
+        f.writelines(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+        on_chunk(len(rows))
+
+
+def _write_parquet(file_path, chunks, on_chunk):
+    # Запись Parquet: каждый пакет становится отдельной группой строк
+    schema = pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('title', pyarrow.string()),
+        ('year', pyarrow.int32()),
+        ('genre', pyarrow.string()),
+        ('director', pyarrow.string()),
+        ('rating', pyarrow.float64()),
+        ('duration', pyarrow.int32()),
+        ('description', pyarrow.string()),
+        ('poster_path', pyarrow.string()),
+    ])
+    with pyarrow.parquet.ParquetWriter(file_path, schema, compression='zstd') as writer:
+        for rows in chunks:
+            columns = [list(column) for column in zip(*rows)]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+            on_chunk(len(rows))
+
+
+def export_movies(db: Database, file_path: str, export_format: Optional[str] = None,
+                  progress: Optional[Callable[[int], bool]] = None,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> int:
+    '''
+    Потоковый экспорт всех фильмов в файл.
+    progress(записано строк) вызывается после каждого пакета, возврат False прерывает экспорт.
+    Возвращает количество записанных строк. При ошибке или отмене частичный файл удаляется.
+    '''
+    if export_format is None:
+        export_format = detect_format(file_path)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат экспорта: {export_format}")
+
+    written = 0
+
+    def on_chunk(count):
+        nonlocal written
+        written += count
+        if progress is not None and progress(written) is False:
+            raise ExportCancelled()
+
+    chunks = db.iter_movies(chunk_size)
+    try:
+        if export_format == 'parquet':
+            _write_parquet(file_path, chunks, on_chunk)
+        elif export_format == 'csv.gz':
+            with gzip.open(file_path, 'wt', encoding='utf-8', newline='') as f:
+                _write_csv(f, chunks, on_chunk)
+        elif export_format == 'jsonl':
+            with open(file_path, 'w', encoding='utf-8') as f:
+                _write_jsonl(f, chunks, on_chunk)
+        else:
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                _write_csv(f, chunks, on_chunk)
+    except BaseException:
+        chunks.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    return written
+
+
+class ExportWorker(QObject):
+    # Исполнитель экспорта, работает в отдельном потоке со своим подключением
+
+    progress = pyqtSignal(int)
+    finished = pyqtSignal(bool, str)
+
+    def __init__(self, db_name: str, file_path: str, export_format: Optional[str] = None):
+        super().__init__()
+        self.db_name = db_name
+        self.file_path = file_path
+        self.export_format = export_format
+        self._cancelled = False
+
+    def cancel(self):
+        # Запрос отмены (вызывается из потока GUI)
+        self._cancelled = True
+
+    @pyqtSlot()
+    def run(self):
+        # Выполнение экспорта
+        # Экспорт читает таблицу потоком, кэш выборок ему не нужен
+        db = Database(self.db_name, cache_entries=0)
+        try:
+            def on_progress(written):
+                self.progress.emit(written)
+                return not self._cancelled
+
+            written = export_movies(db, self.file_path, self.export_format, on_progress)
+            self.finished.emit(True, f"Экспортировано фильмов: {written}\nФайл: {self.file_path}")
+        except ExportCancelled:
+            self.finished.emit(False, "Экспорт отменён")
+        except Exception as e:
+            self.finished.emit(False, f"Не удалось экспортировать данные:\n{str(e)}")
+        finally:
+            db.close()
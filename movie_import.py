@@ -0,0 +1,152 @@
+'''
+Модуль чтения внешних источников для импорта фильмов.
+Читает CSV и JSON Lines потоково, по одной записи за раз.
+Импорт из окна выполняется в отдельном потоке (ImportWorker).
+'''
+
+import csv
+import json
+import os
+from typing import Dict, Iterable, Iterator, Union
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from database import Database
+from poster_store import POSTER_STORE_DIR, ingest_poster
+
+
+# Соответствие заголовков столбцов полям записи (включая заголовки экспорта)
+FIELD_ALIASES = {
+    'title': 'title', 'название': 'title',
+    'year': 'year', 'год': 'year',
+    'genre': 'genre', 'жанр': 'genre',
+    'director': 'director', 'режиссёр': 'director', 'режиссер': 'director',
+    'rating': 'rating', 'рейтинг': 'rating',
+    'duration': 'duration', 'длительность': 'duration',
+    'description': 'description', 'описание': 'description',
+    'poster_path': 'poster_path', 'poster': 'poster_path', 'постер': 'poster_path',
+}
+
+# Через сколько прочитанных записей исполнитель сообщает о ходе импорта
+# (между пакетами вставки, которые с обработкой постеров читаются долго)
+IMPORT_PROGRESS_STEP = 500
+
+
+def _normalize_keys(record: Dict) -> Dict:
+    # Приведение имён полей к именам, которые понимает Database.bulk_add_movies
+    normalized = {}
+    for key, value in record.items():
+        if key is None:
+            continue
+        field = FIELD_ALIASES.get(str(key).strip().lower())
+        if field:
+            normalized[field] = value
+    return normalized
+
+
+def read_csv_records(file_path: str, encoding: str = 'utf-8-sig') -> Iterator[Dict]:
+    # Потоковое чтение CSV: разделитель определяется по началу файла
+    with open(file_path, 'r', encoding=encoding, newline='') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        # От анализатора берётся только разделитель: кавычки он определяет ненадёжно
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+        except csv.Error:
+            delimiter = ','
+
+        for record in csv.DictReader(f, delimiter=delimiter):
+            yield _normalize_keys(record)
+
+
+def read_jsonl_records(file_path: str, encoding: str = 'utf-8') -> Iterator[Union[Dict, ValueError]]:
+    # Потоковое чтение JSON Lines: одна запись на строку
+    # Некорректная строка передаётся как ValueError и будет отклонена импортом
+    with open(file_path, 'r', encoding=encoding) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield ValueError(f"Строка {line_number}: некорректный JSON ({e.msg})")
+                continue
+            if isinstance(record, dict):
+                yield _normalize_keys(record)
+            else:
+                yield ValueError(f"Строка {line_number}: ожидался объект JSON")
+
+
+def read_records(file_path: str) -> Iterator[Union[Dict, ValueError]]:
+    # Выбор формата по расширению файла
+    if file_path.lower().endswith(('.jsonl', '.json', '.ndjson')):
+        return read_jsonl_records(file_path)
+    return read_csv_records(file_path)
+
+
+def ingest_posters(records: Iterable[Union[Dict, ValueError]], base_dir: str,
+                   keep_original: bool = False) -> Iterator[Union[Dict, ValueError]]:
+    '''
+    Перенос постеров импортируемых записей в хранилище с уменьшением и пережатием.
+    Относительные пути считаются от папки файла импорта. Пути, уже указывающие
+    в хранилище, и отсутствующие файлы остаются без изменений.
+    '''
+    for record in records:
+        poster_path = record.get('poster_path') if isinstance(record, dict) else None
+        if poster_path and not str(poster_path).startswith(POSTER_STORE_DIR + "/"):
+            source_path = os.path.join(base_dir, str(poster_path).strip())
+            if os.path.isfile(source_path):
+                try:
+                    record['poster_path'] = ingest_poster(source_path, keep_original)
+                except OSError as e:
+                    yield ValueError(f"Не удалось сохранить постер {poster_path}: {e}")
+                    continue
+        yield record
+
+
+class ImportWorker(QObject):
+    # Исполнитель импорта, работает в отдельном потоке со своим подключением
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db_name: str, file_path: str):
+        super().__init__()
+        self.db_name = db_name
+        self.file_path = file_path
+        self._cancelled = False
+        self._inserted = 0
+
+    def cancel(self):
+        # Запрос отмены (вызывается из потока GUI)
+        self._cancelled = True
+
+    def _records(self) -> Iterator[Union[Dict, ValueError]]:
+        # Записи файла с постерами в хранилище; после отмены чтение прекращается,
+        # уже прочитанные записи добавляются последним пакетом
+        records = ingest_posters(read_records(self.file_path), os.path.dirname(self.file_path))
+        for read, record in enumerate(records, start=1):
+            if self._cancelled:
+                return
+            yield record
+            if read % IMPORT_PROGRESS_STEP == 0:
+                self.progress.emit(read, self._inserted)
+
+    @pyqtSlot()
+    def run(self):
+        # Выполнение импорта
+        # Импорт только пишет, кэш выборок ему не нужен
+        db = Database(self.db_name, cache_entries=0)
+        try:
+            def on_progress(processed, inserted):
+                self._inserted = inserted
+                self.progress.emit(processed, inserted)
+                return not self._cancelled
+
+            result = db.bulk_add_movies(self._records(), progress=on_progress)
+            result['cancelled'] = result['cancelled'] or self._cancelled
+            self.finished.emit(result)
+        except (OSError, UnicodeDecodeError) as e:
+            self.failed.emit(f"Не удалось прочитать файл:\n{str(e)}")
+        finally:
+            db.close()
@@ -0,0 +1,248 @@
+'''
+Модуль модели таблицы фильмов.
+Хранит строки в компактном столбцовом виде и отдаёт ячейки представлению по запросу.
+'''
+
+from itertools import islice
+from typing import Dict, List, Tuple, Optional, Callable
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from database import LIST_COLUMNS, SEARCH_PAGE_KEYS, compare_sort_values, sort_value_key
+from instrumentation import timed
+
+
+class MoviesTableModel(QAbstractTableModel):
+    # Виртуальная модель таблицы фильмов для QTableView
+
+    # Заголовки столбцов (ID скрыт, описание и постер не хранятся)
+    HEADERS = ['ID', 'Название', 'Год', 'Жанр', 'Режиссёр', 'Рейтинг', 'Длительность']
+    
+    # Поля записи Movie, которые хранятся в столбцах
+    FIELDS = LIST_COLUMNS
+
+    # Индексы столбцов
+    ID_COLUMN = 0
+    TITLE_COLUMN = 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # Каждый столбец хранится отдельным списком
+        self._columns: List[list] = [[] for _ in self.HEADERS]
+        self._row_count = 0
+        
+        # Подгрузка следующих страниц при прокрутке
+        self._next_cursor: Optional[Tuple] = None
+        self._fetch_page: Optional[Callable] = None
+        
+        # Ключи сортировки строк, по ним точечно вставляются изменённые фильмы
+        self._order_keys: List[Tuple] = SEARCH_PAGE_KEYS
+        
+        # Ключи сортировки столбцов для сортировки в памяти: (выражение, позиция) -> список
+        self._decorated_keys: Dict[Tuple, list] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        # Количество строк (у дочерних элементов строк нет)
+        if parent.isValid():
+            return 0
+        return self._row_count
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        # Количество столбцов
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        # Отдача значения ячейки только в момент отрисовки
+        if not index.isValid():
+            return None
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = self._columns[index.column()][index.row()]
+            return str(value) if value is not None else ''
+
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignCenter
+
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation,
+                   role: int = Qt.ItemDataRole.DisplayRole):
+        # Заголовки столбцов
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return str(section + 1)
+
+    def set_movies(self, movies: List[Tuple], next_cursor: Optional[Tuple] = None,
+                   fetch_page: Optional[Callable] = None,
+                   order_keys: List[Tuple] = SEARCH_PAGE_KEYS):
+        '''
+        Замена всех строк модели одним сбросом.
+        fetch_page(after) возвращает следующую страницу и её курсор,
+        он вызывается, когда представление докручено до конца.
+        order_keys - ключи (выражение, позиция, по убыванию), в порядке которых идут строки.
+        '''
+        self.beginResetModel()
+        self._columns = [[] for _ in self.HEADERS]
+        self._row_count = 0
+        self._decorated_keys = {}
+        self._append_rows(movies)
+        self._next_cursor = next_cursor
+        self._fetch_page = fetch_page
+        self._order_keys = order_keys
+        self.endResetModel()
+    
+    def _append_rows(self, movies: List[Tuple]):
+        # Добавление строк в столбцы, описание и постер отбрасываются
+        if not movies:
+            return
+        column_count = len(self.HEADERS)
+        self._decorated_keys.clear()
+        for column, values in zip(self._columns, islice(zip(*movies), column_count)):
+            column.extend(values)
+        self._row_count += len(movies)
+    
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        # Есть ли ещё не загруженные страницы
+        if parent.isValid():
+            return False
+        return self._next_cursor is not None and self._fetch_page is not None
+    
+    @timed()
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        # Загрузка следующей страницы
+        if not self.canFetchMore(parent):
+            return
+        
+        movies, next_cursor = self._fetch_page(self._next_cursor)
+        self._next_cursor = next_cursor
+        if not movies:
+            return
+        
+        self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(movies) - 1)
+        self._append_rows(movies)
+        self.endInsertRows()
+    
+    def is_fully_loaded(self) -> bool:
+        # Все строки результата уже в модели (следующих страниц нет)
+        return self._next_cursor is None
+    
+    def _decorated(self, expr: str, position: int) -> list:
+        # Ключи сортировки столбца: вычисляются один раз и живут, пока строки не изменятся
+        key = (expr, position)
+        values = self._decorated_keys.get(key)
+        if values is None:
+            values = self._decorated_keys[key] = list(map(sort_value_key(expr), self._columns[position]))
+        return values
+    
+    @timed()
+    def sort_loaded(self, order_keys: List[Tuple]):
+        '''
+        Сортировка загруженных строк в памяти, без запроса к базе.
+        Порядок совпадает с ORDER BY по тем же ключам (выражение, позиция, по убыванию).
+        Выделение и другие сохранённые индексы представления переносятся на новые места.
+        '''
+        self.layoutAboutToBeChanged.emit()
+        
+        # Устойчивые проходы от младшего ключа к старшему по заранее вычисленным ключам
+        order = list(range(self._row_count))
+        for expr, position, descending in reversed(order_keys):
+            order.sort(key=self._decorated(expr, position).__getitem__, reverse=descending)
+        
+        self._columns = [[column[row] for row in order] for column in self._columns]
+        self._decorated_keys = {
+            key: [values[row] for row in order] for key, values in self._decorated_keys.items()
+        }
+        self._order_keys = order_keys
+        
+        new_rows = [0] * len(order)
+        for new_row, old_row in enumerate(order):
+            new_rows[old_row] = new_row
+        old_indexes = self.persistentIndexList()
+        self.changePersistentIndexList(old_indexes, [
+            self.index(new_rows[index.row()], index.column()) for index in old_indexes
+        ])
+        self.layoutChanged.emit()
+    
+    def find_row(self, movie_id: int) -> int:
+        # Номер строки фильма среди загруженных (-1, если строки нет)
+        try:
+            return self._columns[self.ID_COLUMN].index(movie_id)
+        except ValueError:
+            return -1
+    
+    def _sort_values(self, row: int) -> Tuple:
+        # Значения ключей сортировки строки
+        return tuple(self._columns[position][row] for _, position, _ in self._order_keys)
+    
+    def _insert_position(self, values: Tuple) -> int:
+        # Двоичный поиск места строки среди загруженных
+        low, high = 0, self._row_count
+        while low < high:
+            middle = (low + high) // 2
+            if compare_sort_values(self._order_keys, self._sort_values(middle), values) < 0:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def remove_movie(self, movie_id: int) -> bool:
+        # Удаление одной строки, остальные строки и выделение не сбрасываются
+        row = self.find_row(movie_id)
+        if row < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self._decorated_keys.clear()
+        for column in self._columns:
+            del column[row]
+        self._row_count -= 1
+        self.endRemoveRows()
+        return True
+    
+    def put_movie(self, movie: Tuple):
+        '''
+        Вставка новой или обновление существующей строки с сохранением порядка.
+        Строка, которая по порядку идёт после загруженных страниц, не вставляется:
+        она придёт со следующей страницей.
+        '''
+        values = tuple(movie[position] for _, position, _ in self._order_keys)
+        row = self.find_row(movie[self.ID_COLUMN])
+        
+        # Если строка осталась между соседями, достаточно обновить ячейки
+        if row >= 0:
+            keeps_place = (
+                (row == 0 or compare_sort_values(self._order_keys, self._sort_values(row - 1), values) < 0)
+                and (row == self._row_count - 1
+                     or compare_sort_values(self._order_keys, values, self._sort_values(row + 1)) < 0)
+            )
+            if keeps_place:
+                self._decorated_keys.clear()
+                for column, value in zip(self._columns, movie):
+                    column[row] = value
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+                return
+            self.remove_movie(movie[self.ID_COLUMN])
+        
+        if self._next_cursor is not None and compare_sort_values(self._order_keys, values, self._next_cursor) > 0:
+            return
+        
+        row = self._insert_position(values)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._decorated_keys.clear()
+        for column, value in zip(self._columns, movie):
+            column.insert(row, value)
+        self._row_count += 1
+        self.endInsertRows()
+    
+    def get_movie_id(self, row: int) -> Optional[int]:
+        # Получение ID фильма из скрытого столбца
+        if row < 0 or row >= self._row_count:
+            return None
+        return self._columns[self.ID_COLUMN][row]
+
+    def get_movie_title(self, row: int) -> str:
+        # Получение названия фильма по номеру строки
+        if row < 0 or row >= self._row_count:
+            return ""
+        return self._columns[self.TITLE_COLUMN][row]
@@ -0,0 +1,230 @@
+'''
+Модуль кэша миниатюр постеров.
+Миниатюры заранее уменьшаются до ближайшего размера из набора и хранятся на диске
+под ключом "хэш содержимого + размер". Поверх диска работает кэш QPixmapCache в памяти.
+'''
+
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from PyQt6.QtGui import QImage, QImageReader, QPixmap, QPixmapCache
+from PyQt6.QtCore import Qt
+
+
+logger = logging.getLogger(__name__)
+
+
+# Папка с миниатюрами
+THUMBNAIL_DIR = ".thumbnails"
+
+# Размеры миниатюр (по большей стороне), запрошенный размер округляется вверх
+THUMBNAIL_BUCKETS = (128, 256, 512, 1024)
+
+# Предел размера папки миниатюр на диске (байт)
+DISK_CACHE_LIMIT = 100 * 1024 * 1024
+
+# Предел кэша изображений в памяти (КБ)
+MEMORY_CACHE_LIMIT_KB = 32 * 1024
+
+
+def thumbnail_bucket(width: int, height: int) -> int:
+    # Размер миниатюры, достаточный для области width x height
+    size = max(width, height)
+    for bucket in THUMBNAIL_BUCKETS:
+        if size <= bucket:
+            return bucket
+    return THUMBNAIL_BUCKETS[-1]
+
+
+class PosterThumbnailCache:
+    # Двухуровневый кэш миниатюр: QPixmapCache в памяти и файлы на диске
+
+    def __init__(self, thumbnail_dir: str = THUMBNAIL_DIR, disk_limit: int = DISK_CACHE_LIMIT):
+        self.thumbnail_dir = thumbnail_dir
+        self.disk_limit = disk_limit
+        # Хэши содержимого по (путь, время изменения, размер), чтобы не читать файл повторно
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        # Текущий объём папки миниатюр (считается при первой записи)
+        self._disk_usage: Optional[int] = None
+        # Миниатюры могут записываться из пула потоков
+        self._disk_lock = threading.Lock()
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), MEMORY_CACHE_LIMIT_KB))
+
+    def _file_key(self, path: str) -> Optional[Tuple[str, int, int]]:
+        # Ключ файла по метаданным (None, если файла нет)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def content_hash(self, path: str) -> Optional[str]:
+        # Хэш содержимого файла, читается потоково и запоминается
+        file_key = self._file_key(path)
+        if file_key is None:
+            return None
+        content_hash = self._hashes.get(file_key)
+        if content_hash is None:
+            digest = hashlib.sha256()
+            try:
+                with open(path, 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(block)
+            except OSError:
+                return None
+            content_hash = digest.hexdigest()
+            self._hashes[file_key] = content_hash
+        return content_hash
+
+    def thumbnail_path(self, content_hash: str, bucket: int) -> str:
+        # Путь миниатюры: подпапка по первым символам хэша
+        return os.path.join(self.thumbnail_dir, content_hash[:2], f"{content_hash}_{bucket}.png")
+
+    def load_image(self, path: str, bucket: int) -> QImage:
+        '''
+        Загрузка миниатюры как QImage (можно вызывать не из потока GUI).
+        При отсутствии миниатюры на диске исходник декодируется, уменьшается и сохраняется.
+        '''
+        content_hash = self.content_hash(path)
+        if content_hash is None:
+            return QImage()
+
+        thumb_path = self.thumbnail_path(content_hash, bucket)
+        if os.path.exists(thumb_path):
+            image = QImage(thumb_path)
+            if not image.isNull():
+                # Время изменения служит меткой последнего обращения для вытеснения
+                try:
+                    os.utime(thumb_path)
+                except OSError:
+                    pass
+                return image
+
+        # Декодирование сразу в уменьшенном размере, если формат это поддерживает
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        source_size = reader.size()
+        if source_size.isValid() and max(source_size.width(), source_size.height()) > bucket:
+            reader.setScaledSize(source_size.scaled(bucket, bucket, Qt.AspectRatioMode.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            return image
+
+        # Маленькие изображения не увеличиваются
+        if max(image.width(), image.height()) > bucket:
+            image = image.scaled(
+                bucket, bucket,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation
+            )
+
+        try:
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            # Запись через временный файл, чтобы не оставить повреждённую миниатюру
+            temp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+            if image.save(temp_path, "PNG"):
+                os.replace(temp_path, thumb_path)
+                self._register_thumbnail(os.path.getsize(thumb_path))
+        except OSError as e:
+            logger.warning("Не удалось сохранить миниатюру постера: %s", e)
+
+        return image
+
+    def _memory_key(self, path: str, bucket: int) -> Optional[str]:
+        # Ключ QPixmapCache: файл меняется - меняется и ключ
+        file_key = self._file_key(path)
+        if file_key is None:
+            return None
+        return "poster:{}:{}:{}:{}".format(*file_key, bucket)
+
+    def find_pixmap(self, path: str, width: int, height: int) -> Optional[QPixmap]:
+        # Поиск постера только в кэше памяти (None, если его там нет)
+        memory_key = self._memory_key(path, thumbnail_bucket(width, height))
+        if memory_key is None:
+            return None
+        pixmap = QPixmapCache.find(memory_key)
+        if pixmap is None or pixmap.isNull():
+            return None
+        return self._fit(pixmap, width, height)
+
+    def store_image(self, path: str, image: QImage, width: int, height: int) -> QPixmap:
+        # Помещение загруженной миниатюры в кэш памяти (только в потоке GUI)
+        pixmap = QPixmap.fromImage(image)
+        memory_key = self._memory_key(path, thumbnail_bucket(width, height))
+        if memory_key is not None:
+            QPixmapCache.insert(memory_key, pixmap)
+        return self._fit(pixmap, width, height)
+
+    def get_pixmap(self, path: str, width: int, height: int) -> QPixmap:
+        # Постер, уменьшенный под область width x height (синхронно, только в потоке GUI)
+        pixmap = self.find_pixmap(path, width, height)
+        if pixmap is not None:
+            return pixmap
+        image = self.load_image(path, thumbnail_bucket(width, height))
+        if image.isNull():
+            return QPixmap()
+        return self.store_image(path, image, width, height)
+
+    def _fit(self, pixmap: QPixmap, width: int, height: int) -> QPixmap:
+        # Масштабирование миниатюры под область с сохранением пропорций
+        return pixmap.scaled(
+            width, height,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation
+        )
+
+    def _register_thumbnail(self, size: int):
+        # Учёт новой миниатюры и вытеснение при превышении предела
+        if self._disk_usage is None:
+            self.evict()
+            return
+        with self._disk_lock:
+            self._disk_usage += size
+            over_limit = self._disk_usage > self.disk_limit
+        if over_limit:
+            self.evict()
+
+    def evict(self):
+        # Удаление давно не использованных миниатюр при превышении предела размера
+        with self._disk_lock:
+            self._evict_locked()
+
+    def _evict_locked(self):
+        # Подсчёт объёма и удаление самых старых файлов (под блокировкой)
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.thumbnail_dir):
+            for name in files:
+                file_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+                total_size += stat.st_size
+
+        if total_size > self.disk_limit:
+            for _, size, file_path in sorted(entries):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    continue
+                total_size -= size
+                if total_size <= self.disk_limit:
+                    break
+
+        self._disk_usage = total_size
+
+
+# Общий экземпляр кэша создаётся при первом обращении
+_poster_cache: Optional[PosterThumbnailCache] = None
+
+
+def get_poster_cache() -> PosterThumbnailCache:
+    # Получение общего кэша миниатюр
+    global _poster_cache
+    if _poster_cache is None:
+        _poster_cache = PosterThumbnailCache()
+    return _poster_cache
@@ -0,0 +1,106 @@
+'''
+Модуль асинхронной загрузки постеров.
+Декодирование и уменьшение выполняются в пуле потоков, результат
+передаётся в поток GUI сигналом. Пока постер грузится, показывается заглушка.
+'''
+
+from itertools import count
+from typing import Optional
+from PyQt6.QtCore import QCoreApplication, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+from poster_cache import get_poster_cache, thumbnail_bucket
+
+
+# Сквозная нумерация запросов всех загрузчиков
+_request_ids = count(1)
+
+
+class _PosterSignals(QObject):
+    # Общий источник сигналов, живёт в потоке GUI всё время работы приложения
+    image_loaded = pyqtSignal(int, str, QImage)
+
+
+_signals: Optional[_PosterSignals] = None
+
+
+def _get_signals() -> _PosterSignals:
+    # Создание общего источника сигналов (вызывается из потока GUI)
+    # Владелец источника - приложение: глобальная ссылка не должна пережить его удаление
+    global _signals
+    if _signals is None:
+        _signals = _PosterSignals(QCoreApplication.instance())
+    return _signals
+
+
+class _PosterTask(QRunnable):
+    # Задача пула потоков: загрузка миниатюры через кэш
+
+    def __init__(self, request_id: int, path: str, bucket: int, signals: _PosterSignals):
+        super().__init__()
+        self.request_id = request_id
+        self.path = path
+        self.bucket = bucket
+        self.signals = signals
+
+    def run(self):
+        image = get_poster_cache().load_image(self.path, self.bucket)
+        try:
+            self.signals.image_loaded.emit(self.request_id, self.path, image)
+        except RuntimeError:
+            # Приложение завершилось, пока постер декодировался: результат некому передать
+            pass
+
+
+class PosterLoader(QObject):
+    # Загрузчик постера для одного виджета: актуален только последний запрос
+
+    ready = pyqtSignal(QPixmap)
+    failed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._request_id = 0
+        self._width = 0
+        self._height = 0
+        _get_signals().image_loaded.connect(self._on_image_loaded)
+
+    def request(self, path: str, width: int, height: int) -> Optional[QPixmap]:
+        '''
+        Запрос постера под область width x height.
+        Если постер уже есть в памяти, он возвращается сразу,
+        иначе возвращается None, а результат придёт сигналом ready или failed.
+        '''
+        self._width = width
+        self._height = height
+
+        pixmap = get_poster_cache().find_pixmap(path, width, height)
+        if pixmap is not None:
+            self._request_id = 0
+            return pixmap
+
+        self._request_id = next(_request_ids)
+        task = _PosterTask(self._request_id, path, thumbnail_bucket(width, height), _get_signals())
+        QThreadPool.globalInstance().start(task)
+        return None
+
+    def cancel(self):
+        # Результат незавершённого запроса будет проигнорирован
+        self._request_id = 0
+
+    def _on_image_loaded(self, request_id: int, path: str, image: QImage):
+        # Применяется только результат последнего запроса
+        if request_id == 0 or request_id != self._request_id:
+            return
+        self._request_id = 0
+
+        if image.isNull():
+            self.failed.emit()
+            return
+        self.ready.emit(get_poster_cache().store_image(path, image, self._width, self._height))
+
+
+def shutdown():
+    # Отмена ещё не начатых загрузок и ожидание выполняющихся (при закрытии окна)
+    pool = QThreadPool.globalInstance()
+    pool.clear()
+    pool.waitForDone()
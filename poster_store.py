@@ -0,0 +1,325 @@
+'''
+Модуль хранилища постеров с адресацией по содержимому.
+Файл хэшируется при копировании и сохраняется под путём из его хэша,
+поэтому повторное добавление того же изображения не создаёт копий.
+Ссылки фильмов на файлы считаются в базе (таблица poster_refs),
+а команда сборки мусора удаляет файлы, на которые никто не ссылается.
+
+При добавлении постер уменьшается и пережимается (ingest_poster),
+оригинал сохраняется только по запросу.
+
+Запуск:
+    python poster_store.py gc [--dry-run] [--db movies.db]
+    python poster_store.py migrate [--workers N] [--keep-originals] [--db movies.db]
+'''
+
+import argparse
+import hashlib
+import io
+import logging
+import os
+import shutil
+import string
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+from PIL import Image, ImageOps
+from database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+# Папка хранилища постеров
+POSTER_STORE_DIR = "posters"
+
+# Приведение расширений к одному виду
+EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+
+# Префикс временных файлов, которые ещё копируются
+INCOMING_PREFIX = ".incoming-"
+
+# Подпапка для оригиналов, сохранённых по запросу
+ORIGINALS_DIR = "originals"
+
+# Предел большей стороны постера после обработки (пикселей)
+MAX_POSTER_SIZE = 600
+
+# Качество JPEG после пережатия
+JPEG_QUALITY = 85
+
+
+def store_path(content_hash: str, extension: str, store_dir: str = POSTER_STORE_DIR) -> str:
+    # Путь файла в хранилище: две подпапки по первым символам хэша
+    return "/".join([store_dir, content_hash[:2], content_hash[2:4], content_hash + extension])
+
+
+def is_stored(path: str, store_dir: str = POSTER_STORE_DIR) -> bool:
+    # Файл уже лежит в хранилище под путём из хэша (store_path)
+    relative = os.path.relpath(os.path.normpath(path), os.path.normpath(store_dir))
+    parts = relative.split(os.sep)
+    if len(parts) != 3:
+        return False
+    content_hash = os.path.splitext(parts[2])[0]
+    return (len(content_hash) == 64 and all(char in string.hexdigits for char in content_hash)
+            and parts[0] == content_hash[:2] and parts[1] == content_hash[2:4])
+
+
+def _commit_temp(temp_path: str, dest_path: str) -> str:
+    # Перенос временного файла на место (дубликат просто удаляется)
+    if os.path.exists(dest_path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        os.replace(temp_path, dest_path)
+    return dest_path
+
+
+def _normalized_extension(path: str) -> str:
+    # Расширение файла в нижнем регистре с приведением синонимов
+    extension = os.path.splitext(path)[1].lower()
+    return EXTENSION_ALIASES.get(extension, extension)
+
+
+def store_poster(source_path: str, store_dir: str = POSTER_STORE_DIR) -> str:
+    '''
+    Копирование постера в хранилище с одновременным хэшированием.
+    Возвращает путь файла в хранилище. Если такое содержимое уже есть,
+    копия не создаётся и возвращается путь существующего файла.
+    '''
+    extension = _normalized_extension(source_path)
+
+    os.makedirs(store_dir, exist_ok=True)
+    temp_path = os.path.join(store_dir, INCOMING_PREFIX + uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    try:
+        with open(source_path, 'rb') as source, open(temp_path, 'wb') as target:
+            for block in iter(lambda: source.read(1024 * 1024), b''):
+                digest.update(block)
+                target.write(block)
+        return _commit_temp(temp_path, store_path(digest.hexdigest(), extension, store_dir))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def store_bytes(data: bytes, extension: str, store_dir: str = POSTER_STORE_DIR) -> str:
+    # Сохранение готового содержимого в хранилище
+    os.makedirs(store_dir, exist_ok=True)
+    temp_path = os.path.join(store_dir, INCOMING_PREFIX + uuid.uuid4().hex)
+    try:
+        with open(temp_path, 'wb') as target:
+            target.write(data)
+        return _commit_temp(temp_path, store_path(hashlib.sha256(data).hexdigest(), extension, store_dir))
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def original_path(stored_path: str, source_path: str, store_dir: str = POSTER_STORE_DIR) -> str:
+    # Путь оригинала: по имени обработанного файла, чтобы сборка мусора видела связь
+    content_hash = os.path.splitext(os.path.basename(stored_path))[0]
+    return "/".join([
+        store_dir, ORIGINALS_DIR, content_hash[:2], content_hash[2:4],
+        content_hash + _normalized_extension(source_path)
+    ])
+
+
+def normalize_image(source_path: str, max_size: int = MAX_POSTER_SIZE) -> Tuple[bytes, str, bool]:
+    '''
+    Уменьшение постера до max_size по большей стороне и пережатие.
+    Непрозрачные изображения сохраняются в JPEG, с прозрачностью - в PNG.
+    Возвращает содержимое, расширение и признак того, что изображение уменьшалось.
+    '''
+    with Image.open(source_path) as source:
+        image = ImageOps.exif_transpose(source)
+        downscaled = max(image.size) > max_size
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+        # Прозрачность учитывается, только если она действительно используется
+        if image.mode in ('P', 'LA', 'PA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+        has_alpha = image.mode == 'RGBA' and image.getchannel('A').getextrema()[0] < 255
+
+        buffer = io.BytesIO()
+        if has_alpha:
+            image.save(buffer, 'PNG', optimize=True)
+            extension = '.png'
+        else:
+            image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY,
+                                      optimize=True, progressive=True)
+            extension = '.jpg'
+    return buffer.getvalue(), extension, downscaled
+
+
+def ingest_poster(source_path: str, keep_original: bool = False,
+                  store_dir: str = POSTER_STORE_DIR, max_size: int = MAX_POSTER_SIZE) -> str:
+    '''
+    Добавление постера в хранилище с уменьшением и пережатием.
+    Исходник сохраняется без пережатия, если формат не распознан, если обработка
+    не уменьшает файл или если постер уже не больше max_size и записан в том же
+    формате, что дала бы обработка (повторное пережатие JPEG только теряет качество).
+    При keep_original исходник дополнительно сохраняется в подпапке originals.
+    Возвращает путь сохранённого постера.
+    '''
+    try:
+        data, extension, downscaled = normalize_image(source_path, max_size)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Постер сохранён без обработки (%s): %s", source_path, e)
+        return store_poster(source_path, store_dir)
+
+    if not downscaled and (extension == _normalized_extension(source_path)
+                           or len(data) >= os.path.getsize(source_path)):
+        return store_poster(source_path, store_dir)
+
+    stored_path = store_bytes(data, extension, store_dir)
+
+    if keep_original:
+        dest_path = original_path(stored_path, source_path, store_dir)
+        if not os.path.exists(dest_path):
+            temp_path = os.path.join(store_dir, INCOMING_PREFIX + uuid.uuid4().hex)
+            try:
+                shutil.copyfile(source_path, temp_path)
+                _commit_temp(temp_path, dest_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+    return stored_path
+
+
+def _fits(path: str, max_size: int = MAX_POSTER_SIZE) -> bool:
+    # Размер изображения не больше max_size (читается только заголовок файла)
+    try:
+        with Image.open(path) as image:
+            return max(image.size) <= max_size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+
+
+def collect_garbage(db: Database, store_dir: str = POSTER_STORE_DIR, dry_run: bool = False) -> List[str]:
+    '''
+    Удаление файлов хранилища, на которые не ссылается ни один фильм.
+    Возвращает список удалённых (при dry_run - подлежащих удалению) файлов.
+    '''
+    referenced = {os.path.normpath(path) for path in db.get_poster_references()}
+    # Оригинал нужен, пока используется обработанный постер с тем же хэшем
+    referenced_hashes = {
+        os.path.splitext(os.path.basename(path))[0] for path in referenced
+    }
+    originals_dir = os.path.normpath(os.path.join(store_dir, ORIGINALS_DIR))
+    removed = []
+
+    for root, dirs, files in os.walk(store_dir, topdown=False):
+        for name in files:
+            # Файлы, которые сейчас копируются, не трогаем
+            if name.startswith(INCOMING_PREFIX):
+                continue
+            file_path = os.path.join(root, name)
+            if os.path.normpath(file_path) in referenced:
+                continue
+            if (os.path.normpath(root).startswith(originals_dir + os.sep)
+                    and os.path.splitext(name)[0] in referenced_hashes):
+                continue
+            removed.append(file_path)
+            if not dry_run:
+                try:
+                    os.remove(file_path)
+                except OSError as e:
+                    logger.warning("Не удалось удалить %s: %s", file_path, e)
+
+        # Пустые подпапки хранилища тоже удаляются
+        if not dry_run and os.path.normpath(root) != os.path.normpath(store_dir):
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+    if not dry_run:
+        db.prune_poster_references()
+    return removed
+
+
+def _migrate_one(source_path: str, keep_original: bool, store_dir: str) -> Tuple[str, Optional[str], str]:
+    # Обработка одного постера в процессе пула: (старый путь, новый путь или None, ошибка)
+    try:
+        # Файл хранилища подходящего размера уже обработан при добавлении:
+        # повторное пережатие дало бы новый хэш и снова потеряло бы качество
+        if is_stored(source_path, store_dir) and _fits(source_path):
+            return source_path, source_path, ""
+        return source_path, ingest_poster(source_path, keep_original, store_dir), ""
+    except OSError as e:
+        return source_path, None, str(e)
+
+
+def migrate_posters(db: Database, store_dir: str = POSTER_STORE_DIR, keep_original: bool = False,
+                    workers: Optional[int] = None) -> Tuple[int, List[Tuple[str, str]]]:
+    '''
+    Перевод существующих постеров на уменьшенные и пережатые версии.
+    Изображения обрабатываются параллельно в пуле процессов, база обновляется
+    в текущем процессе. Старые файлы остаются до сборки мусора.
+    Файлы хранилища, которые уже не больше MAX_POSTER_SIZE, не перечитываются.
+    Возвращает число изменённых путей и список ошибок (путь, сообщение).
+    '''
+    sources = [path for path in db.get_poster_references() if os.path.isfile(path)]
+    changed = 0
+    errors = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            _migrate_one, sources,
+            [keep_original] * len(sources), [store_dir] * len(sources),
+            chunksize=8
+        )
+        for source_path, new_path, error in results:
+            if new_path is None:
+                errors.append((source_path, error))
+            elif new_path != source_path:
+                db.replace_poster_path(source_path, new_path)
+                changed += 1
+
+    return changed, errors
+
+
+def main():
+    # Командная строка хранилища постеров
+    parser = argparse.ArgumentParser(description="Хранилище постеров")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="удалить постеры, на которые не ссылается ни один фильм")
+    gc_parser.add_argument("--dry-run", action="store_true", help="только показать файлы")
+    gc_parser.add_argument("--db", default="movies.db", help="файл базы данных")
+    migrate_parser = subparsers.add_parser("migrate", help="уменьшить и пережать существующие постеры")
+    migrate_parser.add_argument("--workers", type=int, default=None, help="число процессов")
+    migrate_parser.add_argument("--keep-originals", action="store_true", help="сохранить оригиналы")
+    migrate_parser.add_argument("--db", default="movies.db", help="файл базы данных")
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        db = Database(args.db)
+        try:
+            removed = collect_garbage(db, dry_run=args.dry_run)
+        finally:
+            db.close()
+        action = "Будут удалены" if args.dry_run else "Удалены"
+        print(f"{action} файлы постеров: {len(removed)}")
+        for file_path in removed:
+            print(f"  {file_path}")
+
+    elif args.command == "migrate":
+        db = Database(args.db)
+        try:
+            changed, errors = migrate_posters(db, keep_original=args.keep_originals, workers=args.workers)
+        finally:
+            db.close()
+        print(f"Обработано постеров: {changed}")
+        for file_path, error in errors:
+            print(f"  Ошибка {file_path}: {error}")
+        if changed:
+            print("Старые файлы удалит команда gc")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+'''
+Модуль кэша результатов выборок.
+Хранит последние результаты запросов к базе под ключом "вид выборки + приведённый
+фильтр + страница" и вытесняет давно не использованные (LRU), когда превышен
+предел числа записей или суммарного числа строк.
+
+Кэш не знает, когда данные устарели: Database сбрасывает его после своих
+изменений и при смене PRAGMA data_version. Номер поколения, взятый до запроса,
+не даёт положить в кэш результат, прочитанный до сброса.
+'''
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+
+
+# Предел числа закэшированных выборок
+MAX_ENTRIES = 256
+
+# Предел суммарного числа строк во всех выборках (выборка больше предела не кэшируется)
+MAX_ROWS = 50000
+
+
+class ResultCache:
+    # Кэш результатов с вытеснением LRU и счётчиками попаданий и промахов
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_rows: int = MAX_ROWS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        # Ключ -> (результат, число строк), от давно использованных к недавним
+        self._entries: 'OrderedDict[Hashable, Tuple[object, int]]' = OrderedDict()
+        self._rows = 0
+        # Номер поколения растёт при каждом сбросе
+        self._generation = 0
+        # К кэшу обращаются GUI и фоновые потоки
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        # Кэш выключается нулевым пределом записей или строк
+        return self.max_entries > 0 and self.max_rows > 0
+
+    @property
+    def generation(self) -> int:
+        # Текущее поколение: передаётся в put, чтобы отбросить устаревший результат
+        return self._generation
+
+    def get(self, key: Hashable) -> Optional[object]:
+        # Результат по ключу (None - нет в кэше), найденный становится самым свежим
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, result: object, rows: int, generation: int):
+        # Сохранение результата, прочитанного в поколении generation
+        if not self.enabled or rows > self.max_rows:
+            return
+        with self._lock:
+            if generation != self._generation:
+                # Между запросом и сохранением данные изменились
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._rows -= old[1]
+            self._entries[key] = (result, rows)
+            self._rows += rows
+            self._evict()
+
+    def _evict(self):
+        # Вытеснение давно не использованных записей до пределов (под блокировкой)
+        while self._entries and (len(self._entries) > self.max_entries or self._rows > self.max_rows):
+            _, (_, evicted_rows) = self._entries.popitem(last=False)
+            self._rows -= evicted_rows
+            self.evictions += 1
+
+    def invalidate(self):
+        # Сброс всех результатов (после изменения данных)
+        with self._lock:
+            self._generation += 1
+            if self._entries:
+                self._entries.clear()
+                self._rows = 0
+                self.invalidations += 1
+
+    def configure(self, max_entries: Optional[int] = None, max_rows: Optional[int] = None):
+        # Смена пределов, лишние записи вытесняются сразу
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_rows is not None:
+                self.max_rows = max_rows
+            self._evict()
+
+    def reset_counters(self):
+        # Обнуление счётчиков (содержимое кэша сохраняется)
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict:
+        # Состояние кэша для окна диагностики и замеров
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'rows': self._rows,
+                'max_entries': self.max_entries,
+                'max_rows': self.max_rows,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
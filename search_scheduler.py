@@ -0,0 +1,132 @@
+'''
+Модуль фонового поиска фильмов.
+Объединяет быстрые нажатия клавиш и выполняет запросы в отдельном потоке
+с собственным подключением к SQLite.
+'''
+
+from typing import Optional
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from database import Database, MovieFilter
+from incremental_search import IncrementalSearch
+from result_cache import ResultCache
+
+
+# Задержка перед запуском поиска после последнего нажатия клавиши (мс)
+SEARCH_DELAY_MS = 250
+
+
+class SearchWorker(QObject):
+    # Исполнитель поисковых запросов, живёт в отдельном потоке
+
+    finished = pyqtSignal(int, list, object, int, object)
+
+    def __init__(self, db_name: str, scheduler: 'SearchScheduler',
+                 result_cache: Optional[ResultCache] = None):
+        super().__init__()
+        self.db_name = db_name
+        self.scheduler = scheduler
+        # Кэш выборок главного окна: повторный поиск не доходит до базы
+        self.result_cache = result_cache
+        self.db = None
+        self.search = None
+        self.busy = False
+
+    @pyqtSlot(int, object)
+    def run_search(self, request_id: int, movie_filter: MovieFilter):
+        # Выполнение запроса, если он ещё актуален
+        if request_id != self.scheduler.latest_request_id:
+            return
+
+        # Подключение создаётся в потоке исполнителя
+        if self.db is None:
+            self.db = Database(self.db_name, result_cache=self.result_cache)
+            self.search = IncrementalSearch(self.db)
+
+        # Первая страница и общее количество, остальное подгружается при прокрутке;
+        # уточнение набранного текста ищется среди строк предыдущего результата
+        self.busy = True
+        try:
+            movies, next_cursor, total = self.search.search(movie_filter)
+        finally:
+            self.busy = False
+
+        self.finished.emit(request_id, movies, next_cursor, total, movie_filter)
+
+    def interrupt(self):
+        # Прерывание выполняющегося запроса (вызывается из потока GUI)
+        if self.busy and self.search is not None:
+            self.search.interrupt()
+
+    @pyqtSlot()
+    def close(self):
+        # Закрытие подключения исполнителя
+        if self.db is not None:
+            self.search.close()
+            self.search = None
+            # Слот выполняется в потоке исполнителя: его подключение закрывается первым
+            self.db.release_thread()
+            self.db.close()
+            self.db = None
+
+
+class SearchScheduler(QObject):
+    # Планировщик поиска: задержка ввода, отмена устаревших запросов
+
+    results_ready = pyqtSignal(list, object, int, object)
+    search_requested = pyqtSignal(int, object)
+
+    def __init__(self, db_name: str, delay_ms: int = SEARCH_DELAY_MS, parent=None,
+                 result_cache: Optional[ResultCache] = None):
+        super().__init__(parent)
+        self.latest_request_id = 0
+        self._pending = MovieFilter()
+
+        # Таймер объединяет нажатия клавиш в один запрос
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self._dispatch)
+
+        # Поток с исполнителем запросов
+        self.search_thread = QThread(self)
+        self.worker = SearchWorker(db_name, self, result_cache)
+        self.worker.moveToThread(self.search_thread)
+        self.search_requested.connect(self.worker.run_search)
+        self.worker.finished.connect(self._on_finished)
+        self.search_thread.finished.connect(self.worker.close)
+        self.search_thread.start()
+
+    def schedule(self, movie_filter: MovieFilter):
+        # Отложенный поиск: каждый новый вызов перезапускает таймер
+        self._pending = movie_filter.normalized()
+        self.timer.start()
+
+    def search_now(self, movie_filter: MovieFilter):
+        # Немедленный поиск без задержки
+        self._pending = movie_filter.normalized()
+        self.timer.stop()
+        self._dispatch()
+
+    def cancel(self):
+        # Отмена ожидающих и выполняющихся запросов
+        self.timer.stop()
+        self.latest_request_id += 1
+        self.worker.interrupt()
+
+    def _dispatch(self):
+        # Отправка актуального запроса исполнителю
+        self.latest_request_id += 1
+        self.worker.interrupt()
+        self.search_requested.emit(self.latest_request_id, self._pending)
+
+    def _on_finished(self, request_id: int, movies: list, next_cursor, total: int,
+                     movie_filter: MovieFilter):
+        # Применяются только результаты последнего запроса
+        if request_id == self.latest_request_id:
+            self.results_ready.emit(movies, next_cursor, total, movie_filter)
+
+    def shutdown(self):
+        # Остановка потока поиска
+        self.cancel()
+        self.search_thread.quit()
+        self.search_thread.wait()
@@ -0,0 +1,123 @@
+'''
+Проверки инкрементального поиска.
+На случайных последовательностях ввода (дописывание, стирание, смена жанра и порядка,
+изменение данных посреди ввода) результат IncrementalSearch должен совпадать
+с полными запросами filter_movies_page и count_filtered для того же фильтра.
+
+Запуск:
+    python -m pytest test_incremental_search.py
+'''
+
+import random
+import pytest
+from database import Database, MovieFilter, DEFAULT_SORT_ORDER
+from incremental_search import IncrementalSearch
+from benchmark import catalogue_records, GENRES
+
+
+# Размер тестового каталога и зерно генератора
+CATALOGUE_SIZE = 3000
+SEED = 11
+
+# Число последовательностей ввода и размер первой страницы
+SEQUENCES = 40
+LIMIT = 20
+
+# Порядки сортировки, между которыми переключается пользователь
+SORT_ORDERS = [DEFAULT_SORT_ORDER, (('year', False),), (('genre', True), ('rating', False))]
+
+
+@pytest.fixture()
+def db(tmp_path):
+    # Свой каталог для каждого теста: последовательности ввода меняют данные
+    database = Database(str(tmp_path / "movies.db"), cache_entries=0)
+    database.bulk_add_movies(catalogue_records(CATALOGUE_SIZE, SEED))
+    database.cursor.execute("UPDATE movies SET genre_id = NULL, year = NULL WHERE id % 13 = 0")
+    database.connection.commit()
+    yield database
+    database.close()
+
+
+def expected_result(db: Database, movie_filter: MovieFilter):
+    # Результат полных запросов, которые выполнялись бы без уточнения
+    movies, next_cursor = db.filter_movies_page(movie_filter, limit=LIMIT)
+    return [movie.id for movie in movies], next_cursor, db.count_filtered(movie_filter)
+
+
+def change_data(rng: random.Random, db: Database, text: str):
+    # Изменение данных посреди ввода: новый подходящий фильм, правка или удаление
+    action = rng.random()
+    if action < 0.4:
+        db.add_movie(f"Новый {text}", 2001, rng.choice(GENRES), "", 7.0, 90, "", "")
+        return
+    movie_id = rng.randint(1, CATALOGUE_SIZE)
+    movie = db.get_movie_by_id(movie_id)
+    if movie is None:
+        return
+    if action < 0.7:
+        db.update_movie(movie_id, f"{text} {movie.title}", movie.year, rng.choice(GENRES),
+                        movie.director, movie.rating, movie.duration, movie.description, movie.poster_path)
+    else:
+        db.delete_movie(movie_id)
+
+
+def typing_sequence(rng: random.Random, titles):
+    # Шаги ввода: названия (фрагмент существующего, случайный регистр), жанр, порядок
+    # и признак изменения данных перед шагом
+    title = rng.choice(titles)
+    start = rng.randrange(len(title))
+    target = "".join(c.upper() if rng.random() < 0.3 else c for c in title[start:start + 12])
+    genre = "Все жанры"
+    sort_order = DEFAULT_SORT_ORDER
+    text = ""
+    position = 0
+    while position < len(target):
+        roll = rng.random()
+        if roll < 0.1 and text:
+            text = text[:-1]
+            position -= 1
+        else:
+            text += target[position]
+            position += 1
+        if roll > 0.95:
+            genre = rng.choice(["Все жанры", *GENRES])
+        elif roll > 0.92:
+            sort_order = rng.choice(SORT_ORDERS)
+        yield text, genre, sort_order, 0.1 < roll < 0.14
+
+
+@pytest.mark.parametrize("max_candidates", [5000, 50])
+def test_incremental_search_matches_full_queries(db, max_candidates):
+    rng = random.Random(SEED + max_candidates)
+    titles = [title for title, in db.cursor.execute("SELECT title FROM movies")]
+    search = IncrementalSearch(db, max_candidates=max_candidates)
+    try:
+        for _ in range(SEQUENCES):
+            for text, genre, sort_order, changed in typing_sequence(rng, titles):
+                if changed:
+                    change_data(rng, db, text)
+                movie_filter = MovieFilter(search_text=text, genre=genre, sort_order=sort_order)
+                result = search.search(movie_filter, LIMIT)
+                actual = [movie.id for movie in result.movies], result.next_cursor, result.total
+                assert actual == expected_result(db, movie_filter), movie_filter
+        # Уточнение действительно использовалось, а не только полные запросы
+        assert search.refined > 0
+        assert search.queried > 0
+    finally:
+        search.close()
+
+
+def test_refined_rows_keep_sort_order(db):
+    # Уточнение по сохранённым строкам не нарушает порядок с NULL в столбцах сортировки
+    search = IncrementalSearch(db)
+    try:
+        for sort_order in SORT_ORDERS:
+            search.reset()
+            for text in ("о", "ор", "оро", "ород"):
+                movie_filter = MovieFilter(search_text=text, sort_order=sort_order)
+                result = search.search(movie_filter, LIMIT)
+                expected = [movie.id for movie in db.filter_movies(movie_filter)][:LIMIT]
+                assert [movie.id for movie in result.movies] == expected
+        assert search.refined > 0
+    finally:
+        search.close()
@@ -0,0 +1,143 @@
+'''
+Проверки постраничной выборки по ключу (keyset pagination).
+Страницы filter_movies_page, прочитанные подряд по курсорам, должны совпадать
+с полным результатом filter_movies для тех же условий и порядка, в том числе
+когда у столбцов сортировки есть значения NULL и названия различаются только регистром.
+
+Запуск:
+    python -m pytest test_pagination.py
+'''
+
+import random
+import pytest
+from database import Database, MovieFilter, SORT_KEYS, compare_sort_values, sort_page_keys
+from benchmark import catalogue_records
+
+
+# Размер тестового каталога и зерно генератора
+CATALOGUE_SIZE = 1500
+SEED = 7
+
+# Число случайных сочетаний фильтра и порядка
+RANDOM_CASES = 60
+
+# Тексты поиска: пустой, короткий (без триграммного индекса) и обычные
+SEARCH_TEXTS = ["", "ма", "город", "the", "ночи"]
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    # Каталог с пропусками в каждом столбце сортировки; кэш выборок выключен,
+    # чтобы каждая страница действительно читалась из SQLite
+    database = Database(str(tmp_path_factory.mktemp("pagination") / "movies.db"), cache_entries=0)
+    database.bulk_add_movies(catalogue_records(CATALOGUE_SIZE, SEED))
+    database.cursor.executescript("""
+        UPDATE movies SET year = NULL WHERE id % 11 = 0;
+        UPDATE movies SET genre_id = NULL WHERE id % 13 = 0;
+        UPDATE movies SET rating = NULL WHERE id % 7 = 0;
+        UPDATE movies SET director = NULL WHERE id % 17 = 0;
+        UPDATE movies SET duration = NULL WHERE id % 19 = 0;
+        INSERT INTO movies (title, year, rating) VALUES ('matrix', 1999, 8.7), ('Matrix', 1999, 8.7),
+                                                        ('MATRIX', NULL, NULL), ('Матрица', 1999, 8.7);
+    """)
+    database.connection.commit()
+    yield database
+    database.close()
+
+
+def read_all_pages(db: Database, movie_filter: MovieFilter, limit: int):
+    # ID всех строк, прочитанных страницами по курсорам
+    ids = []
+    after = None
+    while True:
+        rows, after = db.filter_movies_page(movie_filter, after, limit)
+        ids.extend(movie.id for movie in rows)
+        if after is None:
+            return ids
+
+
+def random_filter(rng: random.Random, genres) -> MovieFilter:
+    # Случайное сочетание условий и порядка из одного-трёх столбцов
+    columns = rng.sample(list(SORT_KEYS), rng.randint(1, 3))
+    year_from = rng.choice([None, 1950, 1990])
+    rating_from = rng.choice([None, 5.0, 8.0])
+    return MovieFilter(
+        search_text=rng.choice(SEARCH_TEXTS),
+        genre=rng.choice(["Все жанры", "Все жанры", *genres]),
+        year_from=year_from,
+        year_to=rng.choice([None, 2010]) if year_from is not None else None,
+        rating_from=rating_from,
+        rating_to=rng.choice([None, 9.0]) if rating_from is not None else None,
+        sort_order=tuple((column, rng.random() < 0.5) for column in columns),
+    )
+
+
+@pytest.mark.parametrize("column", list(SORT_KEYS))
+@pytest.mark.parametrize("ascending", [True, False])
+def test_single_column_pages_match_full_result(db, column, ascending):
+    movie_filter = MovieFilter(sort_order=((column, ascending),))
+    expected = [movie.id for movie in db.filter_movies(movie_filter)]
+    for limit in (1, 9, 200):
+        assert read_all_pages(db, movie_filter, limit) == expected
+
+
+def test_random_filters_pages_match_full_result(db):
+    rng = random.Random(SEED)
+    genres = [name for _, name in db.get_all_genres()]
+    for _ in range(RANDOM_CASES):
+        movie_filter = random_filter(rng, genres)
+        expected = [movie.id for movie in db.filter_movies(movie_filter)]
+        limit = rng.choice([1, 3, 50])
+        assert read_all_pages(db, movie_filter, limit) == expected, movie_filter
+
+
+def test_compare_sort_values_follows_sqlite_order(db):
+    # Соседние строки результата SQLite упорядочены и по compare_sort_values
+    rng = random.Random(SEED)
+    for _ in range(RANDOM_CASES):
+        columns = rng.sample(list(SORT_KEYS), rng.randint(1, 3))
+        sort_order = tuple((column, rng.random() < 0.5) for column in columns)
+        keys = sort_page_keys(sort_order)
+        movies = db.filter_movies(MovieFilter(sort_order=sort_order))
+        values = [tuple(movie[position] for _, position, _ in keys) for movie in movies]
+        for left, right in zip(values, values[1:]):
+            assert compare_sort_values(keys, left, right) == -1, (sort_order, left, right)
+
+
+def test_compare_sort_values_nulls_and_case():
+    title_key = (*SORT_KEYS['title'], False)
+    year_key = (*SORT_KEYS['year'], False)
+    year_desc_key = (*SORT_KEYS['year'], True)
+    # NULL меньше любого значения, при DESC - больше
+    assert compare_sort_values([year_key], (None,), (1999,)) == -1
+    assert compare_sort_values([year_desc_key], (None,), (1999,)) == 1
+    assert compare_sort_values([year_key], (None,), (None,)) == 0
+    # NOCASE не различает регистр латиницы, но различает кириллицу
+    assert compare_sort_values([title_key], ("Matrix",), ("mATRIX",)) == 0
+    assert compare_sort_values([title_key], ("Матрица",), ("матрица",)) == -1
+    # При равенстве решает следующий ключ
+    assert compare_sort_values([title_key, year_key], ("matrix", 2000), ("Matrix", 1999)) == 1
+
+
+def test_page_segments_for_null_cursor(db):
+    # Курсор внутри участка NULL: при ASC дочитывается участок, затем все значения,
+    # при DESC после NULL строк нет
+    ascending_keys = sort_page_keys((('year', True),))
+    segments = db._page_segments(ascending_keys, (None, 10))
+    assert [conditions[0] for conditions, _, _ in segments] == ["m.year IS NULL", "m.year IS NOT NULL"]
+
+    descending_keys = sort_page_keys((('year', False),))
+    segments = db._page_segments(descending_keys, (None, 10))
+    assert [conditions[0] for conditions, _, _ in segments] == ["m.year IS NULL"]
+
+    # Курсор на значении при DESC: диапазон от него, затем участок NULL
+    segments = db._page_segments(descending_keys, (1999, 10))
+    assert len(segments) == 2 and segments[1][0] == ["m.year IS NULL"]
+
+
+def test_pages_resume_inside_null_group(db):
+    # Курсор попадает в середину строк без жанра и без года
+    for sort_order in ((('genre', True),), (('genre', False),), (('year', True), ('rating', False))):
+        movie_filter = MovieFilter(sort_order=sort_order)
+        expected = [movie.id for movie in db.filter_movies(movie_filter)]
+        assert read_all_pages(db, movie_filter, 4) == expected
@@ -0,0 +1,158 @@
+'''
+Модуль загрузки интерфейса.
+Формы из ui/*.ui заранее компилируются в модули Python, поэтому при открытии
+окна не нужно разбирать XML. Сборка выполняется командой:
+    python ui_loader.py build
+
+Если скомпилированного модуля нет или файл .ui изменён после сборки,
+форма загружается как раньше, через uic.loadUi.
+'''
+
+import hashlib
+import importlib
+import io
+import logging
+import os
+import sys
+from typing import Dict, List, Optional
+from PyQt6 import uic
+
+
+logger = logging.getLogger(__name__)
+
+
+# Папка с файлами Qt Designer
+UI_DIR = "ui"
+
+# Пакет со скомпилированными формами
+COMPILED_PACKAGE = "ui_compiled"
+
+# Формы приложения
+UI_FORMS = ('main_window', 'add_edit_dialog', 'details_dialog')
+
+# Первая строка скомпилированного модуля хранит хэш исходного .ui
+SOURCE_HASH_PREFIX = "# ui-source-sha256: "
+
+# Найденные классы форм (None - форма загружается из .ui)
+_form_classes: Dict[str, Optional[type]] = {}
+
+
+def ui_path(form: str) -> str:
+    # Путь к файлу .ui формы
+    return os.path.join(UI_DIR, f"{form}.ui")
+
+
+def compiled_path(form: str) -> str:
+    # Путь к скомпилированному модулю формы
+    return os.path.join(COMPILED_PACKAGE, f"{form}.py")
+
+
+def _source_hash(path: str) -> str:
+    # Хэш содержимого файла .ui
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def is_stale(form: str) -> bool:
+    '''
+    Проверка, что скомпилированный модуль отсутствует или устарел.
+    Если .ui новее модуля (например, после checkout), сверяется хэш содержимого.
+    '''
+    source = ui_path(form)
+    compiled = compiled_path(form)
+    try:
+        if os.path.getmtime(source) <= os.path.getmtime(compiled):
+            return False
+        with open(compiled, 'r', encoding='utf-8') as f:
+            header = f.readline().strip()
+        return header != SOURCE_HASH_PREFIX + _source_hash(source)
+    except OSError:
+        return True
+
+
+def compile_form(form: str) -> str:
+    # Компиляция одной формы в модуль пакета COMPILED_PACKAGE
+    source = ui_path(form)
+    buffer = io.StringIO()
+    buffer.write(f"{SOURCE_HASH_PREFIX}{_source_hash(source)}\n")
+    uic.compileUi(source, buffer)
+
+    os.makedirs(COMPILED_PACKAGE, exist_ok=True)
+    init_path = os.path.join(COMPILED_PACKAGE, "__init__.py")
+    if not os.path.exists(init_path):
+        with open(init_path, 'w', encoding='utf-8') as f:
+            f.write("# Скомпилированные формы, создаются командой: python ui_loader.py build\n")
+
+    # Запись через временный файл, чтобы не оставить недописанный модуль
+    target = compiled_path(form)
+    temp_path = target + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(buffer.getvalue())
+    os.replace(temp_path, target)
+    return target
+
+
+def build(forms=UI_FORMS, force: bool = False) -> List[str]:
+    # Компиляция устаревших форм, возвращает список записанных модулей
+    written = []
+    for form in forms:
+        if force or is_stale(form):
+            written.append(compile_form(form))
+    _form_classes.clear()
+    return written
+
+
+def _form_class(form: str) -> Optional[type]:
+    # Класс скомпилированной формы (None, если модуль отсутствует или устарел)
+    if form in _form_classes:
+        return _form_classes[form]
+
+    form_class = None
+    # В собранном приложении исходных файлов нет, модули берутся из архива
+    if not getattr(sys, 'frozen', False) and is_stale(form):
+        logger.info("Форма %s загружается из %s; для ускорения выполните: python ui_loader.py build",
+                    form, ui_path(form))
+    else:
+        try:
+            module = importlib.import_module(f"{COMPILED_PACKAGE}.{form}")
+            form_class = next(
+                value for name, value in vars(module).items()
+                if name.startswith("Ui_") and isinstance(value, type)
+            )
+        except (ImportError, StopIteration) as e:
+            logger.warning("Не удалось загрузить скомпилированную форму %s: %s", form, e)
+
+    _form_classes[form] = form_class
+    return form_class
+
+
+def setup_ui(widget, form: str):
+    '''
+    Построение интерфейса формы на виджете.
+    Как и uic.loadUi, дочерние виджеты становятся атрибутами widget.
+    '''
+    form_class = _form_class(form)
+    if form_class is None:
+        uic.loadUi(ui_path(form), widget)
+        return
+
+    ui = form_class()
+    ui.setupUi(widget)
+    for name, value in vars(ui).items():
+        setattr(widget, name, value)
+
+
+def main():
+    # Сборка форм из командной строки
+    force = "--force" in sys.argv[2:]
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Использование: python ui_loader.py build [--force]")
+        sys.exit(1)
+    written = build(force=force)
+    print(f"Скомпилировано форм: {len(written)}")
+    for path in written:
+        print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()